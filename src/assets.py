@@ -1,7 +1,9 @@
 # assets.py
-import os
+import os, sys, json, hashlib, threading, time
+from collections import OrderedDict
 import pygame
 from . import settings as S
+from .sprite import cut_sheet
 
 # Thư mục chứa ảnh
 ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
@@ -13,11 +15,11 @@ def load_img(name: str, size=None):
     """
     Load ảnh PNG từ assets. Nếu size là tuple (w, h) thì scale;
     nếu size is None thì giữ nguyên kích thước gốc (giúp zoom không mờ).
+    Ảnh gốc lấy từ ASSETS (decode 1 lần mỗi process).
     """
-    p = asset_path(name)
-    if not os.path.exists(p):
+    img = ASSETS.image(name)
+    if img is None:
         return None
-    img = pygame.image.load(p).convert_alpha()
     if size is not None:
         # chấp nhận tuple (w, h) hoặc (int,int); nếu size None → bỏ qua
         w, h = int(size[0]), int(size[1])
@@ -38,3 +40,265 @@ def load_all(size=None):
         "start": load_img("start.png",  size),
         "goal":  load_img("goal.png",   size),
     }
+
+
+# ---------- cache ảnh / bộ frame đã scale ----------
+# settings ảnh hưởng tới frame đã scale: đổi 1 trong số này thì atlas cũ bỏ
+ATLAS_SETTINGS = ("IDLE_FILE", "WALK_FILE", "FRAME_W", "FRAME_H", "IDLE_COLS", "WALK_COLS",
+                  "ROW_DOWN", "ROW_LEFT", "ROW_RIGHT", "ROW_UP", "SCALE_MODE", "SCALE_MULT",
+                  "MONSTER_SPECS", "MONSTER_SCALE_MODE", "MONSTER_SCALE_MULT")
+ATLAS_VERSION = 1
+ATLAS_MAX_W = 2048
+
+
+def _surface_bytes(obj):
+    """Ước lượng bộ nhớ pixel của Surface / list / dict lồng nhau chứa Surface."""
+    if isinstance(obj, pygame.Surface):
+        return obj.get_width() * obj.get_height() * obj.get_bytesize()
+    if isinstance(obj, dict):
+        return sum(_surface_bytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_surface_bytes(v) for v in obj)
+    return 0
+
+
+def _flatten(obj, out):
+    """Tách Surface ra list out, trả về khung JSON được ({"#": chỉ số} thay cho Surface)."""
+    if isinstance(obj, pygame.Surface):
+        out.append(obj)
+        return {"#": len(out) - 1}
+    if isinstance(obj, dict):
+        return {"d": [[k, _flatten(v, out)] for k, v in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return [_flatten(v, out) for v in obj]
+    return {"v": obj}
+
+
+def _unflatten(node, frames):
+    if isinstance(node, list):
+        return [_unflatten(v, frames) for v in node]
+    if "#" in node:
+        return frames[node["#"]]
+    if "d" in node:
+        return {k: _unflatten(v, frames) for k, v in node["d"]}
+    return node["v"]
+
+
+def _pack(sizes, max_w=ATLAS_MAX_W):
+    """Xếp kệ (shelf) các frame (w, h) vào 1 ảnh. Trả về (rects, (W, H))."""
+    rects, x, y, shelf_h, W = [], 0, 0, 0, 1
+    for w, h in sizes:
+        if x and x + w > max_w:
+            x, y, shelf_h = 0, y + shelf_h, 0
+        rects.append((x, y, w, h))
+        x += w
+        shelf_h = max(shelf_h, h)
+        W = max(W, x)
+    return rects, (W, max(1, y + shelf_h))
+
+
+class AssetManager:
+    """
+    Ảnh gốc và bộ frame đã scale dùng chung trong process.
+    - image(name): decode PNG 1 lần (convert_alpha), các lần sau lấy từ cache.
+    - sheet_frames / strip_frames: cắt spritesheet từ ảnh đã decode.
+    - scaled(key, build): kết quả build() (Surface / list / dict lồng nhau)
+      giữ trong LRU theo ngân sách byte pixel, vd. bộ frame theo CELL.
+    - frame_set(cell, build, startup): như scaled; ngoài ra bộ frame lúc
+      khởi động (startup=True) được lưu thành atlas (pixel RGBA thô + 1 JSON
+      chỉ mục) trong atlas_dir, lần chạy sau nạp lại thay vì decode sheet +
+      scale. Sau khởi động (zoom, đổi map) ảnh gốc đã decode, scale lại nhanh
+      hơn đọc atlas nên chỉ lúc khởi động mới dùng atlas.
+    Cần display đã set_mode (convert_alpha). An toàn khi gọi từ nhiều thread.
+    """
+
+    def __init__(self, budget_bytes, atlas_dir=None):
+        self.budget_bytes = int(budget_bytes)
+        self.atlas_dir = atlas_dir or None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = {}               # name -> Surface | None (file thiếu/hỏng)
+        self._scaled = OrderedDict()    # key -> (value, nbytes)
+        self._signature = None
+        self._lock = threading.RLock()
+
+    # --- ảnh gốc ---
+    def image(self, name):
+        """Surface gốc của assets/<name> (None nếu không đọc được)."""
+        with self._lock:
+            if name in self._images:
+                return self._images[name]
+            try:
+                img = pygame.image.load(asset_path(name)).convert_alpha()
+            except (pygame.error, OSError, FileNotFoundError):
+                img = None
+            self._images[name] = img
+            return img
+
+    def sheet_frames(self, name, frame_w, frame_h, row=0, cols=None):
+        """Như sprite.load_sheet nhưng cắt từ ảnh đã decode (không đọc lại file)."""
+        sheet = self.image(name)
+        return cut_sheet(sheet, frame_w, frame_h, row, cols) if sheet is not None else []
+
+    def strip_frames(self, name, cols):
+        """1 hàng sprite, frame_w = rộng ảnh // cols."""
+        sheet = self.image(name)
+        if sheet is None:
+            return []
+        cols = max(1, int(cols))
+        return cut_sheet(sheet, sheet.get_width() // cols, sheet.get_height(), 0, cols)
+
+    # --- ảnh đã scale ---
+    def scaled(self, key, build):
+        """Kết quả build() cho key (dựng + cache nếu chưa có). Coi như chỉ đọc."""
+        with self._lock:
+            entry = self._scaled.get(key)
+            if entry is not None:
+                self._scaled.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            value = build()
+            self._put(key, value)
+            return value
+
+    def frame_set(self, cell, build, startup=False):
+        """Bộ frame theo cell: LRU trong RAM, rồi atlas trên đĩa (startup), cuối cùng build(cell)."""
+        key = ("set", int(cell))
+        with self._lock:
+            entry = self._scaled.get(key)
+            if entry is not None:
+                self._scaled.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            value = self._load_atlas(cell) if startup else None
+            if value is None:
+                value = build(cell)
+                if startup:
+                    self._save_atlas(cell, value)
+            self._put(key, value)
+            return value
+
+    def _put(self, key, value):
+        size = _surface_bytes(value)
+        if size > self.budget_bytes:
+            return
+        self._scaled[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.budget_bytes:
+            _, (_, n) = self._scaled.popitem(last=False)
+            self.nbytes -= n
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._scaled.clear()
+            self.nbytes = 0
+
+    # --- atlas trên đĩa ---
+    def signature(self):
+        """Băm tên/kích thước/mtime các file trong assets/ + ATLAS_SETTINGS."""
+        if self._signature is None:
+            h = hashlib.sha1(f"v{ATLAS_VERSION}".encode())
+            try:
+                names = sorted(os.listdir(ASSET_DIR))
+            except OSError:
+                names = []
+            for name in names:
+                try:
+                    st = os.stat(asset_path(name))
+                except OSError:
+                    continue
+                h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+            h.update(repr([getattr(S, k, None) for k in ATLAS_SETTINGS]).encode())
+            self._signature = h.hexdigest()[:16]
+        return self._signature
+
+    def _atlas_paths(self, cell):
+        base = os.path.join(self.atlas_dir, f"frames_{int(cell)}")
+        return base + ".rgba", base + ".json"
+
+    def _load_atlas(self, cell):
+        if not self.atlas_dir:
+            return None
+        raw, idx = self._atlas_paths(cell)
+        try:
+            with open(idx, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("signature") != self.signature():
+                return None
+            with open(raw, "rb") as f:
+                data = f.read()
+            sheet = pygame.image.frombytes(data, tuple(meta["size"]), "RGBA").convert_alpha()
+            frames = [sheet.subsurface(pygame.Rect(r)) for r in meta["rects"]]
+            return _unflatten(meta["layout"], frames)
+        except (OSError, ValueError, KeyError, IndexError, TypeError, pygame.error):
+            return None
+
+    def _save_atlas(self, cell, value):
+        if not self.atlas_dir:
+            return
+        frames = []
+        layout = _flatten(value, frames)
+        if not frames:
+            return
+        rects, size = _pack([f.get_size() for f in frames])
+        sheet = pygame.Surface(size, pygame.SRCALPHA)
+        for f, (x, y, _, _) in zip(frames, rects):
+            sheet.blit(f, (x, y))
+        raw, idx = self._atlas_paths(cell)
+        try:
+            os.makedirs(self.atlas_dir, exist_ok=True)
+            # ghi file tạm rồi đổi tên: process khác không đọc phải atlas dở dang
+            with open(raw + ".tmp", "wb") as f:
+                f.write(pygame.image.tobytes(sheet, "RGBA"))
+            os.replace(raw + ".tmp", raw)
+            with open(idx + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"signature": self.signature(), "size": list(size),
+                           "rects": rects, "layout": layout}, f)
+            os.replace(idx + ".tmp", idx)
+        except (OSError, ValueError, TypeError, pygame.error) as e:
+            print(f"atlas save failed: {e}", file=sys.stderr)
+
+
+class AssetLoader:
+    """
+    Nạp asset trên thread nền để cửa sổ hiện ngay (frame đầu vẽ bằng màu
+    thay thế): ảnh tĩnh load_all() + bộ frame động build(cell) qua ASSETS.
+    Vòng lặp UI thấy done = True thì lấy self.assets và ASSETS.frame_set(cell)
+    (đã có sẵn trong cache) để thay vào.
+    """
+
+    def __init__(self, cell, build):
+        self.cell = cell
+        self.assets = None
+        self.done = False
+        self.error = None
+        self.load_ms = 0.0
+        self._thread = threading.Thread(target=self._run, args=(build,), daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, build):
+        t0 = time.perf_counter()
+        try:
+            # atlas trước: có atlas hợp lệ thì không phải decode các spritesheet
+            ASSETS.frame_set(self.cell, build, startup=True)
+            self.assets = load_all(None)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.load_ms = (time.perf_counter() - t0) * 1000.0
+            self.done = True
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+
+# cache dùng chung trong tiến trình
+ASSETS = AssetManager(int(float(getattr(S, "ASSET_CACHE_MB", 64)) * 1024 * 1024),
+                      getattr(S, "ASSET_ATLAS_DIR", None))
@@ -1,7 +1,31 @@
 # astar.py
 import math
 import heapq
+from array import array
+from collections.abc import Mapping
 from . import settings as S
+from .trace import Trace, PathView, OPENED, REOPENED
+from .heuristics import heuristic_field, make_heuristic, make_heuristic_id
+from .openlist import OPEN_LISTS, IndexedHeap, BucketQueue
+
+
+class SearchCancelled(Exception):
+    """Lượt tìm bị huỷ giữa chừng (vd. lưới vừa bị sửa)."""
+
+
+# số bước mở rộng giữa 2 lần kiểm tra cờ huỷ
+CANCEL_CHECK_EVERY = 256
+
+# lưới tới cỡ này thì search_flat dựng h cả lưới luôn (NumPy, < 1 ms) thay vì
+# tính lười từng node
+HFIELD_SMALL_CELLS = 256 * 256
+
+# byte ô lưới -> 1 nếu là tường (== 1), còn lại 0
+_WALL_TABLE = bytes(1 if i == 1 else 0 for i in range(256))
+
+# "astar": tìm xuôi từ start | "bidirectional": 2 frontier từ start và goal
+# "jps" / "jps+": Jump Point Search (8-dir, chi phí đều; tự lùi về A* nếu không)
+MODES = ("astar", "bidirectional", "jps", "jps+")
 
 
 def _heuristic(a, b, kind: str):
@@ -26,13 +50,45 @@ def _heuristic(a, b, kind: str):
         return 0.0
 
 
+def monster_costs(monsters, monster_extra_cost=0.0):
+    """
+    Phụ phí quái vật dạng dict {(r,c): phụ phí}.
+    - monsters là dict/Mapping: phụ phí riêng từng ô (mỗi loại quái vật
+      một mức, vd. Bat 5, Skeleton 12) -> trả về nguyên, bỏ qua
+      monster_extra_cost.
+    - set/list (kiểu cũ): mọi ô cùng phụ phí monster_extra_cost.
+    """
+    if not monsters:
+        return {}
+    if isinstance(monsters, Mapping):
+        return monsters
+    cost = float(monster_extra_cost)
+    return {tuple(rc): cost for rc in monsters} if cost != 0.0 else {}
+
+
+def cost_layer(rows, cols, monsters, monster_extra_cost=0.0):
+    """
+    Lớp phụ phí dày rows x cols (list các array('d')) cho engine dict,
+    đọc bằng extra[r][c] thay vì tra set/dict ở mỗi láng giềng.
+    None nếu không có ô nào có phụ phí.
+    """
+    costs = monster_costs(monsters, monster_extra_cost)
+    if not any(costs.values()):
+        return None
+    layer = [array("d", [0.0]) * cols for _ in range(rows)]
+    for (r, c), v in costs.items():
+        if 0 <= r < rows and 0 <= c < cols:
+            layer[r][c] = float(v)
+    return layer
+
+
 def _neighbors(r, c, rows, cols, grid, eight_dir: bool, diag_cost_is_one: bool,
-               monsters=None, monster_extra_cost=0.0):
+               extra=None):
     """
     Sinh láng giềng (nr, nc, step_cost).
     - Tường (grid==1) bị chặn.
     - Nếu eight_dir=True: có thêm bước chéo; chặn cắt góc.
-    - Nếu (nr,nc) là ô quái vật -> cộng thêm monster_extra_cost vào step_cost.
+    - extra: lớp phụ phí (cost_layer) -> cộng extra[nr][nc] vào step_cost.
     """
     # 4 hướng cơ bản
     base = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0)]
@@ -48,53 +104,37 @@ def _neighbors(r, c, rows, cols, grid, eight_dir: bool, diag_cost_is_one: bool,
                 if grid[r][c + dc] == 1 or grid[r + dr][c] == 1:
                     continue
             step_cost = cost
-            if monsters and (nr, nc) in monsters:
-                step_cost += float(monster_extra_cost)
+            if extra is not None:
+                step_cost += extra[nr][nc]
             yield (nr, nc, step_cost)
 
 
-def _reconstruct_path(came_from, start, cur):
-    path = []
-    n = cur
-    while n in came_from:
-        path.append(n)
-        n = came_from[n]
-    path.append(start)
-    path.reverse()
-    return path
-
-
-def generate_states(grid, start, goal,
-                    heuristic_kind="manhattan",
-                    eight_dir=False,
-                    mode="astar",
-                    weight=1.0,
-                    monsters=None,
-                    monster_extra_cost=0.0):
+def iter_steps(grid, start, goal,
+               heuristic_kind="manhattan",
+               eight_dir=False,
+               weight=1.0,
+               monsters=None,
+               monster_extra_cost=0.0,
+               cancel=None):
     """
-    Trả về các trạng thái (generator) để visualize.
-    Mỗi lần yield một dict:
-      {
-        "open":   list[(r,c)],
-        "closed": list[(r,c)],
-        "path":   list[(r,c)],  # path tốt nhất tới 'current'
-        "current":(r,c) | None,
-        "found":  bool
-      }
-    f = g + W * h  (W = weight; W=1 là A* thường).
-
-    Thêm:
-    - monsters: set[(r,c)] các ô có quái vật
-    - monster_extra_cost: float, phụ phí khi BƯỚC VÀO ô quái vật
+    Lõi A* dạng delta (xem trace.Trace).
+    Mỗi lần yield một tuple (current, pushed, found):
+      - pushed:  tuple[(node, parent_cũ)] các node được push/cải thiện bởi
+                 lần mở rộng TRƯỚC đó; parent_cũ None = node mới vào open.
+      - current: node vừa pop (None ở bước cuối nếu không tìm thấy).
+    Mỗi bước chỉ tốn O(số láng giềng), không sao chép open/closed.
+    monsters: set (cùng phụ phí monster_extra_cost) hoặc dict {(r,c): phụ phí}.
+    cancel: threading.Event tuỳ chọn; khi được set -> SearchCancelled.
     """
     rows = len(grid)
     cols = len(grid[0]) if rows else 0
+    extra = cost_layer(rows, cols, monsters, monster_extra_cost)
 
     start = tuple(start)
     goal  = tuple(goal)
 
-    # Heuristic function
-    h = lambda a, b: _heuristic(a, b, heuristic_kind)
+    # Heuristic chọn 1 lần, goal gắn sẵn
+    h = make_heuristic(heuristic_kind, goal)
 
     # Chi phí chéo tự động theo heuristic:
     # - Chebyshev  => chéo = 1.0
@@ -104,12 +144,13 @@ def generate_states(grid, start, goal,
     open_heap = []
     came_from = {}
     g_score   = {start: 0.0}
-    f_start   = g_score[start] + weight * h(start, goal)
+    f_start   = g_score[start] + weight * h(start)
     heapq.heappush(open_heap, (f_start, 0, start))
     open_set = {start}
     closed   = set()
 
     step_id = 0
+    pushed = ()
 
     while open_heap:
         _, _, current = heapq.heappop(open_heap)
@@ -117,43 +158,1251 @@ def generate_states(grid, start, goal,
             continue
         open_set.remove(current)
         closed.add(current)
+        if cancel is not None and step_id % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+            raise SearchCancelled()
 
-        # path tốt nhất tới current
-        path = _reconstruct_path(came_from, start, current) if current != start else [start]
         found = (current == goal)
-
-        yield {
-            "open":    list(open_set),
-            "closed":  list(closed),
-            "path":    path,
-            "current": current,
-            "found":   found
-        }
+        yield (current, pushed, found)
         if found:
             return
 
+        pushed = []
         cr, cc = current
         for nr, nc, step_cost in _neighbors(cr, cc, rows, cols, grid,
-                                            eight_dir, diag_cost_is_one,
-                                            monsters, monster_extra_cost):
+                                            eight_dir, diag_cost_is_one, extra):
             neighbor = (nr, nc)
             if neighbor in closed:
                 continue
             tentative_g = g_score[current] + step_cost
             if tentative_g < g_score.get(neighbor, float("inf")):
+                pushed.append((neighbor, came_from.get(neighbor)))
                 came_from[neighbor] = current
                 g_score[neighbor]   = tentative_g
-                f_score = tentative_g + weight * h(neighbor, goal)
+                f_score = tentative_g + weight * h(neighbor)
                 heapq.heappush(open_heap, (f_score, step_id, neighbor))
                 open_set.add(neighbor)
+        pushed = tuple(pushed)
         step_id += 1
 
     # không tìm thấy
-    yield {
-        "open":    list(open_set),
-        "closed":  list(closed),
-        "path":    [],
-        "current": None,
-        "found":   False
+    yield (None, pushed, False)
+
+
+# ---------- Engine mảng phẳng ----------
+class FlatGrid:
+    """
+    Lưới phẳng row-major cho engine mảng.
+    - Có viền tường bao quanh: id = (r+1)*width + (c+1), width = cols + 2,
+      nên vòng lặp láng giềng không cần kiểm tra biên.
+    - blocked: bytearray (1 = tường), extra: array('d') phụ phí ô quái vật
+      (lớp chi phí dày; monsters là set -> cùng monster_extra_cost, dict
+      {(r,c): phụ phí} -> mức riêng từng loại quái vật, xem monster_costs).
+    Thứ tự id trùng thứ tự tuple (r,c) nên tie-break của heap giữ nguyên.
+    """
+
+    def __init__(self, grid, monsters=None, monster_extra_cost=0.0):
+        rows = len(grid)
+        cols = len(grid[0]) if rows else 0
+        self.rows, self.cols = rows, cols
+        self.width = cols + 2
+        self.size = (rows + 2) * self.width
+        W = self.width
+
+        blocked = bytearray(b"\x01") * self.size
+        for r, row in enumerate(grid):
+            base = (r + 1) * W + 1
+            try:
+                # hàng int 0..255 / bytearray / memoryview (map.bin): chép cả hàng ở C
+                blocked[base:base + cols] = bytes(row).translate(_WALL_TABLE)
+            except (TypeError, ValueError):
+                blocked[base:base + cols] = bytes(1 if v == 1 else 0 for v in row)
+        self.blocked = blocked
+
+        # phụ phí 0 thì coi như lưới chi phí đều
+        costs = monster_costs(monsters, monster_extra_cost)
+        self.has_extra = any(costs.values())
+        self.extra = None
+        if self.has_extra:
+            self.extra = array("d", [0.0]) * self.size
+            for (r, c), v in costs.items():
+                if 0 <= r < rows and 0 <= c < cols:
+                    self.extra[(r + 1) * W + c + 1] = float(v)
+
+        self._offsets = {}
+        self._jump = None
+        self._hfields = {}
+
+    def __getstate__(self):
+        # gửi sang process khác: bỏ các cache (dựng lại được ở bên kia)
+        state = self.__dict__.copy()
+        state.update(_offsets={}, _jump=None, _hfields={})
+        return state
+
+    @property
+    def uniform(self):
+        """Mọi bước cùng loại có cùng chi phí (không có phụ phí quái vật)."""
+        return not self.has_extra
+
+    @property
+    def integer_costs(self):
+        """Mọi phụ phí quái vật là số nguyên (điều kiện của BucketQueue)."""
+        if self.extra is None:
+            return True
+        return all(map(float.is_integer, self.extra))
+
+    def jump_table(self):
+        """Bảng khoảng cách nhảy JPS+ (xem _build_jump_table), tính 1 lần rồi cache."""
+        if self._jump is None:
+            self._jump = _build_jump_table(self)
+        return self._jump
+
+    def heuristic_field(self, kind, goal, build=True):
+        """
+        h của cả lưới tới goal (heuristics.heuristic_field), cache theo
+        (kind, goal) cho các lượt tìm sau tới cùng goal. Cache giới hạn theo
+        byte (HFIELD_CACHE_MB, bỏ field cũ nhất); field lớn hơn cả ngân sách
+        thì không dựng.
+        build=False: chỉ trả field đã có trong cache.
+        None nếu không có field (không dựng / vượt ngân sách / không có NumPy).
+        """
+        key = (kind, tuple(goal))
+        field = self._hfields.get(key)
+        if field is not None or not build:
+            return field
+        # mọi field của cùng lưới cùng cỡ: ngân sách byte -> số field giữ được
+        slots = int(float(getattr(S, "HFIELD_CACHE_MB", 32)) * 1024 * 1024) // (8 * self.size)
+        if slots < 1:
+            return None
+        field = heuristic_field(kind, goal, self.rows, self.cols)
+        if field is None:
+            return None
+        while len(self._hfields) >= slots:
+            self._hfields.pop(next(iter(self._hfields)))
+        self._hfields[key] = field
+        return field
+
+    def node_id(self, rc):
+        return (rc[0] + 1) * self.width + rc[1] + 1
+
+    def set_cell(self, rc, wall, extra_cost=0.0):
+        """
+        Sửa 1 ô tại chỗ (tường / phụ phí quái vật), trả về id của ô.
+        Chỉ dùng cho lưới riêng của LPAStar: FlatGrid trong TraceCache
+        được khoá theo nội dung nên không được sửa.
+        """
+        nid = self.node_id(rc)
+        self.blocked[nid] = 1 if wall else 0
+        extra_cost = float(extra_cost)
+        if self.extra is None and extra_cost != 0.0:
+            self.extra = array("d", [0.0]) * self.size
+            self.has_extra = True
+        if self.extra is not None:
+            self.extra[nid] = extra_cost
+        self._jump = None
+        return nid
+
+    def node_rc(self, nid):
+        r, c = divmod(nid, self.width)
+        return (r - 1, c - 1)
+
+    def offsets(self, eight_dir, diag_cost_is_one):
+        """
+        Láng giềng dạng (offset, cost, side1, side2), tính một lần rồi cache.
+        side1/side2 != 0 là 2 ô cạnh cần trống khi đi chéo (chặn cắt góc).
+        Thứ tự giống _neighbors để thứ tự mở rộng trùng khớp.
+        """
+        key = (bool(eight_dir), bool(diag_cost_is_one))
+        offs = self._offsets.get(key)
+        if offs is None:
+            W = self.width
+            offs = [(-W, 1.0, 0, 0), (W, 1.0, 0, 0), (-1, 1.0, 0, 0), (1, 1.0, 0, 0)]
+            if eight_dir:
+                diag = 1.0 if diag_cost_is_one else math.sqrt(2.0)
+                for dr, dc in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+                    offs.append((dr * W + dc, diag, dc, dr * W))
+            self._offsets[key] = offs = tuple(offs)
+        return offs
+
+
+def search_flat(fg, start, goal,
+                heuristic_kind="manhattan",
+                eight_dir=False,
+                weight=1.0,
+                trace=None,
+                cancel=None,
+                state=None,
+                open_list="heap",
+                reuse_h=False):
+    """
+    A*/Weighted A* trên FlatGrid: g/parent/closed là buffer cấp phát sẵn
+    (array/bytearray) đánh chỉ số bằng id nguyên thay cho dict/set tuple.
+    Cho ra cùng path và cùng thứ tự mở rộng như iter_steps.
+
+    Nếu truyền trace thì ghi thêm một chặng (delta, node dạng (r,c)).
+    cancel: threading.Event tuỳ chọn; khi được set -> SearchCancelled.
+    state: dict tuỳ chọn, nhận g/parent/closed/hcache/open khi tìm xong
+           (để LPAStar tiếp tục từ đây thay vì tìm lại từ đầu).
+    open_list: xem OPEN_LISTS / openlist.py. "bucket" chỉ dùng được khi f
+           luôn nguyên (bucket_supported), ngược lại lùi về "heap".
+    reuse_h: sẽ còn tìm tới cùng goal trên fg này (vd. bench lặp lại) -> dựng
+           h cả lưới một lần (fg.heuristic_field). Mặc định h tính lười từng
+           node; field chỉ dựng khi lưới nhỏ (HFIELD_SMALL_CELLS) hoặc có
+           state (LPA* dùng lại hcache khi replan).
+    Trả về dict {"found", "path", "explored", "cost", "open_list", "open_peak"}
+    (open_list: open list thực dùng; open_peak: kích thước lớn nhất của
+    open list, kể cả entry cũ của heap/bucket).
+    """
+    start = tuple(start)
+    goal  = tuple(goal)
+    n = fg.size
+    s = fg.node_id(start)
+    t = fg.node_id(goal)
+    width = fg.width
+    blocked = fg.blocked
+    extra = fg.extra if fg.has_extra else None
+    diag_cost_is_one = (eight_dir and heuristic_kind == "chebyshev")
+    offsets = fg.offsets(eight_dir, diag_cost_is_one)
+
+    INF = float("inf")
+    g = array("d", [INF]) * n
+    parent = array("l", [-1]) * n
+    closed = bytearray(n)
+    # h cả lưới (NumPy, cache trên fg) nếu đã có hoặc đáng dựng; không thì
+    # tính lười từng node, mỗi node 1 lần (lượt rẻ trên map lớn không phải
+    # trả giá dựng cả field)
+    build = reuse_h or state is not None or n <= HFIELD_SMALL_CELLS
+    hcache = fg.heuristic_field(heuristic_kind, goal, build=build)
+    if hcache is None:
+        hcache = array("d", [-1.0]) * n
+    h = make_heuristic_id(heuristic_kind, goal, width)
+
+    heappush, heappop = heapq.heappush, heapq.heappop
+    record = trace is not None
+    node_rc = fg.node_rc
+    if record:
+        trace.begin(start)
+    pushed = ()
+
+    g[s] = 0.0
+    hcache[s] = h(s)
+    ol = _make_open_list(open_list, fg, heuristic_kind, eight_dir, weight)
+    if ol is None:
+        open_heap = [(0.0 + weight * hcache[s], 0, s)]
+    else:
+        # cùng chữ ký heapq: (open, entry) / (open) -> entry
+        heappush, heappop = type(ol).push, type(ol).pop
+        open_heap = ol
+        heappush(open_heap, (0.0 + weight * hcache[s], 0, s))
+    step_id = 0
+    explored = 0
+    peak = 1
+    found = False
+
+    while open_heap:
+        _, _, cur = heappop(open_heap)
+        if closed[cur]:
+            continue
+        closed[cur] = 1
+        explored += 1
+        if cancel is not None and explored % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+            raise SearchCancelled()
+        found = (cur == t)
+        if record:
+            trace.append((node_rc(cur), pushed, found))
+        if found:
+            break
+
+        if record:
+            pushed = []
+        gc = g[cur]
+        for off, cost, s1, s2 in offsets:
+            nb = cur + off
+            if blocked[nb] or closed[nb]:
+                continue
+            # chặn đi chéo xuyên góc
+            if s1 and (blocked[cur + s1] or blocked[cur + s2]):
+                continue
+            ng = gc + (cost + extra[nb] if extra is not None else cost)
+            if ng < g[nb]:
+                if record:
+                    p = parent[nb]
+                    pushed.append((node_rc(nb), node_rc(p) if p >= 0 else None))
+                parent[nb] = cur
+                g[nb] = ng
+                hv = hcache[nb]
+                if hv < 0.0:
+                    hv = hcache[nb] = h(nb)
+                heappush(open_heap, (ng + weight * hv, step_id, nb))
+        if record:
+            pushed = tuple(pushed)
+        if len(open_heap) > peak:
+            peak = len(open_heap)
+        step_id += 1
+    else:
+        # không tìm thấy
+        if record:
+            trace.append((None, pushed, False))
+
+    path = []
+    if found:
+        nid = t
+        while nid != s:
+            path.append(node_rc(nid))
+            nid = parent[nid]
+        path.append(start)
+        path.reverse()
+    if state is not None:
+        if ol is None:
+            opened = [nid for _, _, nid in open_heap if not closed[nid]]
+        else:
+            opened = [nid for nid in ol.nodes() if not closed[nid]]
+        state.update(g=g, parent=parent, closed=closed, hcache=hcache, open=opened)
+    return {
+        "found":    found,
+        "path":     path,
+        "explored": explored,
+        "cost":     g[t] if found else INF,
+        "open_list": open_list if ol is not None else "heap",
+        "open_peak": peak,
     }
-    return
+
+
+def bucket_supported(fg, heuristic_kind, eight_dir, weight):
+    """
+    f = g + W*h luôn nguyên: bước 4-dir (hoặc 8-dir chebyshev, chéo = 1),
+    phụ phí quái vật nguyên, h manhattan/chebyshev và W nguyên.
+    """
+    if eight_dir and heuristic_kind != "chebyshev":
+        return False
+    if heuristic_kind not in ("manhattan", "chebyshev"):
+        return False
+    return float(weight).is_integer() and weight >= 0 and fg.integer_costs
+
+
+def _make_open_list(kind, fg, heuristic_kind, eight_dir, weight):
+    """Open list cho search_flat theo kind; None = heap heapq mặc định."""
+    if kind not in OPEN_LISTS:
+        raise ValueError(f"unknown open list: {kind!r}")
+    if kind == "indexed":
+        return IndexedHeap(fg.size)
+    if kind == "bucket" and bucket_supported(fg, heuristic_kind, eight_dir, weight):
+        return BucketQueue()
+    return None
+
+
+def search_flat_multi(fg, start, targets,
+                      heuristic_kind="manhattan",
+                      eight_dir=False,
+                      cancel=None):
+    """
+    Một lượt A* từ start tới NHIỀU đích (không ghi trace): h = min h tới các
+    đích, vẫn nhất quán nên chi phí của mỗi đích đã đóng là tối ưu.
+    Dừng khi mọi đích đã đóng hoặc hết open.
+    Trả về list chi phí theo thứ tự targets (INF nếu không tới được).
+    Dùng để dựng ma trận khoảng cách giữa các waypoint (planner).
+    """
+    INF = float("inf")
+    targets = [tuple(x) for x in targets]
+    if not targets:
+        return []
+    n = fg.size
+    s = fg.node_id(start)
+    width = fg.width
+    blocked = fg.blocked
+    extra = fg.extra if fg.has_extra else None
+    diag_cost_is_one = (eight_dir and heuristic_kind == "chebyshev")
+    offsets = fg.offsets(eight_dir, diag_cost_is_one)
+
+    tids = [fg.node_id(x) for x in targets]
+    left = set(tids)
+    hs = [make_heuristic_id(heuristic_kind, x, width) for x in set(targets)]
+    if len(hs) == 1:
+        h = hs[0]
+    else:
+        def h(nid):
+            return min(f(nid) for f in hs)
+
+    g = array("d", [INF]) * n
+    closed = bytearray(n)
+    hcache = array("d", [-1.0]) * n
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    g[s] = 0.0
+    open_heap = [(h(s), 0, s)]
+    step_id = 0
+    explored = 0
+    while open_heap and left:
+        _, _, cur = heappop(open_heap)
+        if closed[cur]:
+            continue
+        closed[cur] = 1
+        explored += 1
+        if cancel is not None and explored % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+            raise SearchCancelled()
+        left.discard(cur)
+        gc = g[cur]
+        for off, cost, s1, s2 in offsets:
+            nb = cur + off
+            if blocked[nb] or closed[nb]:
+                continue
+            if s1 and (blocked[cur + s1] or blocked[cur + s2]):
+                continue
+            ng = gc + (cost + extra[nb] if extra is not None else cost)
+            if ng < g[nb]:
+                g[nb] = ng
+                hv = hcache[nb]
+                if hv < 0.0:
+                    hv = hcache[nb] = h(nb)
+                heappush(open_heap, (ng + hv, step_id, nb))
+        step_id += 1
+    return [g[t] if closed[t] else INF for t in tids]
+
+
+def search_flat_bidir(fg, start, goal,
+                      heuristic_kind="manhattan",
+                      eight_dir=False,
+                      weight=1.0,
+                      trace=None,
+                      cancel=None):
+    """
+    A*/Weighted A* hai chiều trên FlatGrid: frontier xuôi từ start và frontier
+    ngược từ goal; mỗi vòng mở rộng bên có open nhỏ hơn, hoà f thì ưu tiên g lớn.
+    - mu: chi phí path tốt nhất đã nối 2 frontier (cập nhật khi một bên
+      chạm node mà bên kia đã có g).
+    - W <= 1: potential cân bằng p = W*(h(n,goal) - h(n,start))/2, khoá xuôi
+      g + p, khoá ngược g - p; dừng khi mu <= tổng 2 khoá nhỏ nhất (tối ưu nếu
+      h chấp nhận được). Hai frontier gặp nhau ở giữa nên ít node hơn hẳn
+      so với dùng h tới đích riêng cho mỗi bên.
+    - W > 1: mỗi bên là Weighted A* tới gốc bên kia (f = g + W*h); dừng khi
+      mu <= max(f nhỏ nhất 2 bên).
+    - Node đã đóng ở bên kia thì không mở rộng lại (nipping).
+    Bước ngược nb -> cur tốn cost + phụ phí của cur (ô được bước vào).
+
+    Trace: 1 chặng có 2 gốc (start, goal). Mỗi ô hiển thị thuộc về bên chạm
+    nó trước; bên kia không ghi push cho ô đó, nên replay (apply/undo) khớp.
+    Bước cuối luôn là (None, pushed, found).
+    Trả về dict như search_flat; explored = tổng số node mở rộng cả 2 bên.
+    """
+    start = tuple(start)
+    goal  = tuple(goal)
+    n = fg.size
+    s = fg.node_id(start)
+    t = fg.node_id(goal)
+    width = fg.width
+    blocked = fg.blocked
+    extra = fg.extra if fg.has_extra else None
+    diag_cost_is_one = (eight_dir and heuristic_kind == "chebyshev")
+    offsets = fg.offsets(eight_dir, diag_cost_is_one)
+    record = trace is not None
+    node_rc = fg.node_rc
+
+    if record:
+        trace.begin(start, goal)
+    if s == t:
+        if record:
+            trace.append((start, (), True))
+        return {"found": True, "path": [start], "explored": 1, "cost": 0.0}
+
+    INF = float("inf")
+    # chỉ số 0 = bên xuôi (từ start), 1 = bên ngược (từ goal)
+    g = (array("d", [INF]) * n, array("d", [INF]) * n)
+    parent = (array("l", [-1]) * n, array("l", [-1]) * n)
+    closed = (bytearray(n), bytearray(n))
+    # phần cộng thêm vào g của khoá heap (đã nhân W), tính 1 lần / node / bên
+    hcache = (array("d", [INF]) * n, array("d", [INF]) * n)
+    balanced = weight <= 1.0
+
+    h_goal = make_heuristic_id(heuristic_kind, goal, width)
+    h_start = make_heuristic_id(heuristic_kind, start, width)
+    hfun = (h_goal, h_start)
+
+    def h(side, nid):
+        if balanced:
+            p = weight * 0.5 * (h_goal(nid) - h_start(nid))
+            return p if side == 0 else -p
+        return weight * hfun[side](nid)
+
+    heappush, heappop = heapq.heappush, heapq.heappop
+    heaps = ([], [])
+    for side, root in ((0, s), (1, t)):
+        g[side][root] = 0.0
+        hcache[side][root] = h(side, root)
+        heaps[side].append((hcache[side][root], -0.0, root))
+
+    # trạng thái hiển thị (chỉ khi ghi trace): 0 chưa thấy, 1 open, 2 closed
+    if record:
+        disp = bytearray(n)
+        owner = bytearray(n)
+        disp[s] = disp[t] = 1
+        owner[t] = 1
+    pushed = ()
+
+    mu, meet = INF, -1
+    explored = 0
+
+    while True:
+        # bỏ các entry cũ (node đã đóng) ở đỉnh 2 heap
+        for side in (0, 1):
+            hp, cl = heaps[side], closed[side]
+            while hp and cl[hp[0][2]]:
+                heappop(hp)
+        hf, hb = heaps
+        if not hf or not hb:
+            break
+        bound = hf[0][0] + hb[0][0] if balanced else max(hf[0][0], hb[0][0])
+        if mu <= bound:
+            break
+
+        side = 0 if len(hf) <= len(hb) else 1
+        _, _, cur = heappop(heaps[side])
+        closed[side][cur] = 1
+        if closed[1 - side][cur]:
+            continue
+        explored += 1
+        if cancel is not None and explored % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+            raise SearchCancelled()
+        if record:
+            trace.append((node_rc(cur), pushed, False))
+            disp[cur] = 2
+            pushed = []
+
+        gs, go = g[side], g[1 - side]
+        par, cl, hc, hp = parent[side], closed[side], hcache[side], heaps[side]
+        gc = gs[cur]
+        back_extra = extra[cur] if (side == 1 and extra is not None) else 0.0
+        for off, cost, s1, s2 in offsets:
+            nb = cur + off
+            if blocked[nb] or cl[nb]:
+                continue
+            # chặn đi chéo xuyên góc (2 ô cạnh như nhau ở cả 2 chiều)
+            if s1 and (blocked[cur + s1] or blocked[cur + s2]):
+                continue
+            if side == 0:
+                ng = gc + (cost + extra[nb] if extra is not None else cost)
+            else:
+                ng = gc + cost + back_extra
+            if ng < gs[nb]:
+                if record:
+                    d = disp[nb]
+                    if d == 0:
+                        disp[nb] = 1
+                        owner[nb] = side
+                        pushed.append((node_rc(nb), None))
+                    elif d == 1 and owner[nb] == side:
+                        pushed.append((node_rc(nb), node_rc(par[nb])))
+                par[nb] = cur
+                gs[nb] = ng
+                hv = hc[nb]
+                if hv == INF:
+                    hv = hc[nb] = h(side, nb)
+                heappush(hp, (ng + hv, -ng, nb))
+                if ng + go[nb] < mu:
+                    mu, meet = ng + go[nb], nb
+        if record:
+            pushed = tuple(pushed)
+
+    found = mu < INF
+    path = []
+    if found:
+        nid = meet
+        while nid != s:
+            path.append(node_rc(nid))
+            nid = parent[0][nid]
+        path.append(start)
+        path.reverse()
+        nid = meet
+        while nid != t:
+            nid = parent[1][nid]
+            path.append(node_rc(nid))
+    if record:
+        if found:
+            trace.final_path = path
+        trace.append((None, pushed, found))
+    return {
+        "found":    found,
+        "path":     path,
+        "explored": explored,
+        "cost":     mu,
+    }
+
+
+# ---------- Jump Point Search (8-dir, chi phí đều) ----------
+# 8 hướng (dr, dc); chỉ số trùng với thứ tự bảng nhảy của JPS+
+_DIRS8 = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+_DIR_INDEX = {d: i for i, d in enumerate(_DIRS8)}
+
+
+def _jps_dirs(pdr, pdc):
+    """
+    Hướng cần nhảy từ một jump point khi tới nó theo hướng (pdr, pdc) (đã tỉa).
+    Biến thể không cắt góc: đi thẳng thì xét thêm 2 chéo phía trước và 2 hướng
+    vuông góc; đi chéo thì xét 2 thành phần thẳng + chính hướng chéo đó.
+    """
+    if pdr == 0 and pdc == 0:
+        return _DIRS8
+    if pdr and pdc:
+        return ((0, pdc), (pdr, 0), (pdr, pdc))
+    if pdr == 0:
+        return ((0, pdc), (1, pdc), (-1, pdc), (1, 0), (-1, 0))
+    return ((pdr, 0), (pdr, 1), (pdr, -1), (0, 1), (0, -1))
+
+
+def _jump_straight(blocked, x, d, p, t):
+    """
+    Nhảy thẳng từ x theo offset d (p: offset vuông góc).
+    Dừng ở goal hoặc ô có láng giềng bắt buộc (ô bên cạnh trống nhưng ô
+    bên cạnh phía sau là tường). Trả về (id, số bước) hoặc (-1, 0).
+    """
+    k = 0
+    while True:
+        x += d
+        k += 1
+        if blocked[x]:
+            return -1, 0
+        if x == t:
+            return x, k
+        if (not blocked[x + p] and blocked[x + p - d]) or \
+                (not blocked[x - p] and blocked[x - p - d]):
+            return x, k
+
+
+def _jump_diag(blocked, x, dr_off, dc_off, width, t):
+    """Nhảy chéo (không cắt góc); dừng ở ô mà nhánh thẳng từ đó gặp jump point."""
+    d = dr_off + dc_off
+    k = 0
+    while True:
+        if blocked[x + dc_off] or blocked[x + dr_off]:
+            return -1, 0
+        x += d
+        k += 1
+        if blocked[x]:
+            return -1, 0
+        if x == t:
+            return x, k
+        if _jump_straight(blocked, x, dc_off, width, t)[0] >= 0 or \
+                _jump_straight(blocked, x, dr_off, 1, t)[0] >= 0:
+            return x, k
+
+
+def _build_jump_table(fg):
+    """
+    JPS+: với mỗi ô và mỗi hướng trong _DIRS8, số bước tới jump point đầu tiên
+    (> 0), hoặc -(số bước đi được trước khi gặp tường) (<= 0) nếu không có.
+    Không phụ thuộc goal; goal được xử lý lúc tìm (xem _jump_plus).
+    Bảng là 8 array('i') theo id, tính ngược chiều đi nên mỗi ô O(1).
+    """
+    W, n, blocked = fg.width, fg.size, fg.blocked
+    tables = [array("i", [0]) * n for _ in _DIRS8]
+    for (dr, dc), tab in zip(_DIRS8, tables):
+        if dr and dc:
+            continue
+        d = dr * W + dc
+        p = 1 if dr else W
+        order = range(n - 1, -1, -1) if d > 0 else range(n)
+        for x in order:
+            if blocked[x]:
+                continue
+            y = x + d
+            if blocked[y]:
+                continue
+            if (not blocked[y + p] and blocked[y + p - d]) or \
+                    (not blocked[y - p] and blocked[y - p - d]):
+                tab[x] = 1
+            else:
+                v = tab[y]
+                tab[x] = v + 1 if v > 0 else v - 1
+    for (dr, dc), tab in zip(_DIRS8, tables):
+        if not (dr and dc):
+            continue
+        d = dr * W + dc
+        tab_c = tables[_DIR_INDEX[(0, dc)]]
+        tab_r = tables[_DIR_INDEX[(dr, 0)]]
+        order = range(n - 1, -1, -1) if d > 0 else range(n)
+        for x in order:
+            if blocked[x] or blocked[x + dc] or blocked[x + dr * W]:
+                continue
+            y = x + d
+            if blocked[y]:
+                continue
+            if tab_c[y] > 0 or tab_r[y] > 0:
+                tab[x] = 1
+            else:
+                v = tab[y]
+                tab[x] = v + 1 if v > 0 else v - 1
+    return tables
+
+
+def _jump_plus(tables, x, xr, xc, dr, dc, width, t, tr, tc):
+    """Như _jump_straight/_jump_diag nhưng tra bảng JPS+; goal nằm trên đường nhảy
+    thì dừng ở goal (thẳng) hoặc ở ô chéo thẳng hàng với goal (chéo)."""
+    k = tables[_DIR_INDEX[(dr, dc)]][x]
+    reach = k if k > 0 else -k
+    off = dr * width + dc
+    if dr and dc:
+        ddr, ddc = (tr - xr) * dr, (tc - xc) * dc
+        if ddr > 0 and ddc > 0:
+            m = min(ddr, ddc)
+            if m <= reach:
+                y = x + m * off
+                if ddr == ddc:
+                    return y, m
+                # từ y đi thẳng phần còn lại tới goal có thông không
+                sd = (dr, 0) if ddr > ddc else (0, dc)
+                st = tables[_DIR_INDEX[sd]][y]
+                if abs(ddr - ddc) <= (st if st > 0 else -st):
+                    return y, m
+    else:
+        dist = (tc - xc) * dc if dr == 0 else (tr - xr) * dr
+        if dist > 0 and (tr == xr if dr == 0 else tc == xc) and dist <= reach:
+            return t, dist
+    if k > 0:
+        return x + k * off, k
+    return -1, 0
+
+
+def search_jps(fg, start, goal,
+               heuristic_kind="octile",
+               weight=1.0,
+               plus=False,
+               trace=None,
+               cancel=None):
+    """
+    Jump Point Search (plus=True: JPS+ dùng bảng nhảy tính sẵn của fg) cho
+    lưới 8-dir chi phí đều, không cắt góc. Chỉ mở rộng jump point: các ô
+    đối xứng trên đường nhảy bị bỏ qua, nên số node mở rộng ít hơn A* nhiều.
+    f = g + W*h như search_flat; chéo tốn 1 nếu heuristic là chebyshev.
+
+    Trace: mỗi bước là một jump point, path trung gian là chuỗi jump point;
+    path trả về (và final_path) đã nội suy đủ từng ô.
+    Trả về dict {"found", "path", "explored", "cost"}.
+    """
+    start = tuple(start)
+    goal  = tuple(goal)
+    n = fg.size
+    W = fg.width
+    s = fg.node_id(start)
+    t = fg.node_id(goal)
+    tr, tc = divmod(t, W)
+    blocked = fg.blocked
+    diag = 1.0 if heuristic_kind == "chebyshev" else math.sqrt(2.0)
+    tables = fg.jump_table() if plus else None
+    # hướng (đã tỉa) theo hướng tới: {(sign dr, sign dc): ((dr, dc, cost), ...)}
+    succ = {}
+    for key in [(0, 0)] + list(_DIRS8):
+        succ[key] = tuple((dr, dc, diag if dr and dc else 1.0) for dr, dc in _jps_dirs(*key))
+
+    INF = float("inf")
+    g = array("d", [INF]) * n
+    parent = array("l", [-1]) * n
+    closed = bytearray(n)
+    hcache = array("d", [-1.0]) * n   # JPS chỉ chạm vài jump point: tính lười
+    h = make_heuristic_id(heuristic_kind, goal, W)
+
+    heappush, heappop = heapq.heappush, heapq.heappop
+    record = trace is not None
+    node_rc = fg.node_rc
+    if record:
+        trace.begin(start)
+    pushed = ()
+
+    g[s] = 0.0
+    hcache[s] = h(s)
+    open_heap = [(weight * hcache[s], 0, s)]
+    step_id = 0
+    explored = 0
+    found = False
+
+    while open_heap:
+        _, _, cur = heappop(open_heap)
+        if closed[cur]:
+            continue
+        closed[cur] = 1
+        explored += 1
+        if cancel is not None and explored % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+            raise SearchCancelled()
+        found = (cur == t)
+        if record:
+            trace.append((node_rc(cur), pushed, found))
+        if found:
+            break
+
+        if record:
+            pushed = []
+        cr, cc = divmod(cur, W)
+        p = parent[cur]
+        if p < 0:
+            key = (0, 0)
+        else:
+            pr, pc = divmod(p, W)
+            key = ((cr > pr) - (cr < pr), (cc > pc) - (cc < pc))
+        gc = g[cur]
+        for dr, dc, cost in succ[key]:
+            if tables is not None:
+                nb, k = _jump_plus(tables, cur, cr, cc, dr, dc, W, t, tr, tc)
+            elif dr and dc:
+                nb, k = _jump_diag(blocked, cur, dr * W, dc, W, t)
+            else:
+                nb, k = _jump_straight(blocked, cur, dr * W + dc, 1 if dr else W, t)
+            if nb < 0 or closed[nb]:
+                continue
+            ng = gc + k * cost
+            if ng < g[nb]:
+                if record:
+                    pp = parent[nb]
+                    pushed.append((node_rc(nb), node_rc(pp) if pp >= 0 else None))
+                parent[nb] = cur
+                g[nb] = ng
+                hv = hcache[nb]
+                if hv < 0.0:
+                    hv = hcache[nb] = h(nb)
+                heappush(open_heap, (ng + weight * hv, step_id, nb))
+        if record:
+            pushed = tuple(pushed)
+        step_id += 1
+    else:
+        if record:
+            trace.append((None, pushed, False))
+
+    path = []
+    if found:
+        # chuỗi jump point -> nội suy từng ô trên các đoạn thẳng/chéo
+        nid = t
+        while nid != s:
+            pid = parent[nid]
+            (r1, c1), (r0, c0) = node_rc(nid), node_rc(pid)
+            sr, sc = (r1 > r0) - (r1 < r0), (c1 > c0) - (c1 < c0)
+            for i in range(max(abs(r1 - r0), abs(c1 - c0)), 0, -1):
+                path.append((r0 + sr * i, c0 + sc * i))
+            nid = pid
+        path.append(start)
+        path.reverse()
+    return {
+        "found":    found,
+        "path":     path,
+        "explored": explored,
+        "cost":     g[t] if found else INF,
+    }
+
+
+# ---------- LPA* (tìm lại tăng dần khi sửa lưới) ----------
+def lpa_supported(heuristic_kind, eight_dir, weight, mode="astar"):
+    """
+    LPAStar chỉ giữ được path tối ưu khi W*h nhất quán: mode "astar",
+    W <= 1 và không dùng manhattan khi 8-dir (đi chéo làm h giảm 2 > √2).
+    """
+    return (mode == "astar" and float(weight) <= 1.0
+            and not (eight_dir and heuristic_kind == "manhattan"))
+
+
+class LPAStar:
+    """
+    Lifelong Planning A* (Koenig & Likhachev) cho 1 chặng start -> goal
+    cố định trên FlatGrid có thể sửa (FlatGrid.set_cell).
+    Giữ g/rhs giữa các lần sửa: cells_changed() chỉ đưa các node quanh ô
+    vừa sửa vào hàng đợi, compute() sửa lại đúng phần bị ảnh hưởng nên
+    chi phí tỉ lệ với thay đổi chứ không với kích thước map.
+
+    Khởi tạo từ state của một lượt search_flat(..., state=...) đã xong:
+    node closed có g = rhs (nhất quán), node open có g = INF, rhs = g tạm
+    -> đúng trạng thái LPA* sau lượt tìm đầu, không phải tìm lại.
+    Cần heuristic nhất quán (xem lpa_supported).
+    """
+
+    def __init__(self, fg, start, goal, state,
+                 heuristic_kind="manhattan", eight_dir=False, weight=1.0):
+        self.fg = fg
+        self.start, self.goal = tuple(start), tuple(goal)
+        self.s = fg.node_id(self.start)
+        self.t = fg.node_id(self.goal)
+        self.heuristic_kind = heuristic_kind
+        self.weight = float(weight)
+        diag_cost_is_one = (eight_dir and heuristic_kind == "chebyshev")
+        self.offsets = fg.offsets(eight_dir, diag_cost_is_one)
+        W = fg.width
+        self._around = (-W - 1, -W, -W + 1, -1, 1, W - 1, W, W + 1)
+
+        INF = float("inf")
+        self.rhs = state["g"]              # g tạm của A* = rhs
+        self.g = array("d", self.rhs)      # closed: g = rhs
+        self.bp = state["parent"]
+        self.hcache = state["hcache"]
+        self._h = make_heuristic_id(heuristic_kind, self.goal, W)
+        self.heap = []
+        for nid in set(state["open"]):
+            self.g[nid] = INF
+            self._push(nid)
+
+    def h(self, nid):
+        hv = self.hcache[nid]
+        if hv < 0.0:
+            hv = self.hcache[nid] = self._h(nid)
+        return hv
+
+    def key(self, nid):
+        k2 = min(self.g[nid], self.rhs[nid])
+        return (k2 + self.weight * self.h(nid), k2)
+
+    def _push(self, nid):
+        k1, k2 = self.key(nid)
+        heapq.heappush(self.heap, (k1, k2, nid))
+
+    @staticmethod
+    def _before(k, kt):
+        """
+        k < kt theo thứ tự key. k1 lệch nhau vài ulp (g cộng theo thứ tự
+        khác, h octile làm tròn) coi như bằng để k2 quyết định như số thực:
+        không thì node thiếu nhất quán hoà k1 với goal có thể bị bỏ sót.
+        """
+        tol = 1e-10 * max(1.0, abs(kt[0]))
+        if k[0] < kt[0] - tol:
+            return True
+        if k[0] > kt[0] + tol:
+            return False
+        return k[1] < kt[1]
+
+    def _edge_cost(self, p, off, cost, s1, s2, v):
+        """Chi phí cạnh p -> v = p + off (INF nếu bị chặn / cắt góc)."""
+        blocked = self.fg.blocked
+        if blocked[p] or blocked[v]:
+            return float("inf")
+        if s1 and (blocked[p + s1] or blocked[p + s2]):
+            return float("inf")
+        extra = self.fg.extra
+        return cost + extra[v] if extra is not None else cost
+
+    def update_vertex(self, v):
+        """Tính lại rhs(v) từ các láng giềng rồi đưa v vào hàng đợi nếu lệch."""
+        if v == self.s:
+            return
+        best, bp = float("inf"), -1
+        if not self.fg.blocked[v]:
+            g = self.g
+            for off, cost, s1, s2 in self.offsets:
+                p = v - off
+                gp = g[p]
+                if gp < best:
+                    val = gp + self._edge_cost(p, off, cost, s1, s2, v)
+                    if val < best:
+                        best, bp = val, p
+        self.rhs[v] = best
+        self.bp[v] = bp
+        if self.g[v] != best:
+            self._push(v)
+
+    def cells_changed(self, nids):
+        """Các ô nids vừa đổi tường/phụ phí: sửa rhs của chúng và 8 ô quanh
+        (ô quanh bị ảnh hưởng qua cạnh ra và qua luật chặn cắt góc)."""
+        todo = set()
+        for x in nids:
+            todo.add(x)
+            todo.update(x + d for d in self._around)
+        for v in todo:
+            self.update_vertex(v)
+
+    def _top(self):
+        """Entry hợp lệ đầu heap (bỏ entry cũ: node đã nhất quán / key đã đổi)."""
+        heap, g, rhs = self.heap, self.g, self.rhs
+        while heap:
+            k1, k2, nid = heap[0]
+            if g[nid] != rhs[nid] and (k1, k2) == self.key(nid):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def compute(self, trace=None, cancel=None):
+        """
+        ComputeShortestPath của LPA*. Ghi các bước sửa thành một chặng
+        trong trace (nếu có), giữ hợp đồng apply/undo của TraceCursor: node
+        lấy ra chưa hiện trong open thì được mở (OPENED/REOPENED) ngay trong
+        bước đó, node ở closed được cải thiện / bị mở lại thì ghi REOPENED.
+        Có thể huỷ giữa chừng: trạng thái vẫn hợp lệ, lần compute sau làm
+        tiếp. Trả về dict như search_flat.
+        """
+        fg, g, rhs, bp = self.fg, self.g, self.rhs, self.bp
+        s, t = self.s, self.t
+        offsets = self.offsets
+        node_rc = fg.node_rc
+        INF = float("inf")
+        record = trace is not None
+        if record:
+            trace.begin(self.start)
+        # open/closed mà cursor của trace thấy ở chặng này (bắt đầu: open = {start})
+        shown_open, shown_closed = {s}, set()
+        pushed = []
+        explored = 0
+        last = None
+
+        def show_open(v):
+            """Đưa v vào open hiển thị (không đổi cha) nếu chưa có."""
+            if v in shown_closed:
+                shown_closed.discard(v)
+                shown_open.add(v)
+                pushed.append((node_rc(v), REOPENED))
+            elif v not in shown_open:
+                shown_open.add(v)
+                pushed.append((node_rc(v), OPENED))
+
+        while True:
+            top = self._top()
+            if top is None or (not self._before(top, self.key(t)) and g[t] == rhs[t]):
+                break
+            if cancel is not None and explored % CANCEL_CHECK_EVERY == 0 and cancel.is_set():
+                raise SearchCancelled()
+            heapq.heappop(self.heap)
+            u = top[2]
+            explored += 1
+            if record:
+                show_open(u)
+                trace.append((node_rc(u), tuple(pushed), False))
+                shown_open.discard(u)
+                shown_closed.add(u)
+                pushed = []
+            last = u
+            if g[u] > rhs[u]:
+                # quá nhất quán: chốt g, nới các láng giềng
+                gu = g[u] = rhs[u]
+                for off, cost, s1, s2 in offsets:
+                    v = u + off
+                    if v == s:
+                        continue
+                    nv = gu + self._edge_cost(u, off, cost, s1, s2, v)
+                    if nv < rhs[v]:
+                        if record:
+                            pv = bp[v]
+                            if v in shown_open or v in shown_closed:
+                                show_open(v)
+                                pushed.append((node_rc(v), node_rc(pv if pv >= 0 else u)))
+                            else:
+                                shown_open.add(v)
+                                pushed.append((node_rc(v), None))
+                        rhs[v] = nv
+                        bp[v] = u
+                        self._push(v)
+            else:
+                # thiếu nhất quán (vd. ô vừa thành tường): mở lại u và các node
+                # đang lấy u làm cha
+                g[u] = INF
+                self.update_vertex(u)
+                requeued = [u]
+                for d in self._around:
+                    v = u + d
+                    if bp[v] == u:
+                        self.update_vertex(v)
+                        requeued.append(v)
+                if record:
+                    for v in requeued:
+                        if g[v] != rhs[v]:
+                            show_open(v)
+
+        found = g[t] < INF
+        path = self.path() if found else []
+        if record:
+            if last == t and found:
+                # bước cuối đã là goal: đánh dấu found (bỏ các push sau nó)
+                trace.steps[-1] = trace.steps[-1][:2] + (True,)
+            else:
+                # goal không phải lấy ra ở chặng này: bước kết thúc không đóng node nào
+                trace.append((None, tuple(pushed), found))
+        return {
+            "found":    found,
+            "path":     path,
+            "explored": explored,
+            "cost":     g[t] if found else INF,
+        }
+
+    def path(self):
+        """Path start -> goal: từ goal lùi về láng giềng có g + cạnh nhỏ nhất."""
+        g, s = self.g, self.s
+        nid = self.t
+        out = [nid]
+        for _ in range(self.fg.size):
+            if nid == s:
+                break
+            best, nxt = float("inf"), -1
+            for off, cost, s1, s2 in self.offsets:
+                p = nid - off
+                gp = g[p]
+                if gp < best:
+                    val = gp + self._edge_cost(p, off, cost, s1, s2, nid)
+                    if val < best:
+                        best, nxt = val, p
+            if nxt < 0:
+                return []
+            nid = nxt
+            out.append(nid)
+        else:
+            return []
+        node_rc = self.fg.node_rc
+        return [node_rc(n) for n in reversed(out)]
+
+
+def search_grid(fg, start, goal,
+                heuristic_kind="manhattan",
+                eight_dir=False,
+                mode="astar",
+                weight=1.0,
+                trace=None,
+                cancel=None,
+                open_list="heap",
+                reuse_h=False):
+    """
+    Chạy engine mảng theo mode trên FlatGrid:
+      "astar" -> search_flat, "bidirectional" -> search_flat_bidir,
+      "jps"/"jps+" -> search_jps nếu 8-dir và lưới chi phí đều (fg.uniform),
+      ngược lại lùi về search_flat.
+    open_list: open list của search_flat (OPEN_LISTS); bidir/JPS luôn dùng heap.
+    reuse_h: xem search_flat (bidir/JPS luôn tính h lười).
+    Trả về dict {"found", "path", "explored", "cost"}.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown search mode: {mode!r}")
+    if mode == "bidirectional":
+        return search_flat_bidir(fg, start, goal, heuristic_kind=heuristic_kind,
+                                 eight_dir=eight_dir, weight=weight,
+                                 trace=trace, cancel=cancel)
+    if mode in ("jps", "jps+") and eight_dir and fg.uniform:
+        return search_jps(fg, start, goal, heuristic_kind=heuristic_kind,
+                          weight=weight, plus=(mode == "jps+"),
+                          trace=trace, cancel=cancel)
+    return search_flat(fg, start, goal, heuristic_kind=heuristic_kind,
+                       eight_dir=eight_dir, weight=weight,
+                       trace=trace, cancel=cancel, open_list=open_list,
+                       reuse_h=reuse_h)
+
+
+def build_trace(grid, start, goal,
+                heuristic_kind="manhattan",
+                eight_dir=False,
+                mode="astar",
+                weight=1.0,
+                monsters=None,
+                monster_extra_cost=0.0,
+                trace=None,
+                engine="array",
+                cancel=None,
+                open_list="heap"):
+    """
+    Chạy A* và ghi kết quả vào Trace (delta) thay vì list snapshot.
+    Nếu truyền trace có sẵn thì thêm một chặng mới vào trace đó.
+    Bộ nhớ/thời gian tuyến tính theo số bước mở rộng.
+
+    mode: xem MODES / search_grid (JPS tự lùi về A* khi 4-dir hoặc có phụ
+          phí quái vật). Các mode khác "astar" luôn dùng engine mảng.
+    engine: "array" (mặc định, FlatGrid + search_flat) | "dict" (iter_steps).
+    open_list: open list của engine mảng (xem search_flat), trace không đổi.
+    grid có thể là FlatGrid dựng sẵn để dùng lại giữa nhiều lượt tìm.
+    Trace được ghi dần từng bước nên thread khác có thể đọc ngay khi đang chạy.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown search mode: {mode!r}")
+    if trace is None:
+        trace = Trace()
+    start = tuple(start)
+
+    if engine == "array" or mode != "astar" or isinstance(grid, FlatGrid):
+        fg = grid if isinstance(grid, FlatGrid) else FlatGrid(grid, monsters, monster_extra_cost)
+        res = search_grid(fg, start, goal,
+                          heuristic_kind=heuristic_kind,
+                          eight_dir=eight_dir,
+                          mode=mode,
+                          weight=weight,
+                          trace=trace,
+                          cancel=cancel,
+                          open_list=open_list)
+        trace.final_path = res["path"]
+        return trace
+
+    trace.begin(start)
+    found = False
+    for step in iter_steps(grid, start, goal,
+                           heuristic_kind=heuristic_kind,
+                           eight_dir=eight_dir,
+                           weight=weight,
+                           monsters=monsters,
+                           monster_extra_cost=monster_extra_cost,
+                           cancel=cancel):
+        trace.append(step)
+        found = step[2]
+
+    trace.final_path = trace.tree_path(len(trace) - 1) if found else []
+    return trace
+
+
+def generate_states(grid, start, goal,
+                    heuristic_kind="manhattan",
+                    eight_dir=False,
+                    mode="astar",
+                    weight=1.0,
+                    monsters=None,
+                    monster_extra_cost=0.0):
+    """
+    Trả về các trạng thái (generator) để visualize.
+    Mỗi lần yield một dict:
+      {
+        "open":   list[(r,c)],
+        "closed": list[(r,c)],
+        "path":   list[(r,c)],  # path tốt nhất tới 'current'
+        "current":(r,c) | None,
+        "found":  bool
+      }
+    f = g + W * h  (W = weight; W=1 là A* thường).
+
+    Thêm:
+    - monsters: set[(r,c)] các ô có quái vật, hoặc dict {(r,c): phụ phí}
+    - monster_extra_cost: float, phụ phí khi BƯỚC VÀO ô quái vật (monsters là set)
+
+    mode="bidirectional": 2 frontier (xuôi từ start, ngược từ goal) chung
+    open/closed; path là nhánh của frontier chứa current.
+
+    Lưu ý: mỗi bước sao chép toàn bộ open/closed (O(N²) cho cả lượt);
+    dùng build_trace() nếu chỉ cần replay.
+    """
+    if mode != "astar":
+        trace = build_trace(grid, start, goal,
+                            heuristic_kind=heuristic_kind,
+                            eight_dir=eight_dir,
+                            mode=mode,
+                            weight=weight,
+                            monsters=monsters,
+                            monster_extra_cost=monster_extra_cost)
+        for st in trace:
+            yield {
+                "open":    list(st["open"]),
+                "closed":  list(st["closed"]),
+                "path":    st["path"],
+                "current": st["current"],
+                "found":   st["found"]
+            }
+        return
+
+    start = tuple(start)
+    open_set = {start}
+    closed   = set()
+    came_from = {}
+    prev = None
+
+    for current, pushed, found in iter_steps(grid, start, goal,
+                                             heuristic_kind=heuristic_kind,
+                                             eight_dir=eight_dir,
+                                             weight=weight,
+                                             monsters=monsters,
+                                             monster_extra_cost=monster_extra_cost):
+        for node, _ in pushed:
+            came_from[node] = prev
+            open_set.add(node)
+        if current is not None:
+            open_set.discard(current)
+            closed.add(current)
+            # path tốt nhất tới current: PathView lười, chung came_from
+            path = PathView(came_from, current)
+        else:
+            path = []
+
+        yield {
+            "open":    list(open_set),
+            "closed":  list(closed),
+            "path":    path,
+            "current": current,
+            "found":   found
+        }
+        prev = current
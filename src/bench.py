@@ -0,0 +1,424 @@
+# bench.py
+"""
+Benchmark headless cho A*/Weighted A* (không mở cửa sổ Pygame).
+
+Ví dụ:
+  python -m src.bench maps --weights 1,1.5,2 --repeats 5
+  python -m src.bench maps --modes astar,bidirectional --dirs 4
+  python -m src.bench --random 500x500 --wall-density 0.05 --modes astar,jps,jps+ --dirs 8 --heuristics octile
+  python -m src.bench --random 300x300 --wall-density 0.25 --format json --out bench.json
+  python -m src.bench --scen arena.map.scen --modes astar,jps --weights 1,1.5
+  python -m src.bench --random 600x600 --dirs 4 --heuristics manhattan --open-lists heap,indexed,bucket
+  python -m src.bench maps --repeats 5 --store .cache/runs.sqlite
+
+Chế độ --scen (MovingAI): chạy mọi scenario của file .scen (8-dir octile,
+chéo = sqrt(2), không cắt góc như benchmark gốc), so chi phí với cột
+optimal và gộp thời gian theo bucket.
+
+--open-lists so các open list của search_flat (openlist.py): cột open_list
+là open list thực dùng (bucket lùi về heap khi f không nguyên, bidir/JPS
+luôn dùng heap), open_peak là kích thước open list lớn nhất.
+
+--store ghi thêm mỗi dòng vào lịch sử lượt tìm (runstore.py, source="bench",
+runtime = wall_ms_p50) để theo dõi chậm đi qua nhiều lần chạy:
+python -m src.runstore regressions --source bench.
+"""
+import argparse, csv, json, os, random, sys, time, tracemalloc
+
+from .astar import MODES, OPEN_LISTS, FlatGrid, search_grid
+from .grid import load_map, load_movingai_map, load_movingai_scen
+
+HEURISTICS = ("manhattan", "euclidean", "octile", "chebyshev")
+
+FIELDS = [
+    "map", "rows", "cols", "mode", "open_list", "heuristic", "dir", "weight", "monster_cost",
+    "monsters", "found", "explored", "open_peak", "path_len", "path_cost", "repeats",
+    "wall_ms_min", "wall_ms_mean", "wall_ms_p50", "wall_ms_p90", "wall_ms_p99",
+    "expansions_per_sec", "peak_mem_kb",
+]
+
+SCEN_FIELDS = [
+    "scen", "map", "bucket", "mode", "weight", "scenarios", "solved", "cost_ok",
+    "max_cost_err", "subopt_mean", "explored_mean",
+    "wall_ms_total", "wall_ms_mean", "wall_ms_p50", "wall_ms_p90", "wall_ms_max",
+]
+
+# sai số cho phép khi so với optimal của .scen (in sẵn 8 chữ số thập phân)
+SCEN_COST_TOL = 1e-4
+
+
+def _percentile(sorted_vals, q):
+    """Phân vị q (0..100), nội suy tuyến tính trên list đã sort."""
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * (q / 100.0)
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def _parse_list(text, cast):
+    return [cast(x.strip()) for x in str(text).split(",") if x.strip()]
+
+
+def load_case(dir_path):
+    """Đọc 1 map (kích thước thật; map.bin mmap nếu có) + key/monsters tuỳ chọn."""
+    grid, start, goal, meta = load_map(dir_path, mutable=False)
+    key = tuple(meta["key"]) if meta.get("key") else None
+    # bench quét phụ phí chung (--monster-costs): chỉ lấy vị trí, bỏ phụ phí riêng [r, c, cost]
+    monsters = {tuple(m[:2]) for m in meta.get("monsters", [])}
+    name = os.path.basename(os.path.normpath(dir_path))
+    return {"name": name, "grid": grid, "start": start, "goal": goal,
+            "key": key, "monsters": monsters}
+
+
+def random_case(rows, cols, wall_density, seed):
+    rnd = random.Random(seed)
+    grid = [[1 if rnd.random() < wall_density else 0 for _ in range(cols)] for _ in range(rows)]
+    start, goal = (0, 0), (rows - 1, cols - 1)
+    grid[0][0] = 0; grid[rows - 1][cols - 1] = 0
+    return {"name": f"random{rows}x{cols}@{wall_density:g}#{seed}", "grid": grid,
+            "start": start, "goal": goal, "key": None, "monsters": set()}
+
+
+def sprinkle_monsters(case, count, seed):
+    """Rải thêm count ô quái vật ngẫu nhiên (có seed) lên ô trống."""
+    if count <= 0:
+        return
+    rnd = random.Random(seed)
+    taken = {case["start"], case["goal"], case["key"]} | case["monsters"]
+    free = [(r, c) for r, row in enumerate(case["grid"]) for c, v in enumerate(row)
+            if v != 1 and (r, c) not in taken]
+    case["monsters"] |= set(rnd.sample(free, min(count, len(free))))
+
+
+def _run_once(fg, case, heuristic, eight_dir, weight, mode="astar", open_list="heap",
+              reuse_h=False):
+    """
+    Chạy 1 lượt (2 chặng nếu có key). reuse_h: xem search_flat.
+    Trả về (found, explored, path_len, cost, open_list, open_peak) - open_list
+    thực dùng, open_peak lớn nhất giữa các chặng ("" nếu engine không đo).
+    """
+    legs = [(case["start"], case["key"]), (case["key"], case["goal"])] if case["key"] \
+        else [(case["start"], case["goal"])]
+    explored, cost, path_len = 0, 0.0, 0
+    used, open_peak = "heap", ""
+    for a, b in legs:
+        res = search_grid(fg, a, b, heuristic_kind=heuristic,
+                          eight_dir=eight_dir, mode=mode, weight=weight,
+                          open_list=open_list, reuse_h=reuse_h)
+        explored += res["explored"]
+        used = res.get("open_list", "heap")
+        if "open_peak" in res:
+            open_peak = max(open_peak or 0, res["open_peak"])
+        if not res["found"]:
+            return False, explored, 0, 0.0, used, open_peak
+        cost += res["cost"]
+        path_len += len(res["path"]) - (1 if path_len else 0)
+    return True, explored, path_len, cost, used, open_peak
+
+
+def bench_config(fg, case, heuristic, eight_dir, weight, repeats, warmup, mode="astar",
+                 open_list="heap"):
+    # cùng goal chạy lại nhiều lần: dựng h cả lưới 1 lần rồi dùng lại
+    run = (fg, case, heuristic, eight_dir, weight, mode, open_list, repeats + warmup > 1)
+    for _ in range(warmup):
+        _run_once(*run)
+    times = []
+    out = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = _run_once(*run)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    # đo bộ nhớ ở một lượt riêng để tracemalloc không làm sai thời gian
+    tracemalloc.start()
+    _run_once(*run)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    found, explored, path_len, cost, used, open_peak = out
+    times.sort()
+    p50 = _percentile(times, 50)
+    return {
+        "open_list": used,
+        "found": found,
+        "explored": explored,
+        "open_peak": open_peak,
+        "path_len": path_len,
+        "path_cost": round(cost, 6),
+        "repeats": repeats,
+        "wall_ms_min": round(times[0], 3),
+        "wall_ms_mean": round(sum(times) / len(times), 3),
+        "wall_ms_p50": round(p50, 3),
+        "wall_ms_p90": round(_percentile(times, 90), 3),
+        "wall_ms_p99": round(_percentile(times, 99), 3),
+        "expansions_per_sec": round(explored / (p50 / 1000.0), 1) if p50 > 0 else 0.0,
+        "peak_mem_kb": round(peak / 1024.0, 1),
+    }
+
+
+def run_bench(cases, heuristics, dirs, weights, monster_costs, repeats=5, warmup=1,
+              progress=None, modes=("astar",), open_lists=("heap",)):
+    """
+    Quét mode × open list × heuristic × hướng × weight × monster cost trên
+    mọi map. Trả về list dict.
+    """
+    rows = []
+    for case in cases:
+        for mcost in monster_costs:
+            fg = FlatGrid(case["grid"], case["monsters"], mcost)
+            for eight_dir in dirs:
+                for heuristic in heuristics:
+                    for weight in weights:
+                        for mode in modes:
+                            for open_list in open_lists:
+                                row = {
+                                    "map": case["name"],
+                                    "rows": fg.rows, "cols": fg.cols,
+                                    "mode": mode,
+                                    "heuristic": heuristic,
+                                    "dir": "8-dir" if eight_dir else "4-dir",
+                                    "weight": weight,
+                                    "monster_cost": mcost,
+                                    "monsters": len(case["monsters"]),
+                                }
+                                row.update(bench_config(fg, case, heuristic, eight_dir,
+                                                        weight, repeats, warmup, mode,
+                                                        open_list))
+                                rows.append(row)
+                                if progress:
+                                    progress(row)
+    return rows
+
+
+def _scen_map_path(scen_path, map_name, map_dir=None):
+    """Tìm file .map của scenario: map_dir (hoặc thư mục .scen) + tên trong file, rồi basename."""
+    base = map_dir or os.path.dirname(os.path.abspath(scen_path))
+    for cand in (os.path.join(base, map_name), os.path.join(base, os.path.basename(map_name))):
+        if os.path.isfile(cand):
+            return cand
+    raise FileNotFoundError(f"{map_name} (looked in {base})")
+
+
+def _scen_row(scen_name, map_name, bucket, mode, weight, results):
+    """Gộp kết quả 1 bucket: results = [(ms, found, cost, explored, optimal)]."""
+    times = sorted(r[0] for r in results)
+    solved = [r for r in results if r[1]]
+    # W <= 1 phải đúng optimal; W > 1 chỉ cần trong cận cost <= W * optimal
+    bound = max(1.0, float(weight))
+    ok = sum(1 for _, _, cost, _, opt in solved
+             if cost <= bound * opt + SCEN_COST_TOL * max(1.0, opt)
+             and (bound > 1.0 or abs(cost - opt) <= SCEN_COST_TOL * max(1.0, opt)))
+    subopt = [cost / opt for _, _, cost, _, opt in solved if opt > 0]
+    return {
+        "scen": scen_name, "map": map_name, "bucket": bucket,
+        "mode": mode, "weight": weight,
+        "scenarios": len(results),
+        "solved": len(solved),
+        "cost_ok": ok,
+        "max_cost_err": round(max((abs(c - o) for _, _, c, _, o in solved), default=0.0), 6),
+        "subopt_mean": round(sum(subopt) / len(subopt), 6) if subopt else 1.0,
+        "explored_mean": round(sum(r[3] for r in results) / len(results), 1),
+        "wall_ms_total": round(sum(times), 3),
+        "wall_ms_mean": round(sum(times) / len(times), 3),
+        "wall_ms_p50": round(_percentile(times, 50), 3),
+        "wall_ms_p90": round(_percentile(times, 90), 3),
+        "wall_ms_max": round(times[-1], 3),
+    }
+
+
+def run_scenarios(scen_path, modes=("astar",), weights=(1.0,), map_dir=None, progress=None):
+    """
+    Chạy mọi scenario trong file .scen MovingAI (mỗi map nạp + dựng FlatGrid
+    1 lần) với từng mode × weight. Trả về list dict (SCEN_FIELDS), mỗi dòng
+    là 1 bucket của 1 map.
+    """
+    scen_name = os.path.basename(scen_path)
+    by_map = {}
+    for sc in load_movingai_scen(scen_path):
+        by_map.setdefault(sc["map"], []).append(sc)
+    rows = []
+    for map_name, scens in by_map.items():
+        fg = FlatGrid(load_movingai_map(_scen_map_path(scen_path, map_name, map_dir)))
+        if any((sc["rows"], sc["cols"]) != (fg.rows, fg.cols) for sc in scens):
+            raise ValueError(f"{scen_name}: {map_name} is {fg.rows}x{fg.cols}, "
+                             f"scenario says otherwise")
+        for mode in modes:
+            for weight in weights:
+                buckets = {}
+                for sc in scens:
+                    t0 = time.perf_counter()
+                    res = search_grid(fg, sc["start"], sc["goal"], heuristic_kind="octile",
+                                      eight_dir=True, mode=mode, weight=weight)
+                    ms = (time.perf_counter() - t0) * 1000.0
+                    buckets.setdefault(sc["bucket"], []).append(
+                        (ms, res["found"], res["cost"], res["explored"], sc["optimal"]))
+                for bucket in sorted(buckets):
+                    row = _scen_row(scen_name, os.path.basename(map_name), bucket,
+                                    mode, weight, buckets[bucket])
+                    rows.append(row)
+                    if progress:
+                        progress(row)
+    return rows
+
+
+def store_rows(path, cases, rows):
+    """Ghi các dòng benchmark vào RunStore ở path (1 transaction). Trả về số dòng."""
+    from .runstore import RunStore, problem_hash
+    by_name = {case["name"]: case for case in cases}
+    hashes = {}
+    runs = []
+    ts = time.time()
+    for row in rows:
+        hk = (row["map"], row["monster_cost"])
+        if hk not in hashes:
+            case = by_name[row["map"]]
+            hashes[hk] = problem_hash(case["grid"], case["monsters"], row["monster_cost"],
+                                      case["start"], case["goal"], case["key"])
+        runs.append({
+            "ts": ts, "source": "bench", "map": row["map"], "map_hash": hashes[hk],
+            "rows": row["rows"], "cols": row["cols"],
+            "mode": row["mode"], "open_list": row["open_list"], "heuristic": row["heuristic"],
+            "eight_dir": row["dir"] == "8-dir", "weight": row["weight"],
+            "monster_cost": row["monster_cost"],
+            "found": row["found"], "explored": row["explored"], "cost": row["path_cost"],
+            "runtime_ms": row["wall_ms_p50"], "repeats": row["repeats"],
+            "path_len": row["path_len"], "open_peak": row["open_peak"],
+        })
+    store = RunStore(path)
+    try:
+        return store.record_many(runs)
+    finally:
+        store.close()
+
+
+def write_rows(rows, fmt, fp, fields=FIELDS):
+    if fmt == "json":
+        json.dump(rows, fp, indent=2)
+        fp.write("\n")
+    else:
+        w = csv.DictWriter(fp, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def scen_main(ap, args):
+    """Chế độ --scen: in bảng theo bucket; exit 1 nếu có scenario sai chi phí."""
+    modes = _parse_list(args.modes, str)
+    for mode in modes:
+        if mode not in MODES:
+            ap.error(f"unknown mode: {mode}")
+
+    def progress(row):
+        print(f"{row['map']} b{row['bucket']} {row['mode']} W={row['weight']}: "
+              f"{row['cost_ok']}/{row['scenarios']} ok, {row['wall_ms_mean']:.2f} ms/scen",
+              file=sys.stderr)
+
+    rows = []
+    for path in args.scen:
+        try:
+            rows += run_scenarios(path, modes, _parse_list(args.weights, float),
+                                  map_dir=args.map_dir, progress=progress)
+        except (OSError, ValueError) as e:
+            ap.error(f"{path}: {e}")
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_rows(rows, args.format, f, SCEN_FIELDS)
+    else:
+        write_rows(rows, args.format, sys.stdout, SCEN_FIELDS)
+    bad = sum(r["scenarios"] - r["cost_ok"] for r in rows)
+    if bad:
+        print(f"{bad} scenario(s) off the .scen optimal cost", file=sys.stderr)
+    return 1 if bad else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m src.bench",
+                                 description="Headless A*/Weighted A* benchmark.")
+    ap.add_argument("maps", nargs="*",
+                    help="map directories (map.bin, or map.csv + map.json) or MovingAI .map files")
+    ap.add_argument("--scen", action="append", default=[], metavar="FILE",
+                    help="run every scenario of a MovingAI .scen file (repeatable)")
+    ap.add_argument("--map-dir", help="where the .scen maps live (default: next to the .scen)")
+    ap.add_argument("--random", action="append", default=[], metavar="RxC",
+                    help="add a seeded random map, e.g. 500x500 (repeatable)")
+    ap.add_argument("--wall-density", type=float, default=0.25)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--random-monsters", type=int, default=0, metavar="N",
+                    help="sprinkle N seeded monster cells on every map")
+    ap.add_argument("--modes", default="astar",
+                    help="comma list of: " + ", ".join(MODES))
+    ap.add_argument("--open-lists", default="heap",
+                    help="comma list of: " + ", ".join(OPEN_LISTS))
+    ap.add_argument("--heuristics", default=",".join(HEURISTICS))
+    ap.add_argument("--dirs", default="4,8", help="4, 8 or 4,8")
+    ap.add_argument("--weights", default="1.0")
+    ap.add_argument("--monster-costs", default="5.0")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--format", choices=("csv", "json"), default="csv")
+    ap.add_argument("--out", help="output file (default: stdout)")
+    ap.add_argument("--store", metavar="DB",
+                    help="also append the rows to this run store (SQLite, see src.runstore)")
+    args = ap.parse_args(argv)
+    if args.scen:
+        if args.store:
+            ap.error("--store is not supported with --scen")
+        return scen_main(ap, args)
+
+    cases = []
+    for d in args.maps:
+        try:
+            case = load_case(d)
+        except (OSError, ValueError) as e:
+            print(f"skip {d}: {e}", file=sys.stderr)
+            continue
+        if not case["grid"] or not case["grid"][0]:
+            print(f"skip {d}: empty map", file=sys.stderr)
+            continue
+        cases.append(case)
+    for spec in args.random:
+        r, c = (int(x) for x in spec.lower().split("x"))
+        cases.append(random_case(r, c, args.wall_density, args.seed))
+    if not cases:
+        ap.error("no maps to benchmark")
+    for case in cases:
+        sprinkle_monsters(case, args.random_monsters, args.seed)
+
+    heuristics = _parse_list(args.heuristics, str)
+    for hk in heuristics:
+        if hk not in HEURISTICS:
+            ap.error(f"unknown heuristic: {hk}")
+    dirs = [d == 8 for d in _parse_list(args.dirs, int)]
+    modes = _parse_list(args.modes, str)
+    for mode in modes:
+        if mode not in MODES:
+            ap.error(f"unknown mode: {mode}")
+    open_lists = _parse_list(args.open_lists, str)
+    for ol in open_lists:
+        if ol not in OPEN_LISTS:
+            ap.error(f"unknown open list: {ol}")
+
+    def progress(row):
+        print(f"{row['map']} {row['mode']}/{row['open_list']} {row['dir']} {row['heuristic']} "
+              f"W={row['weight']} M={row['monster_cost']}: {row['wall_ms_p50']:.1f} ms, "
+              f"explored {row['explored']}, open peak {row['open_peak']}", file=sys.stderr)
+
+    rows = run_bench(cases, heuristics, dirs,
+                     _parse_list(args.weights, float),
+                     _parse_list(args.monster_costs, float),
+                     repeats=max(1, args.repeats), warmup=max(0, args.warmup),
+                     progress=progress, modes=modes, open_lists=open_lists)
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_rows(rows, args.format, f)
+    else:
+        write_rows(rows, args.format, sys.stdout)
+    if args.store:
+        n = store_rows(args.store, cases, rows)
+        print(f"stored {n} rows in {args.store}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
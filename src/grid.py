@@ -1,10 +1,10 @@
 # grid.py
-import csv, json, os
+import csv, json, math, mmap, os, struct
 
 def blank(rows, cols):
     return [[0 for _ in range(cols)] for _ in range(rows)]
 
-def save_map_csv_json(grid, start, goal, dir_path):
+def save_map_csv_json(grid, start, goal, dir_path, key=None, monsters=None, checkpoints=None):
     os.makedirs(dir_path, exist_ok=True)
     csv_path = os.path.join(dir_path, "map.csv")
     json_path = os.path.join(dir_path, "map.json")
@@ -12,23 +12,102 @@ def save_map_csv_json(grid, start, goal, dir_path):
         w = csv.writer(f)
         w.writerows(grid)
     meta = {"rows": len(grid), "cols": len(grid[0]), "start": list(start), "goal": list(goal)}
+    if key is not None:
+        meta["key"] = list(key)
+    if checkpoints:
+        meta["checkpoints"] = [list(p) for p in checkpoints]
+    if monsters:
+        # dict {(r,c): phụ phí} -> [r, c, phụ phí] (mỗi loại quái vật một mức)
+        if isinstance(monsters, dict):
+            meta["monsters"] = [[r, c, float(v)] for (r, c), v in sorted(monsters.items())]
+        else:
+            meta["monsters"] = [list(m) for m in sorted(monsters)]
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(meta, f, ensure_ascii=False, indent=2)
     return csv_path, json_path
 
-def load_map_csv_json(dir_path, fallback_rows, fallback_cols):
+def load_map_meta(dir_path):
+    """Đọc map.json (start/goal/key/checkpoints/monsters...). Trả về {} nếu thiếu hoặc lỗi."""
+    json_path = os.path.join(dir_path, "map.json")
+    if not os.path.exists(json_path):
+        return {}
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except Exception:
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+# ---------- đọc CSV dạng stream ----------
+# ô "0" -> 0, chữ số khác -> 1 (khác 0 là tường, như bản đọc cũ)
+_CSV_WALL_TABLE = bytes(0 if i == ord("0") else 1 for i in range(256))
+
+
+def _csv_row(line, c0, c1):
+    """1 dòng CSV (bytes, đã strip, không rỗng) -> bytearray ô [c0:c1) (c1 None = hết dòng), 0/1."""
+    cells = line.replace(b",", b"")
+    if len(cells) == line.count(b",") + 1 and cells.isdigit():
+        # mọi ô 1 chữ số (trường hợp thường gặp): cắt + translate ở C
+        return bytearray(cells[c0:c1].translate(_CSV_WALL_TABLE))
+    vals = [int(v) for v in line.split(b",")[c0:c1]]
+    return bytearray(1 if v else 0 for v in vals)
+
+
+def read_map_csv(csv_path, window=None, progress=None):
+    """
+    Đọc map.csv từng dòng vào list bytearray (1 byte/ô, 0/1), không dựng
+    list int trung gian cho cả file.
+    - window=(r0, c0, r1, c1): chỉ lấy vùng [r0:r1) x [c0:c1) (r1/c1 None =
+      tới hết); các dòng ngoài vùng bị bỏ qua và dừng đọc sau r1.
+    - dòng trống bị bỏ qua, không tính là hàng (không sinh hàng rộng 0).
+    - progress(frac): gọi khoảng mỗi 1% file (frac 0..1) để UI vẽ tiến độ.
+    """
+    r0, c0, r1, c1 = window if window is not None else (0, 0, None, None)
+    total = max(1, os.path.getsize(csv_path))
+    step = total // 100 or 1
+    done = next_report = 0
+    out = []
+    r = 0
+    with open(csv_path, "rb") as f:
+        for line in f:
+            done += len(line)
+            cells = line.strip()
+            if cells:
+                if r1 is not None and r >= r1:
+                    break
+                if r >= r0:
+                    out.append(_csv_row(cells, c0, c1))
+                r += 1
+            if progress is not None and done >= next_report:
+                progress(done / total)
+                next_report = done + step
+    if progress is not None:
+        progress(1.0)
+    return out
+
+
+def load_map_csv_json(dir_path, fallback_rows=None, fallback_cols=None, progress=None):
+    """
+    Đọc map.csv + map.json.
+    - fallback_rows/cols: kích thước lưới trả về (map bị cắt/độn cho vừa).
+    - Nếu để None: giữ nguyên kích thước thật của CSV (dùng cho chạy headless).
+    Lưới trả về là list bytearray (1 byte/ô, đọc dạng stream - xem read_map_csv).
+    """
     csv_path = os.path.join(dir_path, "map.csv")
     json_path = os.path.join(dir_path, "map.json")
     if not os.path.exists(csv_path):
+        if fallback_rows is None or fallback_cols is None:
+            raise FileNotFoundError(csv_path)
         return blank(fallback_rows, fallback_cols), (0,0), (fallback_rows-1, fallback_cols-1)
-    with open(csv_path, newline="") as f:
-        rows = list(csv.reader(f))
-    rows = [list(map(int, r)) for r in rows]
-    nr, nc = len(rows), len(rows[0]) if rows else (0)
-    out = [[0]*fallback_cols for _ in range(fallback_rows)]
-    for r in range(min(fallback_rows, nr)):
-        for c in range(min(fallback_cols, nc)):
-            out[r][c] = 1 if rows[r][c] else 0
+    out = read_map_csv(csv_path, window=(0, 0, fallback_rows, fallback_cols), progress=progress)
+    nr, nc = len(out), len(out[0]) if out else (0)
+    if fallback_rows is None: fallback_rows = nr
+    if fallback_cols is None: fallback_cols = nc
+    # cắt/độn từng hàng cho đủ fallback_cols, thêm hàng trống cho đủ fallback_rows
+    for r, row in enumerate(out):
+        if len(row) != fallback_cols:
+            out[r] = row[:fallback_cols] + bytearray(max(0, fallback_cols - len(row)))
+    out += [bytearray(fallback_cols) for _ in range(fallback_rows - nr)]
     start = (0,0); goal = (fallback_rows-1, fallback_cols-1)
     if os.path.exists(json_path):
         try:
@@ -41,3 +120,268 @@ def load_map_csv_json(dir_path, fallback_rows, fallback_cols):
         except Exception:
             pass
     return out, start, goal
+
+# ---------- map nhị phân (map.bin) ----------
+# Header 64 byte little-endian: magic, rows, cols, start/goal/key (r, c; -1 =
+# không có), số checkpoint, số quái vật. Tiếp theo là ô lưới 1 byte/ô theo
+# hàng (0 sàn, 1 tường), rồi bảng checkpoint (r, c) và quái vật (r, c, phụ
+# phí; NaN = không có phụ phí riêng). Ô lưới nằm liền một khối ở offset cố
+# định nên mmap xong là dùng thẳng từng hàng, không tạo object Python mỗi ô.
+BIN_NAME = "map.bin"
+BIN_MAGIC = b"WAMAP\x00\x00\x01"     # byte cuối = phiên bản
+BIN_HEADER_SIZE = 64
+_BIN_HEADER = struct.Struct("<8sII6iII")
+_BIN_POINT = struct.Struct("<ii")
+_BIN_MONSTER = struct.Struct("<iid")
+_WALL_TABLE = bytes(1 if i == 1 else 0 for i in range(256))
+
+
+def _wall_bytes(row):
+    """Một hàng lưới -> bytes 0/1 (1 = tường)."""
+    try:
+        return bytes(row).translate(_WALL_TABLE)
+    except (TypeError, ValueError):
+        return bytes(1 if v == 1 else 0 for v in row)
+
+
+def save_map_bin(grid, start, goal, dir_path, key=None, monsters=None, checkpoints=None):
+    """Ghi dir_path/map.bin (xem BinMap). monsters: set hoặc dict {(r,c): phụ phí}."""
+    os.makedirs(dir_path, exist_ok=True)
+    bin_path = os.path.join(dir_path, BIN_NAME)
+    rows = len(grid)
+    cols = len(grid[0]) if rows else 0
+    checkpoints = list(checkpoints or ())
+    if isinstance(monsters, dict):
+        mons = sorted(monsters.items())
+    else:
+        mons = [(m, math.nan) for m in sorted(monsters or ())]
+    def rc(p):
+        return (int(p[0]), int(p[1])) if p is not None else (-1, -1)
+    header = _BIN_HEADER.pack(BIN_MAGIC, rows, cols, *rc(start), *rc(goal), *rc(key),
+                              len(checkpoints), len(mons))
+    tmp_path = bin_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(BIN_HEADER_SIZE, b"\x00"))
+        for row in grid:
+            f.write(_wall_bytes(row))
+        for p in checkpoints:
+            f.write(_BIN_POINT.pack(*rc(p)))
+        for (r, c), v in mons:
+            f.write(_BIN_MONSTER.pack(r, c, float(v)))
+    os.replace(tmp_path, bin_path)   # không để lại file ghi dở
+    return bin_path
+
+
+class BinMap:
+    """
+    map.bin đã mmap (chỉ đọc). cells: memoryview rows*cols byte 0/1.
+    - grid_view(): list memoryview từng hàng (không sao chép; cho
+      FlatGrid/planner chạy headless).
+    - grid(): list bytearray từng hàng (sửa được, cho UI).
+    - meta(): dict như map.json (start/goal/key/checkpoints/monsters).
+    Giữ mở tới khi close() (hoặc dùng with); close() khi còn view từ
+    grid_view() sống -> BufferError, nên không close thì cứ để GC dọn.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:   # file rỗng
+                raise ValueError(f"{path}: not a map.bin file") from None
+        try:
+            self._parse(path)
+        except BaseException:
+            self._mm.close()
+            raise
+
+    def _parse(self, path):
+        mm = self._mm
+        if len(mm) < BIN_HEADER_SIZE:
+            raise ValueError(f"{path}: not a map.bin file")
+        (magic, rows, cols, sr, sc, gr, gc, kr, kc,
+         n_cp, n_mon) = _BIN_HEADER.unpack_from(mm, 0)
+        if magic != BIN_MAGIC:
+            raise ValueError(f"{path}: not a map.bin file (or unsupported version)")
+        off = BIN_HEADER_SIZE + rows * cols
+        end = off + n_cp * _BIN_POINT.size + n_mon * _BIN_MONSTER.size
+        if len(mm) < end:
+            raise ValueError(f"{path}: truncated map.bin")
+        self.rows, self.cols = rows, cols
+        self.cells = memoryview(mm)[BIN_HEADER_SIZE:BIN_HEADER_SIZE + rows * cols]
+        self.start = (sr, sc) if sr >= 0 else None
+        self.goal = (gr, gc) if gr >= 0 else None
+        self.key = (kr, kc) if kr >= 0 else None
+        self.checkpoints = [tuple(p) for p in _BIN_POINT.iter_unpack(
+            mm[off:off + n_cp * _BIN_POINT.size])]
+        off += n_cp * _BIN_POINT.size
+        self.monsters = {(r, c): v for r, c, v in _BIN_MONSTER.iter_unpack(
+            mm[off:off + n_mon * _BIN_MONSTER.size])}
+
+    def grid_view(self):
+        cols, cells = self.cols, self.cells
+        return [cells[r * cols:(r + 1) * cols] for r in range(self.rows)]
+
+    def grid(self):
+        cols, cells = self.cols, self.cells
+        return [bytearray(cells[r * cols:(r + 1) * cols]) for r in range(self.rows)]
+
+    def monster_costs(self, default=0.0):
+        """dict {(r,c): phụ phí}; ô không có phụ phí riêng (NaN) lấy default."""
+        return {rc: (default if math.isnan(v) else v) for rc, v in self.monsters.items()}
+
+    def meta(self):
+        meta = {"rows": self.rows, "cols": self.cols}
+        for name in ("start", "goal", "key"):
+            if getattr(self, name) is not None:
+                meta[name] = list(getattr(self, name))
+        if self.checkpoints:
+            meta["checkpoints"] = [list(p) for p in self.checkpoints]
+        if self.monsters:
+            meta["monsters"] = [[r, c] if math.isnan(v) else [r, c, v]
+                                for (r, c), v in sorted(self.monsters.items())]
+        return meta
+
+    def close(self):
+        self.cells.release()
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_map_bin(dir_path):
+    """Mở dir_path/map.bin (BinMap)."""
+    return BinMap(os.path.join(dir_path, BIN_NAME))
+
+
+def load_map(dir_path, mutable=True, progress=None):
+    """
+    Đọc map trong dir_path: map.bin nếu có, không thì map.csv + map.json.
+    dir_path cũng có thể là file .map MovingAI (start/goal mặc định 2 góc).
+    Trả về (grid, start, goal, meta); meta như load_map_meta.
+    mutable=False: grid từ map.bin là các hàng memoryview chỉ đọc trên mmap
+    (không sao chép, đủ cho tìm đường headless); True: bytearray sửa được.
+    progress(frac): xem read_map_csv (map.bin/.map nạp đủ nhanh, không báo).
+    """
+    if dir_path.endswith(".map") and os.path.isfile(dir_path):
+        grid = load_movingai_map(dir_path)
+        return grid, (0, 0), (len(grid) - 1, len(grid[0]) - 1 if grid else -1), {}
+    if not os.path.exists(os.path.join(dir_path, BIN_NAME)):
+        grid, start, goal = load_map_csv_json(dir_path, progress=progress)
+        return grid, start, goal, load_map_meta(dir_path)
+    bm = load_map_bin(dir_path)
+    if mutable:
+        grid = bm.grid()
+        bm.close()
+    else:
+        grid = bm.grid_view()   # view giữ mmap sống, không close
+    rows, cols = bm.rows, bm.cols
+    start = bm.start or (0, 0)
+    goal = bm.goal or (rows - 1, cols - 1)
+    return grid, start, goal, bm.meta()
+
+
+def load_map_window(dir_path, r0, c0, r1, c1):
+    """
+    Chỉ đọc vùng [r0:r1) x [c0:c1) của map trong dir_path (map.bin: cắt
+    trên mmap; CSV: bỏ qua dòng ngoài vùng, dừng sau r1) -> list bytearray.
+    Dùng để xem trước một phần map rất lớn mà không nạp cả map.
+    UI không dùng hàm này: tìm đường cần cả lưới, còn render chỉ vẽ các ô
+    quanh camera từ lưới đã nạp (Camera.layer_window).
+    """
+    if os.path.exists(os.path.join(dir_path, BIN_NAME)):
+        with load_map_bin(dir_path) as bm:
+            cols, cells = bm.cols, bm.cells
+            c1 = min(c1, cols)
+            return [bytearray(cells[r * cols + c0:r * cols + c1])
+                    for r in range(max(0, r0), min(r1, bm.rows))]
+    return read_map_csv(os.path.join(dir_path, "map.csv"), window=(r0, c0, r1, c1))
+
+
+def convert_csv_to_bin(dir_path):
+    """map.csv + map.json -> map.bin trong cùng thư mục."""
+    grid, start, goal = load_map_csv_json(dir_path)
+    meta = load_map_meta(dir_path)
+    monsters = {}
+    for m in meta.get("monsters", []):
+        monsters[(m[0], m[1])] = float(m[2]) if len(m) > 2 else math.nan
+    return save_map_bin(grid, start, goal, dir_path, key=meta.get("key"),
+                        monsters=monsters, checkpoints=meta.get("checkpoints"))
+
+
+# ---------- MovingAI (.map / .scen) ----------
+# https://movingai.com/benchmarks/formats.html
+# ".", "G": đất, "S": đầm lầy (đi được, cùng chi phí); "@", "O", "T", "W": chặn.
+_MOVINGAI_TABLE = bytes(0 if chr(i) in ".GS" else 1 for i in range(256))
+
+
+def load_movingai_map(path):
+    """
+    Đọc file .map MovingAI (kích thước thật) -> list bytearray từng hàng,
+    0 = đi được, 1 = chặn. Đọc từng dòng + bytes.translate nên map lớn
+    không tạo object Python cho từng ô.
+    """
+    header = {}
+    grid = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line.lower() == b"map":
+                break
+            k, _, v = line.partition(b" ")
+            header[k.lower()] = v.strip()
+        else:
+            raise ValueError(f"{path}: missing 'map' line")
+        try:
+            rows, cols = int(header[b"height"]), int(header[b"width"])
+        except (KeyError, ValueError):
+            raise ValueError(f"{path}: bad .map header") from None
+        for line in f:
+            line = line.rstrip(b"\r\n")
+            if len(grid) == rows:
+                if line.strip():
+                    raise ValueError(f"{path}: more than {rows} rows")
+                continue
+            if len(line) != cols:
+                raise ValueError(f"{path}: row {len(grid)} has {len(line)} cells, expected {cols}")
+            grid.append(bytearray(line.translate(_MOVINGAI_TABLE)))
+    if len(grid) != rows:
+        raise ValueError(f"{path}: {len(grid)} rows, expected {rows}")
+    return grid
+
+
+def load_movingai_scen(path):
+    """
+    Đọc file .scen MovingAI -> list dict {"bucket", "map", "rows", "cols",
+    "start", "goal", "optimal"}; start/goal là (r, c) = (y, x) của file.
+    """
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            parts = line.rstrip("\r\n").split("\t")
+            if len(parts) < 9:
+                parts = line.split()
+            if not parts or parts[0].lower() == "version":
+                continue
+            if len(parts) < 9:
+                raise ValueError(f"{path}:{n}: bad scenario line")
+            try:
+                bucket, cols, rows, sx, sy, gx, gy = (int(v) for v in
+                                                      (parts[0], *parts[2:8]))
+                optimal = float(parts[8])
+            except ValueError:
+                raise ValueError(f"{path}:{n}: bad scenario line") from None
+            out.append({"bucket": bucket, "map": parts[1], "rows": rows, "cols": cols,
+                        "start": (sy, sx), "goal": (gy, gx), "optimal": optimal})
+    return out
+
+
+if __name__ == "__main__":
+    # python -m src.grid maps/...: chuyển map CSV sang map.bin
+    import sys
+    for d in sys.argv[1:]:
+        print(convert_csv_to_bin(d))
@@ -0,0 +1,119 @@
+# heuristics.py
+"""
+Heuristic chọn sẵn 1 lần cho mỗi lượt tìm (goal gắn vào closure) thay cho
+_heuristic(a, b, kind) dò chuỗi kind ở mỗi lần push.
+
+- make_heuristic(kind, goal):           h((r, c))
+- make_heuristic_id(kind, goal, width): h(id) cho id có viền của FlatGrid
+- heuristic_field(kind, goal, rows, cols): h của cả lưới (theo id có viền)
+  tính 1 lượt bằng NumPy, dùng lại cho nhiều lượt tìm tới cùng goal.
+  NumPy chỉ được import ở lần gọi đầu tiên, nên import astar/planner/bench
+  không phải trả ~60 ms import NumPy khi không cần tới.
+
+Giá trị trùng từng bit với _heuristic (cùng thứ tự phép tính) nên thứ tự
+mở rộng không đổi.
+"""
+import math
+from array import array
+from importlib.util import find_spec
+
+# NumPy là tuỳ chọn: không có thì chỉ dùng bản callable
+HAVE_NUMPY = find_spec("numpy") is not None
+_np = None
+
+KINDS = ("manhattan", "euclidean", "octile", "chebyshev")
+_OCT = math.sqrt(2.0) - 1.0
+
+
+def make_heuristic(kind, goal):
+    """Callable h((r, c)) -> ước lượng tới goal theo kind (kind lạ -> 0)."""
+    gr, gc = goal
+    hypot = math.hypot
+    if kind == "manhattan":
+        def h(rc):
+            return abs(rc[0] - gr) + abs(rc[1] - gc)
+    elif kind == "euclidean":
+        def h(rc):
+            return hypot(abs(rc[0] - gr), abs(rc[1] - gc))
+    elif kind == "octile":
+        def h(rc):
+            dx = abs(rc[0] - gr); dy = abs(rc[1] - gc)
+            return (dx if dx > dy else dy) + _OCT * (dy if dx > dy else dx)
+    elif kind == "chebyshev":
+        def h(rc):
+            dx = abs(rc[0] - gr); dy = abs(rc[1] - gc)
+            return dx if dx > dy else dy
+    else:
+        def h(rc):
+            return 0.0
+    return h
+
+
+def make_heuristic_id(kind, goal, width):
+    """Như make_heuristic nhưng nhận id có viền: id = (r+1)*width + (c+1)."""
+    # so trực tiếp với goal đã dịch theo viền, khỏi trừ 1 mỗi lần
+    gr, gc = goal[0] + 1, goal[1] + 1
+    hypot = math.hypot
+    if kind == "manhattan":
+        def h(nid):
+            r, c = divmod(nid, width)
+            return abs(r - gr) + abs(c - gc)
+    elif kind == "euclidean":
+        def h(nid):
+            r, c = divmod(nid, width)
+            return hypot(abs(r - gr), abs(c - gc))
+    elif kind == "octile":
+        def h(nid):
+            r, c = divmod(nid, width)
+            dx = abs(r - gr); dy = abs(c - gc)
+            return (dx if dx > dy else dy) + _OCT * (dy if dx > dy else dx)
+    elif kind == "chebyshev":
+        def h(nid):
+            r, c = divmod(nid, width)
+            dx = abs(r - gr); dy = abs(c - gc)
+            return dx if dx > dy else dy
+    else:
+        def h(nid):
+            return 0.0
+    return h
+
+
+def _numpy():
+    """Module numpy (import lười ở lần đầu), None nếu không cài."""
+    global _np, HAVE_NUMPY
+    if _np is None and HAVE_NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            HAVE_NUMPY = False
+            return None
+        _np = numpy
+    return _np
+
+
+def heuristic_field(kind, goal, rows, cols):
+    """
+    array('d') kích thước (rows+2)*(cols+2): h của mọi ô theo id có viền
+    (ô viền cũng có giá trị, không dùng tới). Cần NumPy; không có thì
+    trả về None để engine tính lười từng node bằng make_heuristic_id.
+    """
+    np = _numpy()
+    if np is None:
+        return None
+    gr, gc = goal[0] + 1, goal[1] + 1
+    dx = np.abs(np.arange(rows + 2, dtype=np.float64) - gr)[:, None]
+    dy = np.abs(np.arange(cols + 2, dtype=np.float64) - gc)[None, :]
+    if kind == "manhattan":
+        field = dx + dy
+    elif kind == "euclidean":
+        # sqrt(dx²+dy²) với số nguyên trùng bit với math.hypot (np.hypot thì không)
+        field = np.sqrt(dx * dx + dy * dy)
+    elif kind == "octile":
+        field = np.maximum(dx, dy) + _OCT * np.minimum(dx, dy)
+    elif kind == "chebyshev":
+        field = np.maximum(dx, dy)
+    else:
+        field = np.zeros((rows + 2, cols + 2))
+    out = array("d")
+    out.frombytes(np.ascontiguousarray(field, dtype=np.float64).tobytes())
+    return out
@@ -3,9 +3,15 @@ import sys, os, pygame, time
 from . import settings as S
 from .ui import Button, Segmented, Dropdown, PanelBox
 from .astar import generate_states
-from .assets import load_all, asset_path
-from .sprite import load_sheet, Animator
-import math
+from .worker import SearchWorker
+from .planner import (TRACE_CACHE, Replanner, build_cached, search_key,
+                      compute_metrics, trace_nbytes)
+from .assets import ASSETS, AssetLoader
+from .sprite import Animator
+from .pacing import FramePacer, Playback
+from .render import Camera, TileCache, BackgroundLayer, OverlayLayers, DirtyRegions
+from .grid import load_map
+from .runstore import RunStore, problem_hash
 import random
 
 from enum import Enum
@@ -14,74 +20,18 @@ from enum import Enum
 def game_area_height():
     return S.HEIGHT - (S.TOP_PANEL_H + S.BOTTOM_PANEL_H)
 
-def compute_square_cell_and_margins(rows, cols, right_panel_w):
-    """Game area = phần còn lại (trừ top, bottom, sidebar phải). Cell luôn VUÔNG."""
-    game_h = game_area_height()
-    usable_w = S.WIDTH - right_panel_w
-    cell = max(4, min(usable_w // cols, game_h // rows))
-    mx = (usable_w - cols * cell) // 2
-    my = S.TOP_PANEL_H + (game_h - rows * cell) // 2
-    return cell, mx, my
-
-# ---- TWO-LEG BUILDER: Start -> Key -> Goal ----
-def build_two_leg_states(grid, start, key_pos, goal, monsters,
-                         heuristic_kind, eight_dir, weight, monster_cost):
-    """
-    Tạo list states bằng cách ghép 2 lần generate_states:
-      1) start -> key_pos
-      2) key_pos -> goal
-    Nếu không có key_pos, chạy thẳng start -> goal.
-    """
-    from .astar import generate_states  # tránh import vòng
-
-    if key_pos:
-        seg1 = list(generate_states(
-            grid, start, key_pos,
-            heuristic_kind=heuristic_kind,
-            eight_dir=eight_dir,
-            weight=weight,
-            monsters=monsters,
-            monster_extra_cost=monster_cost
-        ))
-        # không tới được Key -> trả về kết quả chặng 1
-        if not seg1 or not seg1[-1].get("found"):
-            return seg1
-
-        seg2 = list(generate_states(
-            grid, key_pos, goal,
-            heuristic_kind=heuristic_kind,
-            eight_dir=eight_dir,
-            weight=weight,
-            monsters=monsters,
-            monster_extra_cost=monster_cost
-        ))
-        states = seg1 + seg2
-
-        # vá path cuối = path1 + path2[1:] để không lặp node Key
-        if seg2 and seg2[-1].get("found"):
-            full_path = list(seg1[-1].get("path", [])) + list(seg2[-1].get("path", [])[1:])
-            states[-1] = dict(states[-1])
-            states[-1]["path"] = full_path
-        return states
-
-    # Không có key -> chạy thẳng
-    return list(generate_states(
-        grid, start, goal,
-        heuristic_kind=heuristic_kind,
-        eight_dir=eight_dir,
-        weight=weight,
-        monsters=monsters,
-        monster_extra_cost=monster_cost
-    ))
+MAP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "maps")
 
 def to_rect(rc, CELL, MX, MY, camx, camy):
     r, c = rc
     return pygame.Rect(MX + c*CELL - camx, MY + r*CELL - camy, CELL, CELL)
 
 def mouse_rc(mx, my, rows, cols, CELL, MX, MY, camx, camy, right_panel_x):
-    # không nhận click trong sidebar
+    # không nhận click trong sidebar / thanh trên / thanh dưới
     if mx >= right_panel_x:
         return None
+    if not (S.TOP_PANEL_H <= my < S.HEIGHT - S.BOTTOM_PANEL_H):
+        return None
     gx = mx - MX + camx
     gy = my - MY + camy
     c = int(gx // CELL)
@@ -100,6 +50,26 @@ def get_history_rect():
     panel_y = S.TOP_PANEL_H + (game_area_height() - panel_h) // 2
     return pygame.Rect(panel_x, panel_y, panel_w, panel_h)
 
+# Dòng History từ 1 lượt của RunStore (cột cấu hình + kết quả + nhãn hiển thị)
+def history_item(run):
+    item = {
+        "id": run["id"],
+        "heuristic": run["heuristic"],
+        "eight_dir": bool(run["eight_dir"]),
+        "weight": float(run["weight"]),
+        "mode": run["mode"],
+        "replan": bool(run["replan"]),
+        "explored": int(run["explored"] or 0),
+        "cost": float(run["cost"] or 0.0),
+        "runtime_ms": float(run["runtime_ms"] or 0.0),
+        "timestamp": run["ts"],
+    }
+    dir_lbl = "8-dir" if item["eight_dir"] else "4-dir"
+    if item["mode"] != "astar": dir_lbl += f" {item['mode']}"
+    if item["replan"]: dir_lbl += " replan"
+    item["label"] = f"{dir_lbl} | H:{item['heuristic']} | W:{item['weight']:.2f} → explored:{item['explored']}, path:{item['cost']:.2f}, time:{item['runtime_ms']:.1f}ms"
+    return item
+
 # ---------- drawing ----------
 def blit_scaled(screen, img, rect):
     if img:
@@ -108,16 +78,33 @@ def blit_scaled(screen, img, rect):
         else:
             screen.blit(pygame.transform.scale(img, (rect.w, rect.h)), rect.topleft)
 
-def draw_cell_base(screen, grid, rc, CELL, MX, MY, camx, camy, assets):
-    rect = to_rect(rc, CELL, MX, MY, camx, camy)
-    if grid[rc[0]][rc[1]] == 1:
-        img = assets.get("wall")
-        if img: blit_scaled(screen, img, rect)
-        else:   pygame.draw.rect(screen, (65,70,80), rect)
+def marker_rect(rc, CELL, MX, MY, camx, camy):
+    """Ô của chấm màu thay sprite khi zoom xa (LOD): ít nhất 3px để còn thấy được."""
+    size = max(3, int(CELL))
+    cx = MX + (rc[1] + 0.5) * CELL - camx
+    cy = MY + (rc[0] + 0.5) * CELL - camy
+    return (int(cx - size / 2), int(cy - size / 2), size, size)
+
+# Sprite vùng game dựng thành item so sánh được giữa 2 frame (dirty rectangle):
+#   ("img", surf, (x, y)) | ("circle", color, (cx, cy), radius) | ("rect", color, (x, y, w, h))
+def item_rect(item):
+    """Hình chữ nhật màn hình mà item vẽ lên."""
+    kind = item[0]
+    if kind == "img":
+        return pygame.Rect(item[2], item[1].get_size())
+    if kind == "circle":
+        (cx, cy), rad = item[2], item[3]
+        return pygame.Rect(cx - rad - 1, cy - rad - 1, 2*rad + 3, 2*rad + 3)
+    return pygame.Rect(item[2])
+
+def draw_item(screen, item):
+    kind = item[0]
+    if kind == "img":
+        screen.blit(item[1], item[2])
+    elif kind == "circle":
+        pygame.draw.circle(screen, item[1], item[2], item[3])
     else:
-        img = assets.get("floor")
-        if img: blit_scaled(screen, img, rect)
-        else:   pygame.draw.rect(screen, S.WHITE, rect)
+        pygame.draw.rect(screen, item[1], item[2])
 
 def draw_overlay(screen, rc, kind, CELL, MX, MY, camx, camy, assets):
     rect = to_rect(rc, CELL, MX, MY, camx, camy)
@@ -139,14 +126,6 @@ def draw_overlay(screen, rc, kind, CELL, MX, MY, camx, camy, assets):
         ov.fill((*color, alpha))
         screen.blit(ov, rect.topleft)
 
-def draw_grid_lines(screen, rows, cols, CELL, MX, MY, camx, camy):
-    for r in range(rows+1):
-        y = MY + r*CELL - camy
-        pygame.draw.line(screen, S.GRIDC, (MX, y), (MX + cols*CELL, y), 1)
-    for c in range(cols+1):
-        x = MX + c*CELL - camx
-        pygame.draw.line(screen, S.GRIDC, (x, MY), (x, MY + rows*CELL), 1)
-
 # ---------- sprites ----------
 def scale_frames_to_cell(frames, CELL):
     out = []
@@ -176,28 +155,11 @@ def scale_frames_to_cell_monster(frames, CELL):
         out.append(pygame.transform.scale(f, (max(1,int(fw*sc)), max(1,int(fh*sc)))))
     return out
 
-def _load_strip_by_cols(path, cols):
-    """Load 1 hàng sprite, tự suy frame_w từ sw//cols."""
-    try:
-        sheet = pygame.image.load(path).convert_alpha()
-    except Exception:
-        return []
-    sw, sh = sheet.get_size()
-    cols = max(1, int(cols))
-    fw = sw // cols
-    fh = sh
-    frames = []
-    for i in range(cols):
-        rect = pygame.Rect(i*fw, 0, fw, fh)
-        frames.append(sheet.subsurface(rect).copy())
-    return frames
-
 def load_monster_variants(CELL):
     """Trả về list variants: {"name", "right":[...], "left":[...]}"""
     variants = []
     for fname, cols in getattr(S, "MONSTER_SPECS", []):
-        path = asset_path(fname)
-        frames_r = _load_strip_by_cols(path, cols)
+        frames_r = ASSETS.strip_frames(fname, cols)   # 1 hàng, frame_w = rộng // cols
         frames_r = scale_frames_to_cell_monster(frames_r, CELL)
         frames_l = [pygame.transform.flip(f, True, False) for f in frames_r]
         variants.append({"name": fname, "right": frames_r, "left": frames_l})
@@ -207,10 +169,8 @@ def load_key_frames(CELL):
     """Load từng frame của key (4 ảnh rời), scale vừa ô."""
     frames = []
     for i in range(4):
-        path = asset_path(f"key_{i}.png")
-        try:
-            img = pygame.image.load(path).convert_alpha()
-        except Exception:
+        img = ASSETS.image(f"key_{i}.png")
+        if img is None:
             continue
         fw, fh = img.get_size()
         sc = min((CELL * 0.9) / fw, (CELL * 0.9) / fh)
@@ -222,10 +182,8 @@ def load_chest_frames(CELL):
     idle, opened = [], []
     for i in range(4):
         for prefix, bucket in (("chest_idle", idle), ("chest_open", opened)):
-            path = asset_path(f"{prefix}_{i}.png")
-            try:
-                img = pygame.image.load(path).convert_alpha()
-            except Exception:
+            img = ASSETS.image(f"{prefix}_{i}.png")
+            if img is None:
                 continue
             fw, fh = img.get_size()
             sc = min((CELL * 0.95) / fw, (CELL * 0.95) / fh)
@@ -236,10 +194,8 @@ def load_flag_frames(CELL):
     """Load 4 frame cờ start: flag_0..3, scale vừa 1 ô."""
     frames = []
     for i in range(4):
-        path = asset_path(f"flag_{i}.png")
-        try:
-            img = pygame.image.load(path).convert_alpha()
-        except Exception:
+        img = ASSETS.image(f"flag_{i}.png")
+        if img is None:
             continue
         fw, fh = img.get_size()
         sc = min((CELL * 0.95) / fw, (CELL * 0.95) / fh)
@@ -247,43 +203,43 @@ def load_flag_frames(CELL):
     return frames
 
 def load_sheet_rows(file, cols, CELL):
-    path = asset_path(file)
     rows = {}
     cols_arg = None if (cols is None or cols <= 0) else cols
     for row in (S.ROW_DOWN, S.ROW_LEFT, S.ROW_RIGHT, S.ROW_UP):
-        base = load_sheet(path, S.FRAME_W, S.FRAME_H, row=row, cols=cols_arg)
+        base = ASSETS.sheet_frames(file, S.FRAME_W, S.FRAME_H, row=row, cols=cols_arg)
         base = scale_frames_to_cell(base, CELL)
         rows[row] = base
     return rows
 
+def empty_sprite_set():
+    """Bộ frame rỗng (cùng dạng load_sprite_set) khi asset chưa nạp xong: vẽ bằng màu thay thế."""
+    rows = (S.ROW_DOWN, S.ROW_LEFT, S.ROW_RIGHT, S.ROW_UP)
+    return {
+        "idle": {row: [] for row in rows},
+        "walk": {row: [] for row in rows},
+        "monsters": [{"name": fname, "right": [], "left": []}
+                     for fname, _ in getattr(S, "MONSTER_SPECS", [])],
+        "key": [], "chest_idle": [], "chest_open": [], "flag": [],
+    }
+
+def load_sprite_set(CELL):
+    """Mọi bộ frame động scale theo CELL (cache/atlas qua ASSETS.frame_set)."""
+    chest_idle, chest_open = load_chest_frames(CELL)
+    return {
+        "idle": load_sheet_rows(S.IDLE_FILE, S.IDLE_COLS, CELL),
+        "walk": load_sheet_rows(S.WALK_FILE, S.WALK_COLS, CELL),
+        "monsters": load_monster_variants(CELL),
+        "key": load_key_frames(CELL),
+        "chest_idle": chest_idle,
+        "chest_open": chest_open,
+        "flag": load_flag_frames(CELL),
+    }
+
 def pick_row(dr, dc):
     if abs(dr) >= abs(dc):
         return S.ROW_DOWN if dr>0 else (S.ROW_UP if dr<0 else S.ROW_DOWN)
     return S.ROW_RIGHT if dc>0 else S.ROW_LEFT
 
-def _step_cost(r0, c0, r1, c1):
-    dr, dc = abs(r1 - r0), abs(c1 - c0)
-    if dr == 1 and dc == 1:
-        return 1.0 if getattr(S, "HEURISTIC", "manhattan") == "chebyshev" else math.sqrt(2.0)
-    return 1.0
-
-def compute_metrics(states, monsters=None, monster_extra_cost=0.0):
-    """Tính (explored_count, total_cost) — total_cost gồm bước đi + phụ phí khi bước vào ô Monster."""
-    if not states:
-        return 0, 0.0
-    last = states[-1]
-    explored = len(last.get("closed", []))
-    path = last.get("path", [])
-    cost = 0.0
-    for i in range(1, len(path)):
-        r0, c0 = path[i-1]
-        r1, c1 = path[i]
-        cost += _step_cost(r0, c0, r1, c1)
-        if monsters and (r1, c1) in monsters:
-            cost += float(monster_extra_cost)
-    return explored, cost
-
-
 # ---------- NEW: Tools / Inventory ----------
 class Tool(Enum):
     START = "start"
@@ -291,6 +247,7 @@ class Tool(Enum):
     KEY = "key"
     WALL = "wall"
     MONSTER = "monster"
+    CHECKPOINT = "checkpoint"
 
 INVENTORY_MAX = {
     Tool.START: 1,
@@ -298,6 +255,7 @@ INVENTORY_MAX = {
     Tool.KEY: 1,
     Tool.WALL: float("inf"),
     Tool.MONSTER: float("inf"),
+    Tool.CHECKPOINT: int(getattr(S, "MAX_CHECKPOINTS", 8)),
 }
 
 # ===== Monster picker =====
@@ -322,6 +280,7 @@ def get_monster_picker_rect():
 # Màu vẽ fallback
 COLOR_KEY = (240, 200, 0)
 COLOR_MONSTER = (200, 40, 40)
+COLOR_CHECKPOINT = (150, 80, 220)
 COLOR_TOOL_HILITE = (70, 90, 140)
 
 # ---------- main ----------
@@ -330,7 +289,8 @@ def run():
     print(pygame.version.ver)
     screen = pygame.display.set_mode((S.WIDTH, S.HEIGHT))
     pygame.display.set_caption("A* Pathfinding Visualizer")
-    clock = pygame.time.Clock()
+    # nhịp vòng lặp: đủ S.FPS khi bận, chờ sự kiện khi rảnh
+    pacer = FramePacer(S.FPS, getattr(S, "IDLE_WAIT_MS", 1000))
 
     # fonts
     title_font = pygame.font.SysFont(S.UI_FONT_NAME, S.TITLE_FONT_SIZE, bold=True)
@@ -345,38 +305,55 @@ def run():
     SIDEPAD = 8
 
     # Map presets
-    MAP_PRESETS = [(10,15), (15,20), (20,30), (30,40)]
-    preset_names= ["S","M","L","XL"]
+    MAP_PRESETS = [(10,15), (15,20), (20,30), (30,40), (200,300), (2000,2000)]
+    preset_names= ["S","M","L","XL","XXL","2000"]
     preset_idx  = 2
     ROWS, COLS = MAP_PRESETS[preset_idx]
 
-    # layout cell/margins
-    CELL, MX, MY = compute_square_cell_and_margins(ROWS, COLS, RIGHT_W)
-    camx = camy = 0
+    # layout cell/margins: Camera lo pan/zoom trên camx/camy
+    GAME_RECT = pygame.Rect(0, S.TOP_PANEL_H, S.WIDTH - RIGHT_W, game_area_height())
+    camera = Camera(GAME_RECT)
+    camera.set_map(ROWS, COLS)
+    CELL, MX, MY = camera.layout()
+    camx, camy = camera.camx, camera.camy
+    panning = False   # đang kéo chuột giữa để pan
 
     # data
     grid  = [[0 for _ in range(COLS)] for _ in range(ROWS)]
     start = None; goal = None
     key_pos = None
-    monsters = set()
+    checkpoints = []   # waypoint theo thứ tự đặt (thứ tự đi do planner tối ưu)
+    monsters = {}   # (r,c) -> phụ phí của loại quái vật đứng ở ô đó
     monsters_info = {}
 
     # Inventory
     inventory_left = {t: (INVENTORY_MAX[t] if INVENTORY_MAX[t] != float("inf") else float("inf")) for t in Tool}
     current_tool = Tool.WALL
 
-    assets = load_all(None)
-    idle_rows = load_sheet_rows(S.IDLE_FILE, S.IDLE_COLS, CELL)
-    walk_rows = load_sheet_rows(S.WALK_FILE, S.WALK_COLS, CELL)
+    # asset nạp trên thread nền (ASYNC_ASSETS): frame đầu hiện ngay với ô màu
+    # thay thế, nạp xong thì apply_loaded_assets thay ảnh/sprite vào
+    asset_loader = AssetLoader(CELL, load_sprite_set).start()
+    if not getattr(S, "ASYNC_ASSETS", True):
+        asset_loader.join()
+    assets = dict.fromkeys(("floor", "wall", "start", "goal"))
+    # nền tĩnh (floor/wall/lưới) scale sẵn theo CELL, chỉ vẽ lại ô bị sửa
+    tiles = TileCache(assets)
+    background = BackgroundLayer(tiles)
+    overlays = OverlayLayers()
+    # vùng màn hình đổi trong frame: chỉ vẽ lại + display.update các vùng đó
+    redraw = DirtyRegions(screen.get_rect())
+    sprite_cell = CELL   # CELL mà sprite đang được scale theo
+    sprites = empty_sprite_set()
+    idle_rows, walk_rows = sprites["idle"], sprites["walk"]
     idle_anim = Animator(idle_rows[S.ROW_DOWN], fps=S.IDLE_FPS)
     walk_anim = Animator(walk_rows[S.ROW_DOWN], fps=S.WALK_FPS)
-    monster_variants = load_monster_variants(CELL)
-    key_frames = load_key_frames(CELL)
+    monster_variants = sprites["monsters"]
+    key_frames = sprites["key"]
     key_anim = Animator(key_frames, fps=6)
-    chest_idle_frames, chest_open_frames = load_chest_frames(CELL)
+    chest_idle_frames, chest_open_frames = sprites["chest_idle"], sprites["chest_open"]
     chest_idle_anim = Animator(chest_idle_frames, fps=6) if chest_idle_frames else None
     chest_open_anim = Animator(chest_open_frames, fps=10) if chest_open_frames else None
-    flag_frames = load_flag_frames(CELL)
+    flag_frames = sprites["flag"]
     flag_anim = Animator(flag_frames, fps=8) if flag_frames else None
 
     # --- Tool icons (text + small image) ---
@@ -401,7 +378,9 @@ def run():
         goal_icon  = _make_icon(_goal_img,  lambda s: pygame.draw.rect(s,(210,40,40),s.get_rect(),border_radius=3))
         key_icon   = _make_icon(_key_img,   lambda s: pygame.draw.circle(s,(240,200,0),(ICON_SIZE//2,ICON_SIZE//2), ICON_SIZE//2-2))
         wall_icon  = _make_icon(_wall_img,  lambda s: pygame.draw.rect(s,(90,95,105),s.get_rect()))
-        return {Tool.START:start_icon, Tool.GOAL:goal_icon, Tool.KEY:key_icon, Tool.WALL:wall_icon}
+        cp_icon    = _make_icon(None,       lambda s: pygame.draw.circle(s,COLOR_CHECKPOINT,(ICON_SIZE//2,ICON_SIZE//2), ICON_SIZE//2-2))
+        return {Tool.START:start_icon, Tool.GOAL:goal_icon, Tool.KEY:key_icon, Tool.WALL:wall_icon,
+                Tool.CHECKPOINT:cp_icon}
 
     tool_icons = build_tool_icons()
 
@@ -420,10 +399,13 @@ def run():
 
     cur_kind, cur_row = "idle", S.ROW_DOWN
 
-    def set_anim(kind, row):
+    def set_anim(kind, row, force=False):
+        """Đổi animation runner; cùng kind/row thì giữ animator đang chạy
+        (gọi mỗi frame được mà frame không bị reset về 0)."""
         nonlocal idle_anim, walk_anim, cur_kind, cur_row
         if kind not in ("idle","walk"): kind="idle"
         if row not in idle_rows: row=S.ROW_DOWN
+        if (kind, row) == (cur_kind, cur_row) and not force: return
         cur_kind, cur_row = kind, row
         idle_anim = Animator(idle_rows[row], fps=S.IDLE_FPS)
         walk_anim = Animator(walk_rows[row], fps=S.WALK_FPS)
@@ -433,10 +415,65 @@ def run():
             walk_anim.update(dt); return walk_anim.get()
         idle_anim.update(dt); return idle_anim.get()
 
+    def rescale_sprites():
+        """Lấy bộ sprite theo CELL hiện tại (đổi map hoặc zoom); đã có trong cache thì không scale lại."""
+        nonlocal idle_rows, walk_rows, monster_variants, variant_name_to_index
+        nonlocal key_frames, key_anim
+        nonlocal chest_idle_frames, chest_open_frames, chest_idle_anim, chest_open_anim
+        nonlocal flag_frames, flag_anim, tool_icons, sprite_cell
+        sprite_cell = CELL
+        sprites = ASSETS.frame_set(CELL, load_sprite_set)
+        idle_rows, walk_rows = sprites["idle"], sprites["walk"]
+        set_anim(cur_kind, cur_row, force=True)
+
+        monster_variants = sprites["monsters"]
+        variant_name_to_index = {v.get("name"): i for i, v in enumerate(monster_variants)}
+        fps = int(getattr(S, "MONSTER_FPS", 8))
+        for info in monsters_info.values():
+            v = monster_variants[info["variant"]] if info["variant"] < len(monster_variants) \
+                else {"right": [], "left": []}
+            info["anim_right"] = Animator(v["right"], fps=fps)
+            info["anim_left"]  = Animator(v["left"],  fps=fps)
+
+        key_frames = sprites["key"]
+        key_anim = Animator(key_frames, fps=6)
+        chest_idle_frames, chest_open_frames = sprites["chest_idle"], sprites["chest_open"]
+        chest_idle_anim = Animator(chest_idle_frames, fps=6) if chest_idle_frames else None
+        chest_open_anim = Animator(chest_open_frames, fps=10) if chest_open_frames else None
+        flag_frames = sprites["flag"]
+        flag_anim = Animator(flag_frames, fps=8) if flag_frames else None
+
+        tool_icons = build_tool_icons()
+
+    def update_layout():
+        """Đồng bộ CELL/MX/MY/camx/camy từ camera; scale lại sprite nếu CELL đổi."""
+        nonlocal CELL, MX, MY, camx, camy
+        CELL, MX, MY = camera.layout()
+        camx, camy = camera.camx, camera.camy
+        # asset đang nạp nền: đợi apply_loaded_assets (scale theo CELL lúc đó)
+        if not camera.lod and CELL != sprite_cell and asset_loader is None:
+            rescale_sprites()
+
+    def apply_loaded_assets():
+        """Thay ảnh tĩnh + sprite đã nạp nền vào (màu thay thế -> ảnh thật)."""
+        nonlocal asset_loader, sprite_cell
+        loader, asset_loader = asset_loader, None
+        if loader.error is not None:
+            print("asset load failed:", repr(loader.error), file=sys.stderr)
+        assets.update(loader.assets or {})
+        tiles.set_assets(assets)
+        background.invalidate()
+        if camera.lod:
+            sprite_cell = None   # scale khi zoom lại gần (update_layout)
+        else:
+            rescale_sprites()
+        redraw.mark_all()
+
     # ------------- BOTTOM BAR -------------
     BTN_W, BTN_H = 84, 30
     col_w = (S.WIDTH - RIGHT_W) // 3
     row_y1 = S.HEIGHT - S.BOTTOM_PANEL_H + 14
+    BOTTOM_RECT = pygame.Rect(0, S.HEIGHT - S.BOTTOM_PANEL_H, S.WIDTH, S.BOTTOM_PANEL_H)
 
     control_box = PanelBox(pygame.Rect(20, row_y1-8, col_w-40, BTN_H+16), "Control", tiny_font)
     cx = control_box.rect.centerx
@@ -454,6 +491,8 @@ def run():
     _sel_h = {"manhattan":0,"euclidean":1,"octile":2,"chebyshev":3}.get(getattr(S,"HEURISTIC","manhattan"),0)
     drp_heur = Dropdown((2*col_w + 20 + (col_w-40)//2 - 160, row_y1, 320, BTN_H),
                         heur_labels, ui_font, selected_index=_sel_h)
+    # vùng vẽ lại của thanh dưới: cả tiêu đề PanelBox nhô lên vùng game
+    BOTTOM_DIRTY = BOTTOM_RECT.union(pygame.Rect(0, row_y1 - 8 - tiny_font.get_height(), S.WIDTH, 1))
 
     # ------------- SIDEBAR -------------
     sidebar_title = title_font.render("Menu", True, S.TEXT)
@@ -472,6 +511,14 @@ def run():
                      weight_options, ui_font,
                      selected_index=_w_index(getattr(S, "WEIGHT", 1.0)))
 
+    # Mode: A* / hai chiều / JPS (truyền qua tham số mode; JPS tự lùi về A*
+    # khi 4-dir hoặc có quái vật)
+    mode_options = ["A*", "Bidir A*", "JPS", "JPS+"]
+    mode_values  = ["astar", "bidirectional", "jps", "jps+"]
+    drp_mode = Dropdown((RIGHT_X + 8, 0, RIGHT_W - 16, 30),
+                        mode_options, ui_font,
+                        selected_index=(mode_values.index(S.MODE) if getattr(S, "MODE", "astar") in mode_values else 0))
+
     btn_hist = Button((RIGHT_X + SIDEPAD, 0, 110, 26), "History", ui_font, toggle=True)
     btn_hist.active = False
 
@@ -491,8 +538,21 @@ def run():
     # pathfinding state
     states, idx = [], -1
     playing, dirty = False, True
-    last_ms = 0
-    history = []
+    worker = None   # SearchWorker đang chạy nền (trace stream vào states)
+    worker_key = None   # khoá TRACE_CACHE của lượt tìm gần nhất
+    replanner = None    # state LPA* của lượt gần nhất (tìm lại tăng dần khi sửa map)
+    edited = set()      # ô tường/quái vật đã sửa từ lượt tìm gần nhất
+    last_replan = False # lượt gần nhất là tìm lại tăng dần
+    # tốc độ replay ([ / ]): số bước mỗi frame theo thời gian thực
+    playback = Playback(S.AUTO_STEP_EVERY_MS, getattr(S, "PLAYBACK_SPEEDS", (1,)),
+                        getattr(S, "PLAYBACK_FIT_S", 10))
+    # lịch sử lượt tìm: lưu bền trong RunStore, RAM chỉ giữ HISTORY_VIEW lượt mới nhất
+    store = RunStore(getattr(S, "RUN_STORE_PATH", None))
+    HISTORY_VIEW = int(getattr(S, "HISTORY_VIEW", 200))
+    history = [history_item(r) for r in store.runs(source="ui", limit=HISTORY_VIEW)]
+    recorded = None     # trace đã ghi vào store (mỗi lượt tìm ghi 1 lần)
+    map_name = None     # tên thư mục map đã nạp bằng L (None = map tự vẽ)
+    compare_table = None    # (id các lượt đã chọn, bảng store.compare, Surface từng ô)
     hist_open = False
     hist_selected = set()
     hist_show_compare = False
@@ -505,17 +565,22 @@ def run():
         if start is not None and (r, c) == start: return False
         if goal is not None and (r, c) == goal: return False
         if key_pos is not None and (r, c) == key_pos: return False
+        if (r, c) in checkpoints: return False
         if (r, c) in monsters: return False
         return True
 
-    def place_entity(tool, r, c):
+    def place_entity(tool, r, c, monster_opt=None):
+        """monster_opt: mục MONSTER_OPTIONS cho Tool.MONSTER (mặc định: loại đang chọn)."""
         nonlocal start, goal, key_pos
         left = inventory_left[tool]
         if left == 0:
             return
         if tool == Tool.WALL:
-            if grid[r][c] != 1 and ((r,c) != start and (r,c) != goal and (r,c) != key_pos and (r,c) not in monsters):
+            if grid[r][c] != 1 and ((r,c) != start and (r,c) != goal and (r,c) != key_pos
+                                    and (r,c) not in checkpoints and (r,c) not in monsters):
                 grid[r][c] = 1
+                background.update_cell(grid, r, c)
+                edited.add((r, c))
             return
         if not cell_is_free_for_entity(r, c):
             return
@@ -534,10 +599,19 @@ def run():
                 key_pos = (r, c)
                 if INVENTORY_MAX[Tool.KEY] != float("inf"):
                     inventory_left[Tool.KEY] -= 1
+        elif tool == Tool.CHECKPOINT:
+            checkpoints.append((r, c))
+            inventory_left[Tool.CHECKPOINT] -= 1
         elif tool == Tool.MONSTER:
             if (r, c) not in monsters:
-                monsters.add((r, c))
-                vidx = monster_choice_index if monster_variants else 0
+                vidx = monster_choice_index
+                cost = float(getattr(S, "MONSTER_COST", 0.0))
+                if monster_opt is not None:
+                    vidx = variant_name_to_index.get(monster_opt["fname"], 0)
+                    cost = float(monster_opt["cost"])
+                monsters[(r, c)] = cost
+                edited.add((r, c))
+                vidx = vidx if monster_variants else 0
                 v = monster_variants[vidx] if monster_variants else {"right": [], "left": []}
                 anim_r = Animator(v["right"], fps=int(getattr(S, "MONSTER_FPS", 8)))
                 anim_l = Animator(v["left"],  fps=int(getattr(S, "MONSTER_FPS", 8)))
@@ -552,6 +626,8 @@ def run():
         nonlocal start, goal, key_pos
         if grid[r][c] == 1:
             grid[r][c] = 0
+            background.update_cell(grid, r, c)
+            edited.add((r, c))
             return True
         if start is not None and (r, c) == start:
             start = None
@@ -568,58 +644,133 @@ def run():
             if INVENTORY_MAX[Tool.KEY] != float("inf"):
                 inventory_left[Tool.KEY] += 1
             return True
+        if (r, c) in checkpoints:
+            checkpoints.remove((r, c))
+            inventory_left[Tool.CHECKPOINT] += 1
+            return True
         if (r, c) in monsters:
-            monsters.remove((r, c))
+            del monsters[(r, c)]
+            edited.add((r, c))
             if (r, c) in monsters_info:
                 monsters_info.pop((r, c), None)
             return True
         return False
 
+    def searching():
+        return worker is not None and not worker.done
+
+    def metrics_of(trace):
+        """compute_metrics với FlatGrid (lớp chi phí) của chính lượt tìm đó."""
+        if replanner is not None:
+            fg = replanner.fg
+        elif worker_key is not None:
+            fg = TRACE_CACHE.flat_grid(worker_key[0], grid, monsters, 0.0)
+        else:
+            fg = None
+        diag_one = S.EIGHT_DIR and getattr(S, "HEURISTIC", "manhattan") == "chebyshev"
+        return compute_metrics(trace, fg, diag_cost_is_one=diag_one)
+
     # ----- History helpers -----
     def record_history():
-        nonlocal history
+        """Ghi lượt tìm vừa xong vào store (1 lần mỗi trace) và thêm vào History."""
+        nonlocal recorded
+        if searching(): return
         if not states or not states[-1].get("found"): return
-        explored, shortest = compute_metrics(
-            states,
-            monsters=monsters,
-            monster_extra_cost=float(getattr(S, "MONSTER_COST", 0.0))
+        if states is recorded: return
+        recorded = states
+        explored, shortest = metrics_of(states)
+        path = getattr(states, "final_path", None) or states[-1].get("path") or []
+        run = dict(
+            source="ui",
+            map=map_name or f"{ROWS}x{COLS}",
+            map_hash=problem_hash(grid, monsters, 0.0, start, goal, key_pos, checkpoints),
+            rows=ROWS, cols=COLS,
+            mode=getattr(S, "MODE", "astar"),
+            heuristic=getattr(S, "HEURISTIC", "manhattan"),
+            eight_dir=bool(S.EIGHT_DIR),
+            weight=float(getattr(S, "WEIGHT", 1.0)),
+            replan=last_replan,
+            found=True,
+            explored=int(explored),
+            cost=float(shortest),
+            runtime_ms=float(last_build_runtime_ms),
+            steps=len(states),
+            path_len=len(path),
+            trace_kb=trace_nbytes(states) / 1024.0 if hasattr(states, "steps") else None,
+            ts=time.time(),
         )
-        item = {
-            "heuristic": getattr(S,'HEURISTIC','manhattan'),
-            "eight_dir": bool(S.EIGHT_DIR),
-            "weight": float(getattr(S,'WEIGHT',1.0)),
-            "explored": int(explored),
-            "cost": float(shortest),
-            "runtime_ms": float(last_build_runtime_ms),
-            "timestamp": pygame.time.get_ticks(),
-        }
-        dir_lbl = "8-dir" if item["eight_dir"] else "4-dir"
-        item["label"] = f"{dir_lbl} | H:{item['heuristic']} | W:{item['weight']:.2f} → explored:{item['explored']}, path:{item['cost']:.2f}, time:{item['runtime_ms']:.1f}ms"
-        if not history or history[-1]["label"] != item["label"]:
-            history.append(item)
-            history[:] = history[-40:]
+        run["id"] = store.record(**run)
+        history.append(history_item(run))
+        if len(history) > HISTORY_VIEW:
+            # hist_selected là chỉ số trong history: dời theo số dòng bị bỏ
+            drop = len(history) - HISTORY_VIEW
+            history[:] = history[drop:]
+            kept = {i - drop for i in hist_selected if i >= drop}
+            hist_selected.clear(); hist_selected.update(kept)
+
+    def cancel_search(wait=False):
+        nonlocal worker
+        if worker is not None:
+            worker.cancel()
+            if wait:
+                worker.join()
+            worker = None
 
     def rebuild():
-        nonlocal states, idx, dirty, last_build_runtime_ms
+        """Huỷ lượt tìm cũ (nếu còn chạy) và chạy lượt mới trên thread nền.
+        states là Trace được ghi dần: Play/Step dùng được ngay khi có bước đầu.
+        Chỉ sửa tường/quái vật (cùng cấu hình) -> Replanner sửa lại phần bị ảnh
+        hưởng (LPA*); cùng lưới + tham số với một lượt đã xong -> TRACE_CACHE."""
+        nonlocal states, idx, dirty, last_build_runtime_ms, worker, worker_key
+        nonlocal replanner, last_replan, recorded
+        # Replanner không chạy song song được: chờ thread cũ dừng hẳn
+        cancel_search(wait=replanner is not None)
+        last_build_runtime_ms = 0.0
+        last_replan = False
         if start is None or goal is None:
             states, idx = [], -1
-            last_build_runtime_ms = 0.0
+            replanner = None
         else:
-            t0 = time.perf_counter()
-            states = build_two_leg_states(
-                grid=grid,
+            params = dict(
                 start=start,
                 key_pos=key_pos,
                 goal=goal,
-                monsters=monsters,
+                monsters=dict(monsters),
                 heuristic_kind=getattr(S, "HEURISTIC", "manhattan"),
                 eight_dir=S.EIGHT_DIR,
                 weight=float(getattr(S, "WEIGHT", 1.0)),
-                monster_cost=float(getattr(S, "MONSTER_COST", 0.0))
+                monster_cost=0.0,   # phụ phí riêng từng ô nằm trong monsters
+                mode=getattr(S, "MODE", "astar"),
+                waypoints=tuple(checkpoints),
             )
-            t1 = time.perf_counter()
-            last_build_runtime_ms = (t1 - t0) * 1000.0
+            if replanner is not None and replanner.matches(**params):
+                replanner.apply([(rc, grid[rc[0]][rc[1]] == 1, monsters.get(rc, 0.0)) for rc in edited])
+                worker_key = None
+                last_replan = True
+                worker = SearchWorker(replanner.replan).start()
+                states = worker.trace
+            else:
+                replanner = None
+                worker_key = search_key(grid, **params)
+                hit = TRACE_CACHE.get(worker_key)
+                if hit is not None:
+                    states, last_build_runtime_ms = hit
+                    recorded = states   # không phải lượt đo mới: không ghi lại vào store
+                else:
+                    # chụp lại lưới/monsters để thread nền không đọc dữ liệu đang bị sửa
+                    snapshot = [row[:] for row in grid]
+                    if Replanner.supported(**params):
+                        replanner = Replanner(snapshot, **params)
+                        worker = SearchWorker(replanner.plan).start()
+                    else:
+                        worker = SearchWorker(
+                            build_cached, TRACE_CACHE, worker_key,
+                            grid=snapshot,
+                            **params
+                        ).start()
+                    states = worker.trace
             idx = 0 if states else -1
+        edited.clear()
         dirty=False
 
     def step_to(new_idx):
@@ -629,56 +780,90 @@ def run():
         b = states[new_idx]["current"]
         if a and b: set_anim("walk", pick_row(b[0]-a[0], b[1]-a[1]))
         idx = new_idx
-        if idx == len(states)-1:
+        if idx == len(states)-1 and not searching():
             record_history()
 
-    def reset_map_to(rows, cols):
-        nonlocal ROWS, COLS, CELL, MX, MY, grid, start, goal, key_pos, monsters
-        nonlocal idle_rows, walk_rows, idle_anim, walk_anim, idx, states, playing, dirty
-        nonlocal monster_variants
-        nonlocal key_frames, key_anim
-        nonlocal chest_idle_frames, chest_open_frames, chest_idle_anim, chest_open_anim
-        nonlocal flag_frames, flag_anim
-        nonlocal variant_name_to_index, monster_choice_index  # <-- cần nonlocal
-        nonlocal tool_icons
+    def reset_map_to(rows, cols, new_grid=None):
+        nonlocal ROWS, COLS, grid, start, goal, key_pos, monsters
+        nonlocal idx, states, playing, dirty, replanner
+        nonlocal monster_choice_index  # <-- cần nonlocal
+        nonlocal map_name
+        map_name = None
 
+        cancel_search()
+        replanner = None; edited.clear()
         ROWS, COLS = rows, cols
-        CELL, MX, MY = compute_square_cell_and_margins(ROWS, COLS, RIGHT_W)
-        grid  = [[0 for _ in range(COLS)] for _ in range(ROWS)]
+        grid  = new_grid if new_grid is not None else [[0 for _ in range(COLS)] for _ in range(ROWS)]
         start = None; goal = None
-        key_pos = None; monsters = set()
-        monsters_info.clear()
-        for t in (Tool.START, Tool.GOAL, Tool.KEY):
-            inventory_left[t] = 1
-        idle_rows = load_sheet_rows(S.IDLE_FILE, S.IDLE_COLS, CELL)
-        walk_rows = load_sheet_rows(S.WALK_FILE, S.WALK_COLS, CELL)
-        idle_anim = Animator(idle_rows[S.ROW_DOWN], fps=S.IDLE_FPS)
-        walk_anim = Animator(walk_rows[S.ROW_DOWN], fps=S.WALK_FPS)
-
-        monster_variants = load_monster_variants(CELL)
-        variant_name_to_index = {v.get("name"): i for i, v in enumerate(monster_variants)}
+        key_pos = None; monsters = {}
+        monsters_info.clear(); checkpoints.clear()
+        for t in (Tool.START, Tool.GOAL, Tool.KEY, Tool.CHECKPOINT):
+            inventory_left[t] = INVENTORY_MAX[t]
+        camera.set_map(ROWS, COLS)
+        background.invalidate()
+        update_layout()
+        set_anim("idle", S.ROW_DOWN)
+
         if MONSTER_OPTIONS:
             default_fname = MONSTER_OPTIONS[0]["fname"]
             if default_fname in variant_name_to_index:
                 monster_choice_index = variant_name_to_index[default_fname]
             S.MONSTER_COST = MONSTER_OPTIONS[0]["cost"]
 
-        key_frames = load_key_frames(CELL)
-        key_anim = Animator(key_frames, fps=6)
-        chest_idle_frames, chest_open_frames = load_chest_frames(CELL)
-        chest_idle_anim = Animator(chest_idle_frames, fps=6) if chest_idle_frames else None
-        chest_open_anim = Animator(chest_open_frames, fps=10) if chest_open_frames else None
-        flag_frames = load_flag_frames(CELL)
-        flag_anim = Animator(flag_frames, fps=8) if flag_frames else None
-
-        tool_icons = build_tool_icons()
-
         idx=-1; states=[]; playing=False; dirty=True
 
+    def draw_load_progress(frac):
+        """Thanh tiến độ khi đọc CSV lớn (vòng lặp chính đang chờ load_map)."""
+        bar = pygame.Rect(0, 0, 320, 18)
+        bar.center = GAME_RECT.center
+        pygame.draw.rect(screen, S.BTN_BG, bar)
+        pygame.draw.rect(screen, S.CLOSED, (bar.x, bar.y, int(bar.w * frac), bar.h))
+        pygame.draw.rect(screen, S.BTN_BR, bar, 1)
+        pygame.display.update(bar)
+        pygame.event.pump()   # giữ cửa sổ không bị coi là treo
+
+    def load_map_file(dir_path=MAP_DIR):
+        """Nạp map đã lưu (map.bin nếu có, không thì CSV đọc dạng stream có thanh
+        tiến độ; kích thước thật, kể cả map rất lớn) + start/goal/key/checkpoint/monsters."""
+        nonlocal map_name
+        try:
+            g, s0, g0, meta = load_map(dir_path, progress=draw_load_progress)
+        except (OSError, ValueError) as e:
+            print(f"load map failed: {e}", file=sys.stderr)
+            return
+        if not g or not g[0]:
+            print("load map failed: empty map", file=sys.stderr)
+            return
+        reset_map_to(len(g), len(g[0]), new_grid=g)
+        map_name = os.path.basename(os.path.normpath(dir_path))
+        spots = [(Tool.START, s0), (Tool.GOAL, g0), (Tool.KEY, meta.get("key"))]
+        spots += [(Tool.CHECKPOINT, p) for p in meta.get("checkpoints", [])]
+        spots += [(Tool.MONSTER, m) for m in meta.get("monsters", [])]
+        # monster lưu dạng [r, c, phụ phí]: lấy lại đúng loại theo phụ phí
+        opt_by_cost = {float(o["cost"]): o for o in MONSTER_OPTIONS}
+        for tool, rc in spots:
+            if rc and 0 <= rc[0] < ROWS and 0 <= rc[1] < COLS:
+                opt = None
+                if tool == Tool.MONSTER and len(rc) > 2:
+                    cost = float(rc[2])
+                    opt = opt_by_cost.get(cost, {"fname": None, "cost": cost})
+                place_entity(tool, rc[0], rc[1], monster_opt=opt)
+
+    # dirty rectangle: trạng thái vẽ của frame trước
+    last_view = None
+    last_items = set()
+    last_panel = None
+    cp_labels = {}                  # số thứ tự checkpoint -> Surface chữ
+    metrics = (None, 0, (0, 0))     # (states, len, compute_metrics) của status bar
+
+    busy, wake_ms = True, None      # frame trước: cần chạy đủ fps? / ms tới lần đổi frame animation
+
     # ---------- loop ----------
     running=True
     while running:
-        dt = clock.tick(S.FPS)
+        dt, events = pacer.wait(busy, wake_ms)
+        if asset_loader is not None and asset_loader.done:
+            apply_loaded_assets()
 
         # precompute monster picker layout for this frame so we can use in event handling
         mp_layout = None
@@ -706,9 +891,13 @@ def run():
         size_label_pos = (RIGHT_X + SIDEPAD, y)
         y = drp_size.rect.bottom + 14
         lbl_w_h = ui_font.size("W (weight)")[1]
+        half_w = (RIGHT_W - 3*SIDEPAD) // 2
         drp_w.rect.topleft = (RIGHT_X + SIDEPAD, y + lbl_w_h + 6)
-        drp_w.rect.w = RIGHT_W - 2*SIDEPAD
+        drp_w.rect.w = half_w
         weight_label_pos = (RIGHT_X + SIDEPAD, y)
+        drp_mode.rect.topleft = (drp_w.rect.right + SIDEPAD, y + lbl_w_h + 6)
+        drp_mode.rect.w = half_w
+        mode_label_pos = (drp_mode.rect.x, y)
         y = drp_w.rect.bottom + 16
 
         # History title + button
@@ -719,13 +908,13 @@ def run():
         y = btn_hist.rect.bottom + 16
 
         # --- TOOLBAR SECTION ---
-        pygame.draw.line(screen, S.BTN_BR, (RIGHT_X+SIDEPAD, y), (RIGHT_X+RIGHT_W-SIDEPAD, y), 1)
         tools_label_pos = (RIGHT_X + SIDEPAD, y + 8)
         btn_h = 32
         btn_w = (RIGHT_W - 3*SIDEPAD) // 2
         rect_start  = pygame.Rect(RIGHT_X + SIDEPAD,           y + 34, btn_w, btn_h)
         rect_goal   = pygame.Rect(rect_start.right + SIDEPAD,  y + 34, btn_w, btn_h)
         rect_key    = pygame.Rect(RIGHT_X + SIDEPAD,           rect_start.bottom + 8, btn_w, btn_h)
+        rect_cp     = pygame.Rect(rect_key.right + SIDEPAD,    rect_start.bottom + 8, btn_w, btn_h)
         rect_wall   = pygame.Rect(RIGHT_X + SIDEPAD,           rect_key.bottom + 8, btn_w, btn_h)
         rect_mon    = pygame.Rect(rect_wall.right + SIDEPAD,   rect_key.bottom + 8, btn_w, btn_h)
 
@@ -735,6 +924,7 @@ def run():
             make_tool_button("Key",     Tool.KEY,     rect_key)
             make_tool_button("Wall",    Tool.WALL,    rect_wall)
             make_tool_button("Monster", Tool.MONSTER, rect_mon)
+            make_tool_button("Checkpoint", Tool.CHECKPOINT, rect_cp)
             set_current_tool(current_tool)
         else:
             tool_buttons[0].rect = rect_start
@@ -742,9 +932,17 @@ def run():
             tool_buttons[2].rect = rect_key
             tool_buttons[3].rect = rect_wall
             tool_buttons[4].rect = rect_mon
+            tool_buttons[5].rect = rect_cp
+
+        update_layout()
 
         # --------- EVENTS ---------
-        for e in pygame.event.get():
+        for e in events:
+            # click/phím/sự kiện cửa sổ có thể đổi UI ở bất kỳ đâu -> vẽ lại cả cửa sổ;
+            # di chuột thì chỉ phần nó sửa (pan = đổi camera, kéo tường = ô đó)
+            if e.type != pygame.MOUSEMOTION:
+                redraw.mark_all()
+
             # quit
             if e.type == pygame.QUIT:
                 running=False
@@ -754,9 +952,13 @@ def run():
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_SPACE:
                     if dirty: rebuild()
-                    if states:
+                    if states or searching():
                         playing = not playing
-                        last_ms = 0
+                        playback.reset()
+                elif e.key == pygame.K_RIGHTBRACKET:
+                    playback.faster()
+                elif e.key == pygame.K_LEFTBRACKET:
+                    playback.slower()
                 elif e.key == pygame.K_LEFT:
                     if dirty: rebuild()
                     if states:
@@ -770,6 +972,28 @@ def run():
                     hist_selected.clear(); hist_show_compare = False
                 elif e.key == pygame.K_b and hist_open and hist_show_compare:
                     hist_show_compare = False
+                elif e.key in (pygame.K_f, pygame.K_HOME) and not hist_open:
+                    camera.fit(); update_layout()
+                elif e.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS) and not hist_open:
+                    camera.zoom_at(GAME_RECT.center, 1.25); update_layout()
+                elif e.key in (pygame.K_MINUS, pygame.K_KP_MINUS) and not hist_open:
+                    camera.zoom_at(GAME_RECT.center, 1 / 1.25); update_layout()
+                elif e.key == pygame.K_l and not hist_open:
+                    load_map_file()
+
+            # Camera: lăn chuột = zoom quanh con trỏ, kéo chuột giữa = pan
+            ui_busy = hist_open or monster_picker_open or any(d.opened for d in (drp_size, drp_w, drp_mode, drp_heur))
+            if e.type == pygame.MOUSEWHEEL and not ui_busy:
+                pos = pygame.mouse.get_pos()
+                if GAME_RECT.collidepoint(pos):
+                    camera.zoom_at(pos, 1.15 ** e.y); update_layout()
+            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 2 and not ui_busy \
+                    and GAME_RECT.collidepoint(e.pos):
+                panning = True
+            elif e.type == pygame.MOUSEBUTTONUP and e.button == 2:
+                panning = False
+            elif e.type == pygame.MOUSEMOTION and panning:
+                camera.pan(-e.rel[0], -e.rel[1]); update_layout()
 
             # Click outside modal to close (History)
             if hist_open and e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
@@ -785,7 +1009,7 @@ def run():
                 if states: step_to(max(0, idx-1)); playing=False
             if btn_play.clicked(e):
                 if dirty: rebuild()
-                if states: playing = not playing; last_ms=0
+                if states or searching(): playing = not playing; playback.reset()
             if btn_next.clicked(e):
                 if dirty: rebuild()
                 if states: step_to(min(len(states)-1, idx+1)); playing=False
@@ -823,6 +1047,9 @@ def run():
                 try: S.WEIGHT = float(weight_options[drp_w.selected])
                 except Exception: S.WEIGHT = 1.0
                 dirty = True; playing = False
+            if drp_mode.handle(e):
+                S.MODE = mode_values[drp_mode.selected]
+                dirty = True; playing = False
 
             # Open History modal
             if btn_hist.clicked(e):
@@ -861,10 +1088,17 @@ def run():
                     if pygame.key.get_mods() & pygame.KMOD_SHIFT:
                         if grid[rc[0]][rc[1]] == 1:
                             grid[rc[0]][rc[1]] = 0
+                            background.update_cell(grid, *rc)
+                            redraw.mark_cells((rc,), camera)
+                            edited.add(rc)
                             dirty=True; playing=False
                     else:
-                        if grid[rc[0]][rc[1]] != 1 and (rc != start and rc != goal and rc != key_pos and rc not in monsters):
+                        if grid[rc[0]][rc[1]] != 1 and (rc != start and rc != goal and rc != key_pos
+                                                        and rc not in checkpoints and rc not in monsters):
                             grid[rc[0]][rc[1]] = 1
+                            background.update_cell(grid, *rc)
+                            redraw.mark_cells((rc,), camera)
+                            edited.add(rc)
                             dirty=True; playing=False
 
             # ====== History modal interactions ======
@@ -887,7 +1121,7 @@ def run():
                     if content.collidepoint(e.pos) and not hist_show_compare:
                         line_h = ui_font.get_height() + 8
                         idx_in_view = (e.pos[1] - (content.y + 10)) // line_h
-                        lines = history[-200:]; total = len(lines)
+                        lines = history; total = len(lines)
                         if 0 <= idx_in_view < total:
                             real_idx = len(history) - 1 - idx_in_view
                             if 0 <= real_idx < len(history):
@@ -925,17 +1159,32 @@ def run():
                             monster_picker_open = False
                             break
 
-        # autoplay
-        if playing and states:
-            last_ms += dt
-            if last_ms >= S.AUTO_STEP_EVERY_MS:
-                last_ms = 0
-                if idx < len(states)-1: step_to(idx+1)
-                else: playing=False
-
         if dirty and not playing:
             rebuild()
 
+        # kết quả stream từ thread nền
+        if worker is not None:
+            if idx < 0 and states:
+                idx = 0
+            if worker.done:
+                if worker.error is not None:
+                    print("search failed:", repr(worker.error), file=sys.stderr)
+                    replanner = None
+                elif not worker.cancelled and worker_key is not None:
+                    TRACE_CACHE.put(worker_key, worker.trace, worker.runtime_ms)
+                last_build_runtime_ms = worker.runtime_ms
+                worker = None
+                if idx == len(states)-1:
+                    record_history()
+
+        # autoplay (được chạy trước khi tìm xong; chờ nếu đuổi kịp bước mới nhất)
+        # tốc độ cao: tiến nhiều bước trong 1 frame, overlay chỉ tô lại ô đổi
+        if playing and (states or searching()):
+            n = playback.advance(dt, len(states))
+            if n:
+                if idx < len(states)-1: step_to(min(len(states)-1, idx+n))
+                elif not searching(): playing=False
+
         # runner pos
         draw_rc=None
         if 0<=idx<len(states):
@@ -965,174 +1214,245 @@ def run():
             else:
                 info["anim_right"].update(dt)
 
-        # --------- render ---------
-        screen.fill(S.WHITE)
-
-        # TOP BAR
-        pygame.draw.rect(screen, S.TOP_BG, (0,0,S.WIDTH,S.TOP_PANEL_H))
-        h1 = "LMB: place by tool • RMB drag (Wall only) • RMB: remove • Shift+RMB: erase wall • Space: Play/Pause"
-        t1 = help_font.render(h1, True, S.TEXT)
-        screen.blit(t1, (12, 10))
-
-        # GAME AREA
-        game_rect = pygame.Rect(0, S.TOP_PANEL_H, S.WIDTH - RIGHT_W, game_area_height())
-        screen.set_clip(game_rect)
-
-        for r in range(ROWS):
-            for c in range(COLS):
-                draw_cell_base(screen, grid, (r,c), CELL, MX, MY, camx, camy, assets)
-
-        if 0<=idx<len(states):
-            st=states[idx]
-            for rc in st["closed"]: draw_overlay(screen, rc, 'closed', CELL, MX, MY, camx, camy, assets)
-            for rc in st["open"]:   draw_overlay(screen, rc, 'open',   CELL, MX, MY, camx, camy, assets)
-            for rc in st["path"]:   draw_overlay(screen, rc, 'path',   CELL, MX, MY, camx, camy, assets)
-            if st["current"]:       draw_overlay(screen, st["current"], 'current', CELL, MX, MY, camx, camy, assets)
-
-        # Start = cờ động
-        if start:
-            sr, sc = start
-            rect = to_rect((sr, sc), CELL, MX, MY, camx, camy)
-            if flag_anim:
-                flag_anim.update(dt)
-                fr = flag_anim.get()
-                if fr:
-                    fw, fh = fr.get_size()
-                    screen.blit(fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
-            else:
-                draw_overlay(screen, start, 'start', CELL, MX, MY, camx, camy, assets)
-
-        # Goal = Chest (idle -> open khi chạm đích)
-        if goal:
-            gr, gc = goal
-            rect = to_rect((gr, gc), CELL, MX, MY, camx, camy)
-            opened = False
-            if 0 <= idx < len(states):
-                st_curr = states[idx]
-                if (st_curr.get("current") == goal) or (st_curr.get("found") and idx == len(states) - 1):
-                    opened = True
-            anim = (chest_open_anim if opened and chest_open_anim else chest_idle_anim)
-            if anim:
-                anim.update(dt)
-                fr = anim.get()
+        # --------- sprite vùng game ---------
+        # animator chạy 1 lần/frame; sprite dựng thành item (xem item_rect) để so
+        # với frame trước: chỉ sprite đổi frame/vị trí mới bị đánh dấu dirty
+        vr0, vc0, vr1, vc1 = camera.visible()
+        def visible(rc):
+            return rc is not None and vr0 <= rc[0] < vr1 and vc0 <= rc[1] < vc1
+
+        def centered(fr, rect):
+            fw, fh = fr.get_size()
+            return ("img", fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
+
+        items = []
+        anims = []      # animator đang hiện (pacer thức dậy khi chúng đổi frame)
+        if camera.lod:
+            # zoom xa: chấm màu thay sprite (kiểu minimap)
+            for rc in monsters:
+                if visible(rc): items.append(("rect", COLOR_MONSTER, marker_rect(rc, CELL, MX, MY, camx, camy)))
+            for rc in checkpoints:
+                if visible(rc): items.append(("rect", COLOR_CHECKPOINT, marker_rect(rc, CELL, MX, MY, camx, camy)))
+            for rc, color in ((key_pos, COLOR_KEY), (start, S.GREEN), (goal, S.RED),
+                              (draw_rc, (255, 120, 120))):
+                if visible(rc): items.append(("rect", color, marker_rect(rc, CELL, MX, MY, camx, camy)))
+        else:
+            # Start = cờ động
+            if visible(start):
+                rect = to_rect(start, CELL, MX, MY, camx, camy)
+                if flag_anim:
+                    flag_anim.update(dt); anims.append(flag_anim)
+                    fr = flag_anim.get()
+                    if fr: items.append(centered(fr, rect))
+                else:
+                    img = tiles.get("start", CELL)
+                    items.append(("img", img, rect.topleft) if img else ("rect", S.GREEN, tuple(rect)))
+
+            # Goal = Chest (idle -> open khi chạm đích)
+            if visible(goal):
+                rect = to_rect(goal, CELL, MX, MY, camx, camy)
+                opened = False
+                if 0 <= idx < len(states):
+                    st_curr = states[idx]
+                    if (st_curr.get("current") == goal) or (st_curr.get("found") and idx == len(states) - 1):
+                        opened = True
+                anim = (chest_open_anim if opened and chest_open_anim else chest_idle_anim)
+                if anim:
+                    anim.update(dt); anims.append(anim)
+                    fr = anim.get()
+                    if fr: items.append(centered(fr, rect))
+                else:
+                    img = tiles.get("goal", CELL)
+                    items.append(("img", img, rect.topleft) if img else ("rect", S.RED, tuple(rect)))
+
+            # KEY
+            if visible(key_pos):
+                rect = to_rect(key_pos, CELL, MX, MY, camx, camy)
+                if key_frames:
+                    key_anim.update(dt); anims.append(key_anim)
+                    fr = key_anim.get()
+                    if fr: items.append(centered(fr, rect))
+                else:
+                    items.append(("circle", COLOR_KEY, rect.center, max(4, rect.w // 3)))
+
+            # CHECKPOINTS: số = thứ tự đi (route của trace nếu đã tìm, không thì thứ tự đặt)
+            route = getattr(states, "route", None)
+            cp_set = set(checkpoints)
+            cp_order = [p for p in route if p in cp_set] if route else []
+            if len(cp_order) != len(cp_set):
+                cp_order = checkpoints
+            for n, rc in enumerate(cp_order, 1):
+                if not visible(rc):
+                    continue
+                rect = to_rect(rc, CELL, MX, MY, camx, camy)
+                items.append(("circle", COLOR_CHECKPOINT, rect.center, max(4, rect.w // 3)))
+                if rect.w >= 14:
+                    num = cp_labels.get(n)
+                    if num is None:
+                        num = cp_labels[n] = tiny_font.render(str(n), True, S.WHITE)
+                    items.append(("img", num, num.get_rect(center=rect.center).topleft))
+
+            # MONSTERS
+            for (mr, mc) in monsters:
+                if not (vr0 <= mr < vr1 and vc0 <= mc < vc1):
+                    continue
+                rect = to_rect((mr, mc), CELL, MX, MY, camx, camy)
+                info = monsters_info.get((mr, mc))
+                fr = None
+                if info:
+                    anim = info["anim_left"] if info["facing"] == "left" else info["anim_right"]
+                    fr = anim.get(); anims.append(anim)
                 if fr:
-                    fw, fh = fr.get_size()
-                    screen.blit(fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
-            else:
-                draw_overlay(screen, goal, 'goal', CELL, MX, MY, camx, camy, assets)
-
-        # KEY
-        if key_pos is not None and key_frames:
-            kr, kc = key_pos
-            rect = to_rect((kr, kc), CELL, MX, MY, camx, camy)
-            key_anim.update(dt)
-            fr = key_anim.get()
-            if fr:
-                fw, fh = fr.get_size()
-                screen.blit(fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
-        elif key_pos is not None:
-            kr, kc = key_pos
-            rect = to_rect((kr, kc), CELL, MX, MY, camx, camy)
-            pygame.draw.circle(screen, COLOR_KEY, rect.center, max(4, rect.w // 3))
-
-        # MONSTERS
-        for (mr, mc) in monsters:
-            rect = to_rect((mr, mc), CELL, MX, MY, camx, camy)
-            info = monsters_info.get((mr, mc))
-            if info:
-                fr = info["anim_left"].get() if info["facing"] == "left" else info["anim_right"].get()
+                    items.append(centered(fr, rect))
+                else:   # chưa có sprite (asset đang nạp / thiếu file)
+                    items.append(("circle", COLOR_MONSTER, rect.center, max(4, rect.w // 3)))
+
+            # runner
+            if visible(draw_rc):
+                rect = to_rect(draw_rc, CELL, MX, MY, camx, camy)
+                fr = get_frame(dt)
+                anims.append(walk_anim if cur_kind == "walk" else idle_anim)
                 if fr:
-                    fw, fh = fr.get_size()
-                    screen.blit(fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
-            else:
-                pygame.draw.circle(screen, COLOR_MONSTER, rect.center, max(4, rect.w // 3))
-
-        # runner
-        if draw_rc:
-            rect = to_rect(draw_rc, CELL, MX, MY, camx, camy)
-            fr = get_frame(dt)
-            if fr:
-                fw, fh = fr.get_width(), fr.get_height()
-                screen.blit(fr, (rect.x + (rect.w - fw)//2, rect.y + (rect.h - fh)//2))
-
-        draw_grid_lines(screen, ROWS, COLS, CELL, MX, MY, camx, camy)
-        screen.set_clip(None)
-
-        # SIDEBAR
-        pygame.draw.rect(screen, S.BOTTOM_BG, RIGHT_RECT)
-        pygame.draw.line(screen, S.BTN_BR, (RIGHT_X, S.TOP_PANEL_H), (RIGHT_X, S.HEIGHT - S.BOTTOM_PANEL_H), 1)
-        screen.blit(sidebar_title, (RIGHT_X + SIDEPAD, S.TOP_PANEL_H + 10))
-        screen.blit(ui_font.render("Size", True, S.TEXT), size_label_pos); drp_size.draw_head(screen)
-        screen.blit(ui_font.render("W (weight)", True, S.TEXT), weight_label_pos); drp_w.draw_head(screen)
+                    items.append(centered(fr, rect))
+                else:
+                    items.append(("circle", (255, 120, 120), rect.center, max(4, rect.w // 3)))
 
-        # History title + button
-        pygame.draw.line(screen, S.BTN_BR, (RIGHT_X+SIDEPAD, hist_sep_y), (RIGHT_X+RIGHT_W-SIDEPAD, hist_sep_y), 1)
-        screen.blit(ui_font.render("History", True, S.TEXT), hist_label_pos)
-        btn_hist.draw(screen)
+        # status bar (compute_metrics chỉ tính lại khi trace đổi)
+        explored, path_steps = (0,0)
+        if states and not searching() and states[-1].get("found"):
+            if metrics[0] is not states or metrics[1] != len(states):
+                metrics = (states, len(states), metrics_of(states))
+            explored, path_steps = metrics[2]
+
+        pacing_status = f"Speed {playback.label(len(states))} ([ / ]) | {pacer.fps:.0f} fps"
+        status = f"Map {ROWS}×{COLS} | Steps {max(idx,0)}/{max(len(states)-1,0)} | Dir {'8-dir' if S.EIGHT_DIR else '4-dir'} | H {getattr(S,'HEURISTIC','manhattan')} | W {getattr(S,'WEIGHT',1.0):.2f} | Path {path_steps:.2f} | Explored {explored} | " + ("searching…" if searching() else f"t {last_build_runtime_ms:.1f}ms")
+
+        # --------- dirty rectangle ---------
+        # camera/map đổi, modal đang mở hoặc vừa đóng -> vẽ lại cả cửa sổ
+        modal = hist_open or monster_picker_open or any(d.opened for d in (drp_size, drp_w, drp_mode, drp_heur))
+        view = (CELL, MX, MY, camx, camy, ROWS, COLS, camera.lod, modal)
+        if modal or view != last_view:
+            redraw.mark_all()
+        last_view = view
+
+        bg_surface = background.surface
+        background.ensure(grid, camera)
+        # open/closed/path: layer cố định, chỉ tô lại ô đổi trạng thái
+        overlays.sync(states, idx, camera)
+        if background.surface is not bg_surface or overlays.repainted:
+            redraw.mark(GAME_RECT)
+        else:
+            redraw.mark_cells(overlays.changed, camera)
 
-        # TOOLBOX
-        screen.blit(ui_font.render("Toolbox", True, S.TEXT), tools_label_pos)
-        for b in tool_buttons:
-            if b._tool == current_tool:
-                b.bg = (200, 200, 200)
-                b.border = (100, 100, 100)
-            else:
-                b.bg = (245, 247, 250)
-                b.border = (170, 176, 190)
-            b.draw(screen)
-            # draw icons for Start/Goal/Key/Wall (skip Monster)
-            if b._tool != Tool.MONSTER:
-                ic = tool_icons.get(b._tool)
-                if ic:
-                    ix = b.rect.x + 10
-                    iy = b.rect.y + (b.rect.height - 18) // 2
-                    screen.blit(ic, (ix, iy))
-
-        # Info lines
-        def qty_str(t):
-            v = inventory_left[t]
-            return "∞" if v == float("inf") else f"{int(v)}/1"
-        info_y = tool_buttons[-1].rect.bottom + 10
-        info_x = RIGHT_X + SIDEPAD
-        lines = [
-            f"Start:   {qty_str(Tool.START)}",
-            f"Goal:    {qty_str(Tool.GOAL)}",
-            f"Key:     {qty_str(Tool.KEY)}",
-            f"Wall:    {qty_str(Tool.WALL)}",
-            f"Monster: {qty_str(Tool.MONSTER)}",
-            f"Monster cost: +{int(getattr(S,'MONSTER_COST',0))}",
-            "",
-            "LMB: place by tool",
-            "RMB: remove • RMB drag (Wall only)",
-            "Shift+RMB: erase wall",
-        ]
-        for line in lines:
-            surf = tiny_font.render(line, True, (90,95,105))
-            screen.blit(surf, (info_x, info_y))
-            info_y += tiny_font.get_height() + 4
-
-        # BOTTOM BAR
-        pygame.draw.rect(screen, S.BOTTOM_BG, (0, S.HEIGHT - S.BOTTOM_PANEL_H, S.WIDTH, S.BOTTOM_PANEL_H))
-        control_box.draw(screen); dir_box.draw(screen)
-        btn_prev.draw(screen); btn_play.draw(screen, active_override=playing); btn_next.draw(screen)
-        btn_4dir.draw(screen); btn_8dir.draw(screen)
-        drp_heur.draw_head(screen)
+        cur_items = set(items)
+        for item in cur_items.symmetric_difference(last_items):
+            redraw.mark(item_rect(item))
+        last_items = cur_items
 
-        explored, path_steps = (0,0)
-        if states and states[-1].get("found"):
-            explored, path_steps = compute_metrics(
-                states,
-                monsters=monsters,
-                monster_extra_cost=float(getattr(S, "MONSTER_COST", 0.0))
-            )
+        panel = (status, pacing_status, playing)
+        if panel != last_panel:
+            redraw.mark(BOTTOM_DIRTY)
+        last_panel = panel
 
-        status = f"Map {ROWS}×{COLS} | Steps {max(idx,0)}/{max(len(states)-1,0)} | Dir {'8-dir' if S.EIGHT_DIR else '4-dir'} | H {getattr(S,'HEURISTIC','manhattan')} | W {getattr(S,'WEIGHT',1.0):.2f} | Path {path_steps:.2f} | Explored {explored} | t {last_build_runtime_ms:.1f}ms"
-        stsurf = ui_font.render(status, True, S.TEXT)
-        screen.blit(stsurf, (20, S.HEIGHT - S.BOTTOM_PANEL_H + BTN_H + 20))
+        # --------- render ---------
+        full, rects = redraw.take()
+        if full:
+            screen.fill(S.WHITE)
+
+            # TOP BAR
+            pygame.draw.rect(screen, S.TOP_BG, (0,0,S.WIDTH,S.TOP_PANEL_H))
+            h1 = "LMB: place by tool • RMB drag (Wall only) • RMB: remove • Shift+RMB: erase wall • Space: Play/Pause"
+            t1 = help_font.render(h1, True, S.TEXT)
+            screen.blit(t1, (12, 10))
+            h2 = f"Wheel/+/-: zoom • MMB drag: pan • F: fit • L: load maps/ • [ / ]: speed • {ROWS}x{COLS} @ {CELL:.3g}px"
+            screen.blit(help_font.render(h2, True, S.TEXT), (12, 10 + help_font.get_linesize()))
+
+        # GAME AREA: cả vùng khi full, không thì hình bao các vùng dirty trong đó
+        game_clip = GAME_RECT if full else None
+        game_rects = [r for r in rects if r.colliderect(GAME_RECT)]
+        if game_rects:
+            game_clip = game_rects[0].unionall(game_rects[1:]).clip(GAME_RECT)
+        if game_clip:
+            screen.set_clip(game_clip)
+            if not full:
+                screen.fill(S.WHITE, game_clip)
+            background.draw(screen, camera)
+            overlays.draw(screen, camera)
+            for item in items:
+                draw_item(screen, item)
+            screen.set_clip(None)
+
+        if full:
+            # SIDEBAR
+            pygame.draw.rect(screen, S.BOTTOM_BG, RIGHT_RECT)
+            pygame.draw.line(screen, S.BTN_BR, (RIGHT_X, S.TOP_PANEL_H), (RIGHT_X, S.HEIGHT - S.BOTTOM_PANEL_H), 1)
+            screen.blit(sidebar_title, (RIGHT_X + SIDEPAD, S.TOP_PANEL_H + 10))
+            screen.blit(ui_font.render("Size", True, S.TEXT), size_label_pos); drp_size.draw_head(screen)
+            screen.blit(ui_font.render("W (weight)", True, S.TEXT), weight_label_pos); drp_w.draw_head(screen)
+            screen.blit(ui_font.render("Mode", True, S.TEXT), mode_label_pos); drp_mode.draw_head(screen)
+
+            # History title + button
+            pygame.draw.line(screen, S.BTN_BR, (RIGHT_X+SIDEPAD, hist_sep_y), (RIGHT_X+RIGHT_W-SIDEPAD, hist_sep_y), 1)
+            screen.blit(ui_font.render("History", True, S.TEXT), hist_label_pos)
+            btn_hist.draw(screen)
+
+            # TOOLBOX
+            screen.blit(ui_font.render("Toolbox", True, S.TEXT), tools_label_pos)
+            for b in tool_buttons:
+                if b._tool == current_tool:
+                    b.bg = (200, 200, 200)
+                    b.border = (100, 100, 100)
+                else:
+                    b.bg = (245, 247, 250)
+                    b.border = (170, 176, 190)
+                b.draw(screen)
+                # draw icons for Start/Goal/Key/Wall (skip Monster)
+                if b._tool != Tool.MONSTER:
+                    ic = tool_icons.get(b._tool)
+                    if ic:
+                        ix = b.rect.x + 10
+                        iy = b.rect.y + (b.rect.height - 18) // 2
+                        screen.blit(ic, (ix, iy))
+
+            # Info lines
+            def qty_str(t):
+                v = inventory_left[t]
+                return "∞" if v == float("inf") else f"{int(v)}/{int(INVENTORY_MAX[t])}"
+            info_y = max(b.rect.bottom for b in tool_buttons) + 10
+            info_x = RIGHT_X + SIDEPAD
+            lines = [
+                f"Start:   {qty_str(Tool.START)}",
+                f"Goal:    {qty_str(Tool.GOAL)}",
+                f"Key:     {qty_str(Tool.KEY)}",
+                f"Checkpoint: {qty_str(Tool.CHECKPOINT)}",
+                f"Wall:    {qty_str(Tool.WALL)}",
+                f"Monster: {qty_str(Tool.MONSTER)}",
+                f"Monster cost: +{int(getattr(S,'MONSTER_COST',0))}",
+                "",
+                "LMB: place by tool",
+                "RMB: remove • RMB drag (Wall only)",
+                "Shift+RMB: erase wall",
+            ]
+            for line in lines:
+                surf = tiny_font.render(line, True, (90,95,105))
+                screen.blit(surf, (info_x, info_y))
+                info_y += tiny_font.get_height() + 4
+
+        # BOTTOM BAR (vẽ sau vùng game: tiêu đề PanelBox đè lên mép dưới vùng game)
+        if full or any(r.colliderect(BOTTOM_DIRTY) for r in rects):
+            pygame.draw.rect(screen, S.BOTTOM_BG, BOTTOM_RECT)
+            control_box.draw(screen); dir_box.draw(screen)
+            btn_prev.draw(screen); btn_play.draw(screen, active_override=playing); btn_next.draw(screen)
+            btn_4dir.draw(screen); btn_8dir.draw(screen)
+            drp_heur.draw_head(screen)
+            stsurf = ui_font.render(status, True, S.TEXT)
+            screen.blit(stsurf, (20, S.HEIGHT - S.BOTTOM_PANEL_H + BTN_H + 20))
+            screen.blit(tiny_font.render(pacing_status, True, (90,95,105)),
+                        (20, S.HEIGHT - S.BOTTOM_PANEL_H + BTN_H + 24 + stsurf.get_height()))
 
         # ---- modal dropdown ----
         opened = None
-        for dd in (drp_size, drp_w, drp_heur):
+        for dd in (drp_size, drp_w, drp_mode, drp_heur):
             if dd.opened: opened = dd; break
         if opened:
             overlay = pygame.Surface((S.WIDTH, S.HEIGHT), pygame.SRCALPHA)
@@ -1173,15 +1493,15 @@ def run():
                                  rect, 2, border_radius=10)
 
                 thumb_rect = pygame.Rect(rect.x+12, rect.y+12, rect.w-24, rect.h-60)
-                try:
-                    img = pygame.image.load(asset_path(opt["fname"])).convert_alpha()
-                    iw, ih = img.get_size()
-                    sc = min(thumb_rect.w/max(1, iw), thumb_rect.h/max(1, ih))
-                    img2 = pygame.transform.scale(img, (max(1,int(iw*sc)), max(1,int(ih*sc))))
+                img = ASSETS.image(opt["fname"])
+                if img is not None:
+                    def _thumb(img=img, tw=thumb_rect.w, th=thumb_rect.h):
+                        iw, ih = img.get_size()
+                        sc = min(tw/max(1, iw), th/max(1, ih))
+                        return pygame.transform.scale(img, (max(1,int(iw*sc)), max(1,int(ih*sc))))
+                    img2 = ASSETS.scaled(("thumb", opt["fname"], thumb_rect.w, thumb_rect.h), _thumb)
                     screen.blit(img2, (thumb_rect.centerx - img2.get_width()//2,
                                        thumb_rect.centery - img2.get_height()//2))
-                except Exception:
-                    pass
 
                 lbl = f"{opt['label']} (+{opt['cost']})"
                 surf = ui_font.render(lbl, True, (50,54,62))
@@ -1222,7 +1542,7 @@ def run():
             if not hist_show_compare:
                 screen.set_clip(content)
                 yy = content.y + 10
-                lines = history[-200:]
+                lines = history
                 line_h = ui_font.get_height() + 8
                 for i, item in enumerate(reversed(lines)):
                     label = item.get("label","(Empty)")
@@ -1232,7 +1552,9 @@ def run():
                     if selected:
                         hl = pygame.Surface((row_rect.w, row_rect.h), pygame.SRCALPHA)
                         hl.fill((80,120,255,60)); screen.blit(hl, (row_rect.x, row_rect.y))
-                    surf = ui_font.render(label, True, (70,74,82))
+                    surf = item.get("surf")
+                    if surf is None:
+                        surf = item["surf"] = ui_font.render(label, True, (70,74,82))
                     screen.blit(surf, (content.x + 14, yy))
                     yy += line_h
                     if yy > content.bottom: break
@@ -1269,25 +1591,20 @@ def run():
                 pygame.draw.rect(screen, (245, 247, 250), content, border_radius=8)
                 pygame.draw.rect(screen, (210, 214, 220), content, 1, border_radius=8)
 
-                entries = [history[i] for i in sorted(hist_selected)]
-
-                def score(ent):
-                    return (
-                        round(float(ent.get("cost", float("inf"))), 4),
-                        int(ent.get("explored", 10**9)),
-                        float(ent.get("runtime_ms", float("inf")))
-                    )
-
-                best_idx = None
-                if entries:
-                    best_idx = min(range(len(entries)), key=lambda i: score(entries[i]))
-
-                headers = ["#", "HEURISTIC", "WEIGHT", "DIR", "EXPLORED", "COST", "RUNTIME"]
+                # bảng dựng sẵn (truy vấn store + format + render chữ) khi đổi lựa chọn
+                ids = tuple(history[i]["id"] for i in sorted(hist_selected) if i < len(history))
+                if compare_table is None or compare_table[0] != ids:
+                    table = store.compare(ids)
+                    surfs = [[ui_font.render(h, True, (240, 244, 248)) for h in table["headers"]]]
+                    surfs += [[ui_font.render(v, True, (60,64,72)) for v in row] for row in table["rows"]]
+                    compare_table = (ids, table, surfs)
+                _, table, surfs = compare_table
+                best_idx = table["best"]
 
                 def _col_pos(perc):
                     return int(content.x + 16 + (content.w - 32) * perc)
 
-                col_x = [_col_pos(p) for p in (0.02, 0.10, 0.32, 0.46, 0.62, 0.76, 0.90)]
+                col_x = [_col_pos(p) for p in (0.02, 0.08, 0.25, 0.35, 0.48, 0.60, 0.71, 0.86)]
                 row_h = ui_font.get_height() + 18
 
                 head_y = content.y + 10
@@ -1295,11 +1612,11 @@ def run():
                 header_rect = pygame.Rect(content.x + 8, head_y - 6, content.w - 16, row_h)
                 pygame.draw.rect(screen, (110, 120, 132), header_rect, border_radius=8)
                 pygame.draw.rect(screen, (170, 176, 190), header_rect, 1, border_radius=8)
-                for cx, name in zip(col_x, headers):
-                    screen.blit(ui_font.render(name, True, (240, 244, 248)), (cx, head_y))
+                for cx, surf in zip(col_x, surfs[0]):
+                    screen.blit(surf, (cx, head_y))
 
                 y2 = head_y + row_h + 4
-                rows_to_draw = max(3, len(entries))
+                rows_to_draw = max(3, len(table["rows"]))
                 for i in range(rows_to_draw):
                     row_rect = pygame.Rect(content.x + 8, y2 - 6, content.w - 16, row_h)
 
@@ -1310,19 +1627,9 @@ def run():
                         pygame.draw.rect(screen, (255, 255, 255), row_rect, border_radius=8)
                         pygame.draw.rect(screen, (210, 214, 220), row_rect, 1, border_radius=8)
 
-                    if i < len(entries):
-                        ent = entries[i]
-                        vals = [
-                            str(i+1),
-                            str(ent.get("heuristic","")),
-                            f"{ent.get('weight',0):.2f}",
-                            "8-dir" if ent.get("eight_dir") else "4-dir",
-                            str(ent.get("explored",0)),
-                            f"{ent.get('cost',0.0):.2f}",
-                            f"{ent.get('runtime_ms',0.0):.1f} ms",
-                        ]
-                        for cx, v in zip(col_x, vals):
-                            screen.blit(ui_font.render(v, True, (60,64,72)), (cx, y2))
+                    if i < len(table["rows"]):
+                        for cx, surf in zip(col_x, surfs[i + 1]):
+                            screen.blit(surf, (cx, y2))
                         if i == best_idx:
                             badge = tiny_font.render("★ BEST", True, (30, 90, 50))
                             screen.blit(badge, (col_x[-1] + 80, y2 + 2))
@@ -1338,8 +1645,19 @@ def run():
                             (btn_back.centerx - ui_font.size(tback)[0]//2,
                              btn_back.centery - ui_font.get_height()//2))
 
-        pygame.display.flip()
+        if full:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+
+        # nhịp frame sau: bận thì chạy đủ fps, không thì chờ sự kiện / animation kế tiếp
+        busy = (playing or searching() or asset_loader is not None or panning
+                or any(pygame.mouse.get_pressed()))
+        waits = [ms for ms in (a.next_ms() for a in anims) if ms is not None]
+        wake_ms = min(waits) if waits else None
 
+    cancel_search()
+    store.close()
     pygame.quit(); sys.exit()
 
 if __name__ == "__main__":
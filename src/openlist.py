@@ -0,0 +1,158 @@
+# openlist.py
+"""
+Open list thay thế cho heap "lười" mặc định của search_flat (heapq với
+entry trùng: mỗi lần cải thiện g lại push 1 tuple mới, entry cũ bị bỏ qua
+khi pop vì node đã closed).
+
+- IndexedHeap: binary heap có chỉ số, mỗi node tối đa 1 entry; cải thiện g
+  -> decrease-key tại chỗ. Key lưu trong array theo id nên không cấp phát
+  tuple cho mỗi lần push.
+- BucketQueue: hàng đợi theo bucket f nguyên (lưới 4-dir / chebyshev với
+  chi phí và heuristic nguyên, W nguyên). Chỉ giữ bucket đang có entry
+  (dict + heap nhỏ các f đang dùng): push/pop O(log số f khác nhau).
+
+Cả 2 giữ đúng thứ tự (f, step_id, id) của heap mặc định nên path và
+thứ tự mở rộng không đổi (xem search_flat(open_list=...)). push(entry) /
+pop() nhận, trả entry (f, step_id, id) như heapq.heappush/heappop nên
+search_flat chỉ cần thay 2 hàm, vòng lặp của heap mặc định giữ nguyên.
+"""
+import heapq
+from array import array
+from collections import deque
+
+# "heap": heapq lười (mặc định) | "indexed": IndexedHeap | "bucket": BucketQueue
+OPEN_LISTS = ("heap", "indexed", "bucket")
+
+
+class IndexedHeap:
+    """
+    Binary heap có chỉ số trên id node 0..size-1, key (f, tie, id).
+    push() với node đã có trong heap = decrease-key (key chỉ được giảm,
+    đúng với A*: g mới luôn nhỏ hơn). f mới có thể bằng f cũ do làm tròn
+    số thực; khi đó giữ key cũ như entry cũ của heap lười sẽ được pop trước.
+    """
+
+    def __init__(self, size):
+        self.heap = []                       # list id, heap[0] = key nhỏ nhất
+        self.pos = array("l", [-1]) * size   # id -> vị trí trong heap, -1 nếu không có
+        self.f = array("d", [0.0]) * size
+        self.tie = array("l", [0]) * size
+
+    def __len__(self):
+        return len(self.heap)
+
+    def nodes(self):
+        return list(self.heap)
+
+    def push(self, entry):
+        f, tie, nid = entry
+        fk, tk, pos, heap = self.f, self.tie, self.pos, self.heap
+        i = pos[nid]
+        if i >= 0 and fk[nid] <= f:
+            return
+        fk[nid] = f
+        tk[nid] = tie
+        if i < 0:
+            i = len(heap)
+            heap.append(nid)
+        # sift up
+        while i > 0:
+            j = (i - 1) >> 1
+            p = heap[j]
+            fp = fk[p]
+            if fp < f or (fp == f and (tk[p] < tie or (tk[p] == tie and p < nid))):
+                break
+            heap[i] = p
+            pos[p] = i
+            i = j
+        heap[i] = nid
+        pos[nid] = i
+
+    def pop(self):
+        """Lấy entry (f, tie, id) có key nhỏ nhất (heap rỗng -> IndexError)."""
+        heap, pos, fk, tk = self.heap, self.pos, self.f, self.tie
+        top = heap[0]
+        entry = (fk[top], tk[top], top)
+        pos[top] = -1
+        last = heap.pop()
+        n = len(heap)
+        if n:
+            f, tie = fk[last], tk[last]
+            i = 0
+            # sift down
+            while True:
+                c = 2 * i + 1
+                if c >= n:
+                    break
+                b = heap[c]
+                fb, tb = fk[b], tk[b]
+                if c + 1 < n:
+                    r = heap[c + 1]
+                    fr, tr = fk[r], tk[r]
+                    if fr < fb or (fr == fb and (tr < tb or (tr == tb and r < b))):
+                        c, b, fb, tb = c + 1, r, fr, tr
+                if f < fb or (f == fb and (tie < tb or (tie == tb and last < b))):
+                    break
+                heap[i] = b
+                pos[b] = i
+                i = c
+            heap[i] = last
+            pos[last] = i
+        return entry
+
+
+class BucketQueue:
+    """
+    Hàng đợi bucket theo f nguyên: buckets[f] là deque id theo thứ tự
+    (step_id, id). Các push của cùng 1 lần mở rộng (cùng step_id) được gom
+    lại, sắp theo id rồi mới đổ vào bucket ở lần pop kế tiếp.
+    Bucket thưa: dict f -> deque chỉ cho các f đang có entry + heap các f
+    đó, nên W lớn / phụ phí quái vật lớn (f trải rộng) không cấp phát bucket
+    rỗng; bucket cạn thì bỏ luôn.
+    Entry cũ (node đã cải thiện sang bucket nhỏ hơn) để lại, người gọi bỏ
+    qua khi pop ra node đã closed - như heap mặc định.
+    """
+
+    def __init__(self):
+        self.buckets = {}    # f -> deque id (không rỗng)
+        self.keys = []       # heap các f có trong buckets
+        self.size = 0
+        self._batch = []
+
+    def __len__(self):
+        return self.size + len(self._batch)
+
+    def nodes(self):
+        return [nid for b in self.buckets.values() for nid in b] + [nid for _, nid in self._batch]
+
+    def push(self, entry):
+        self._batch.append((int(entry[0]), entry[2]))
+
+    def _flush(self):
+        buckets, keys = self.buckets, self.keys
+        batch = self._batch
+        if len(batch) > 1:
+            batch.sort()   # theo (f, id): trong mỗi bucket vẫn đúng thứ tự id
+        for i, nid in batch:
+            b = buckets.get(i)
+            if b is None:
+                b = buckets[i] = deque()
+                heapq.heappush(keys, i)   # W > 1: f không đơn điệu, có thể nhỏ hơn f đang pop
+            b.append(nid)
+        self.size += len(batch)
+        batch.clear()
+
+    def pop(self):
+        """Lấy entry (f, None, id) có (f, step_id, id) nhỏ nhất (rỗng -> IndexError)."""
+        if self._batch:
+            self._flush()
+        if not self.size:
+            raise IndexError("pop from empty bucket queue")
+        f = self.keys[0]
+        b = self.buckets[f]
+        nid = b.popleft()
+        if not b:
+            del self.buckets[f]
+            heapq.heappop(self.keys)
+        self.size -= 1
+        return (f, None, nid)
@@ -0,0 +1,101 @@
+# pacing.py
+"""
+Nhịp vòng lặp UI và tốc độ replay.
+
+- FramePacer thay clock.tick(S.FPS) cố định: đang bận (play, tìm, nạp asset,
+  kéo chuột) thì chạy đủ fps; rảnh thì chặn trong pygame.event.wait tới khi
+  có sự kiện hoặc tới lúc animator đang hiện đổi frame kế tiếp.
+- Playback tách bước replay khỏi frame: mỗi frame tiến số bước theo thời gian
+  thực và tốc độ đang chọn (có thể nhiều bước/frame).
+"""
+import time
+import pygame
+
+
+class FramePacer:
+    """
+    wait(busy, wake_ms) chờ tới frame kế, trả (dt_ms, events).
+    - Không bao giờ nhanh hơn fps (di chuột liên tục cũng không vượt).
+    - busy = False và chưa có sự kiện: chờ sự kiện tối đa
+      min(wake_ms, idle_ms) ms (wake_ms None = không có animation cần chạy).
+    fps: số frame thực chạy / giây, đo lại mỗi ~1 s (lúc rảnh có thể < 1).
+    """
+
+    def __init__(self, fps, idle_ms=1000):
+        self.frame_ms = 1000.0 / max(1, fps)
+        self.idle_ms = max(1, int(idle_ms))
+        self.fps = 0.0
+        self.idle = False        # frame vừa rồi đã chờ sự kiện
+        self._last = time.perf_counter()
+        self._win_start = self._last
+        self._win_frames = 0
+
+    def wait(self, busy, wake_ms=None):
+        spare = self.frame_ms - (time.perf_counter() - self._last) * 1000.0
+        if spare >= 1:
+            pygame.time.wait(int(spare))
+        events = pygame.event.get()
+        self.idle = not events and not busy
+        if self.idle:
+            timeout = self.idle_ms if wake_ms is None else min(self.idle_ms, wake_ms)
+            # event.wait(0) = chờ mãi mãi -> tối thiểu 1 ms
+            e = pygame.event.wait(max(1, int(timeout)))
+            if e.type != pygame.NOEVENT:
+                events = [e] + pygame.event.get()
+        now = time.perf_counter()
+        dt = (now - self._last) * 1000.0
+        self._last = now
+        self._win_frames += 1
+        if now - self._win_start >= 1.0:
+            self.fps = self._win_frames / (now - self._win_start)
+            self._win_start, self._win_frames = now, 0
+        return dt, events
+
+
+class Playback:
+    """
+    Số bước replay cần tiến mỗi frame theo tốc độ (S.PLAYBACK_SPEEDS):
+    - số k: k bước mỗi step_ms (x1 = 1 bước / AUTO_STEP_EVERY_MS như cũ);
+    - "auto": như x1, nhưng nhanh lên để cả trace chạy trong fit_s giây.
+    Phần lẻ được cộng dồn giữa các frame nên tốc độ đúng bất kể fps.
+    """
+    MAX_DT_MS = 250   # frame bị khựng lâu (dựng lại map, nạp file) không nhảy cóc quá xa
+
+    def __init__(self, step_ms, speeds=(1,), fit_s=10, index=0):
+        self.step_ms = max(1.0, float(step_ms))
+        self.speeds = tuple(speeds) or (1,)
+        self.fit_s = max(0.1, float(fit_s))
+        self.index = max(0, min(int(index), len(self.speeds) - 1))
+        self.acc = 0.0
+
+    @property
+    def speed(self):
+        return self.speeds[self.index]
+
+    def faster(self):
+        self.index = min(self.index + 1, len(self.speeds) - 1)
+
+    def slower(self):
+        self.index = max(self.index - 1, 0)
+
+    def reset(self):
+        self.acc = 0.0
+
+    def rate(self, n_states):
+        """Số bước / ms với trace n_states bước."""
+        base = 1.0 / self.step_ms
+        if self.speed == "auto":
+            return max(base, n_states / (self.fit_s * 1000.0))
+        return base * float(self.speed)
+
+    def label(self, n_states):
+        if self.speed == "auto":
+            return f"auto x{self.rate(n_states) * self.step_ms:.3g}"
+        return f"x{self.speed:g}"
+
+    def advance(self, dt_ms, n_states):
+        """Số bước cần tiến trong frame dài dt_ms (phần lẻ giữ cho frame sau)."""
+        self.acc += min(dt_ms, self.MAX_DT_MS) * self.rate(n_states)
+        n = int(self.acc)
+        self.acc -= n
+        return n
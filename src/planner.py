@@ -0,0 +1,655 @@
+# planner.py
+"""
+Lớp tìm đường headless dùng chung cho UI và các script (không cần Pygame).
+
+- build_two_leg_states: ghép chặng Start -> Key -> Goal thành một Trace.
+- build_route_states: nhiều waypoint (Key + checkpoint), tự sắp thứ tự thăm.
+- TraceCache: LRU các Trace đã tính, khoá theo nội dung lưới + tham số,
+  có ngân sách bộ nhớ; giữ thêm vài FlatGrid gần nhất để dùng lại
+  (kèm bảng nhảy JPS+ đã tính).
+- plan: tìm (hoặc lấy từ cache) trace cho một cấu hình.
+- compute_metrics: số node đã mở rộng + chi phí path (kể cả phụ phí quái vật).
+- Replanner: giữ trạng thái LPA* của từng chặng để khi sửa tường/quái
+  vật chỉ phải sửa lại phần bị ảnh hưởng.
+- Có Key trên map lớn: chặng Key -> Goal chạy song song trong process
+  con (tránh GIL) trong lúc chặng Start -> Key chạy ở thread hiện tại.
+
+Ví dụ:
+  from src.planner import plan
+  trace = plan(grid, (0, 0), None, (9, 9), heuristic_kind="octile", eight_dir=True)
+"""
+import hashlib, math, os, threading, time
+from collections import OrderedDict
+
+from . import settings as S
+from .trace import Trace
+from .astar import (MODES, FlatGrid, LPAStar, SearchCancelled, build_trace,
+                    lpa_supported, monster_costs, search_flat, search_flat_multi)
+
+# ~byte cho mỗi bước + mỗi lần push trong Trace (đo bằng tracemalloc:
+# tuple bước, tuple pushed, node (r,c) và entry trong cây cha)
+TRACE_ITEM_BYTES = 184
+
+
+# ---------- chặng 2 song song (process pool) ----------
+_POOL = None
+_POOL_FAILED = False
+_CANCEL_FLAGS = None    # mảng chia sẻ: cờ huỷ theo slot của từng job
+_CANCEL_SLOTS = 256
+_next_slot = 0
+_pool_lock = threading.Lock()
+
+
+def _pool_init(flags):
+    global _CANCEL_FLAGS
+    _CANCEL_FLAGS = flags
+
+
+class _SlotCancel:
+    """Cờ huỷ giả threading.Event (chỉ is_set) đọc từ bộ nhớ chia sẻ."""
+    __slots__ = ("slot",)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def is_set(self):
+        return bool(_CANCEL_FLAGS[self.slot])
+
+
+def _leg_pool():
+    """Pool 1 process (spawn: an toàn khi tiến trình cha có nhiều thread),
+    tạo lười ở lần dùng đầu. None nếu môi trường không tạo được process."""
+    global _POOL, _POOL_FAILED, _CANCEL_FLAGS
+    with _pool_lock:
+        if _POOL is None and not _POOL_FAILED:
+            try:
+                # import lười: multiprocessing/concurrent.futures tốn ~35 ms lúc import planner
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                ctx = multiprocessing.get_context("spawn")
+                _CANCEL_FLAGS = ctx.Array("b", _CANCEL_SLOTS, lock=False)
+                _POOL = ProcessPoolExecutor(max_workers=1, mp_context=ctx,
+                                            initializer=_pool_init,
+                                            initargs=(_CANCEL_FLAGS,))
+            except (OSError, ImportError, NotImplementedError):
+                _POOL_FAILED = True
+        return _POOL
+
+
+def _use_parallel(fg, key_pos, mode, parallel=None):
+    """
+    Có chạy chặng 2 song song không. parallel=None: tự quyết theo settings
+    (PARALLEL_LEGS, PARALLEL_LEGS_MIN_CELLS) và số CPU; True/False để ép.
+    JPS+ luôn tuần tự: bảng nhảy đã cache trên fg, process con phải tính lại.
+    """
+    if not key_pos or mode == "jps+":
+        return False
+    if parallel is None:
+        parallel = (getattr(S, "PARALLEL_LEGS", True)
+                    and (os.cpu_count() or 1) > 1
+                    and fg.rows * fg.cols >= int(getattr(S, "PARALLEL_LEGS_MIN_CELLS", 0)))
+    return bool(parallel) and _leg_pool() is not None
+
+
+def _leg_job(fg, start, goal, slot, search, want_state):
+    """Chạy trong process con: 1 chặng, trả về dữ liệu để ghép vào trace cha."""
+    cancel = _SlotCancel(slot)
+    trace = Trace()
+    state = {} if want_state else None
+    if want_state:
+        res = search_flat(fg, start, goal, trace=trace, cancel=cancel, state=state,
+                          heuristic_kind=search["heuristic_kind"],
+                          eight_dir=search["eight_dir"], weight=search["weight"])
+    else:
+        build_trace(fg, start, goal, trace=trace, cancel=cancel, **search)
+        res = {"found": trace.found, "path": trace.final_path}
+    return trace.segments[0][3], trace.steps, res, state
+
+
+class _LegJob:
+    """Chặng đã gửi sang process con; result() chờ và vẫn nghe cờ huỷ của cha."""
+
+    def __init__(self, fg, start, goal, search, want_state=False):
+        global _next_slot
+        with _pool_lock:
+            self.slot = _next_slot
+            _next_slot = (_next_slot + 1) % _CANCEL_SLOTS
+        _CANCEL_FLAGS[self.slot] = 0
+        self.future = _POOL.submit(_leg_job, fg, tuple(start), tuple(goal),
+                                   self.slot, search, want_state)
+
+    def cancel(self):
+        _CANCEL_FLAGS[self.slot] = 1
+        self.future.cancel()
+
+    def result(self, cancel=None):
+        """(roots, steps, res, state); SearchCancelled nếu cha bị huỷ khi đang chờ."""
+        from concurrent.futures import TimeoutError as FutureTimeout
+        while True:
+            if cancel is not None and cancel.is_set():
+                self.cancel()
+                raise SearchCancelled()
+            try:
+                return self.future.result(timeout=0.05)
+            except FutureTimeout:
+                continue
+
+
+def build_two_leg_states(grid, start, key_pos, goal, monsters,
+                         heuristic_kind, eight_dir, weight, monster_cost,
+                         mode="astar", trace=None, cancel=None, parallel=None):
+    """
+    Tạo Trace (delta) bằng cách ghép 2 chặng build_trace:
+      1) start -> key_pos
+      2) key_pos -> goal
+    Nếu không có key_pos, chạy thẳng start -> goal.
+    mode: xem astar.MODES (áp dụng cho từng chặng).
+    monsters: set (cùng phụ phí monster_cost) hoặc dict {(r,c): phụ phí}
+    (mỗi loại quái vật một mức, xem astar.monster_costs).
+    grid: list 2D hoặc FlatGrid dựng sẵn (vd. lấy từ TraceCache.flat_grid).
+    trace/cancel: ghi dần vào trace có sẵn và cho phép huỷ (xem SearchWorker).
+    parallel: chạy chặng 2 trong process con cùng lúc với chặng 1 (xem
+    _use_parallel); chặng 1 không tới được Key thì huỷ chặng 2.
+    Trace ghép y như chạy tuần tự.
+    """
+    search = dict(heuristic_kind=heuristic_kind,
+                  eight_dir=eight_dir,
+                  mode=mode,
+                  weight=weight,
+                  monsters=monsters,
+                  monster_extra_cost=monster_cost)
+    # dựng lưới phẳng 1 lần, dùng chung cho cả 2 chặng
+    if not isinstance(grid, FlatGrid):
+        grid = FlatGrid(grid, monsters, monster_cost)
+
+    if key_pos:
+        job = None
+        if _use_parallel(grid, key_pos, mode, parallel):
+            job = _LegJob(grid, key_pos, goal, search)
+        try:
+            trace = build_trace(grid, start, key_pos, trace=trace, cancel=cancel, **search)
+        except BaseException:
+            if job is not None:
+                job.cancel()
+            raise
+        # không tới được Key -> trả về kết quả chặng 1
+        if not trace or not trace.found:
+            if job is not None:
+                job.cancel()
+            return trace
+        path1 = trace.final_path
+
+        if job is not None:
+            roots, steps, res, _ = job.result(cancel)
+            trace.extend_segment(roots, steps)
+            trace.final_path = res["path"]
+        else:
+            build_trace(grid, key_pos, goal, trace=trace, cancel=cancel, **search)
+
+        # vá path cuối = path1 + path2[1:] để không lặp node Key
+        if trace.found:
+            trace.final_path = list(path1) + list(trace.final_path[1:])
+        return trace
+
+    # Không có key -> chạy thẳng
+    return build_trace(grid, start, goal, trace=trace, cancel=cancel, **search)
+
+
+# ---------- nhiều waypoint (Key, checkpoint...) ----------
+# số waypoint tối đa để sắp thứ tự bằng DP chính xác (Held-Karp, O(2^n·n²));
+# nhiều hơn thì láng giềng gần nhất + 2-opt
+EXACT_ORDER_MAX = 10
+
+
+def distance_matrix(fg, points, heuristic_kind="manhattan", eight_dir=False, cancel=None):
+    """
+    D[i][j] = chi phí ngắn nhất points[i] -> points[j] (INF nếu không tới được),
+    points = [start, *stops, goal]. Mỗi điểm (trừ goal) chỉ chạy 1 lượt
+    search_flat_multi tới mọi điểm còn lại thay vì N² lượt A* riêng.
+    Không dùng W/mode: thứ tự được chọn theo chi phí thật.
+    """
+    n = len(points)
+    D = [[0.0] * n for _ in range(n)]
+    for i in range(n - 1):
+        targets = [j for j in range(1, n) if j != i]
+        costs = search_flat_multi(fg, points[i], [points[j] for j in targets],
+                                  heuristic_kind=heuristic_kind, eight_dir=eight_dir,
+                                  cancel=cancel)
+        for j, c in zip(targets, costs):
+            D[i][j] = c
+    return D
+
+
+def _route_cost(D, order):
+    """Tổng chi phí start(0) -> order... -> goal(cuối)."""
+    cost, prev = 0.0, 0
+    for k in order:
+        cost += D[prev][k]
+        prev = k
+    return cost + D[prev][len(D) - 1]
+
+
+def order_stops(D):
+    """
+    Thứ tự thăm các waypoint 1..n-2 (start = 0, goal = n-1 cố định) cho tổng
+    chi phí nhỏ nhất. D có thể bất đối xứng (phụ phí tính ở ô bước vào).
+    Không có thứ tự nào đi hết được -> giữ thứ tự gốc.
+    """
+    m = len(D) - 2
+    if m <= 1:
+        return list(range(1, m + 1))
+    INF = float("inf")
+    if m <= EXACT_ORDER_MAX:
+        # Held-Karp: best[mask][k] = chi phí nhỏ nhất đi qua tập mask, dừng ở k
+        full = (1 << m) - 1
+        best = [[INF] * m for _ in range(full + 1)]
+        back = [[-1] * m for _ in range(full + 1)]
+        for k in range(m):
+            best[1 << k][k] = D[0][k + 1]
+        for mask in range(1, full + 1):
+            row = best[mask]
+            for k in range(m):
+                cur = row[k]
+                if cur == INF or not (mask >> k) & 1:
+                    continue
+                dk = D[k + 1]
+                for j in range(m):
+                    if (mask >> j) & 1:
+                        continue
+                    v = cur + dk[j + 1]
+                    nm = mask | (1 << j)
+                    if v < best[nm][j]:
+                        best[nm][j] = v
+                        back[nm][j] = k
+        goal = m + 1
+        last = min(range(m), key=lambda k: best[full][k] + D[k + 1][goal])
+        if best[full][last] + D[last + 1][goal] == INF:
+            return list(range(1, m + 1))
+        order, mask = [], full
+        while last >= 0:
+            order.append(last + 1)
+            last, mask = back[mask][last], mask & ~(1 << last)
+        order.reverse()
+        return order
+
+    # láng giềng gần nhất rồi 2-opt (đảo đoạn) tới khi không cải thiện được
+    left = set(range(1, m + 1))
+    order, prev = [], 0
+    while left:
+        nxt = min(left, key=lambda k: (D[prev][k], k))
+        order.append(nxt)
+        left.discard(nxt)
+        prev = nxt
+    cost = _route_cost(D, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(m - 1):
+            for j in range(i + 1, m):
+                cand = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                c = _route_cost(D, cand)
+                if c < cost:
+                    order, cost, improved = cand, c, True
+    if cost == INF:
+        return list(range(1, m + 1))
+    return order
+
+
+def build_route_states(grid, start, stops, goal, monsters,
+                       heuristic_kind, eight_dir, weight, monster_cost,
+                       mode="astar", optimize=True, trace=None, cancel=None,
+                       parallel=None):
+    """
+    Start -> stops... -> Goal (stops: Key, checkpoint...), mỗi đoạn một chặng
+    build_trace ghép vào cùng Trace như build_two_leg_states.
+    optimize=True: sắp lại thứ tự stops cho tổng chi phí nhỏ nhất
+    (distance_matrix + order_stops). trace.route = [start, *stops đã sắp, goal].
+    0-1 stop: chính là build_two_leg_states (kể cả chặng 2 song song).
+    """
+    stops = list(dict.fromkeys(tuple(x) for x in stops if x))   # bỏ trùng, giữ thứ tự
+    start, goal = tuple(start), tuple(goal)
+    if not isinstance(grid, FlatGrid):
+        grid = FlatGrid(grid, monsters, monster_cost)
+    if optimize and len(stops) > 1:
+        points = [start, *stops, goal]
+        D = distance_matrix(grid, points, heuristic_kind, eight_dir, cancel)
+        stops = [points[k] for k in order_stops(D)]
+
+    if len(stops) <= 1:
+        trace = build_two_leg_states(grid, start, stops[0] if stops else None, goal, monsters,
+                                     heuristic_kind, eight_dir, weight, monster_cost,
+                                     mode=mode, trace=trace, cancel=cancel, parallel=parallel)
+    else:
+        if trace is None:
+            trace = Trace()
+        search = dict(heuristic_kind=heuristic_kind, eight_dir=eight_dir, mode=mode,
+                      weight=weight, monsters=monsters, monster_extra_cost=monster_cost,
+                      cancel=cancel)
+        ends = [start, *stops, goal]
+        path = []
+        for a, b in zip(ends, ends[1:]):
+            build_trace(grid, a, b, trace=trace, **search)
+            if not trace.found:
+                break
+            # nối path, bỏ node trùng ở chỗ nối
+            path = path + list(trace.final_path[1:]) if path else list(trace.final_path)
+        else:
+            trace.final_path = path
+    trace.route = [start, *stops, goal]
+    return trace
+
+
+# ---------- khoá cache ----------
+def grid_digest(grid, monsters=None, monster_cost=0.0):
+    """
+    Băm nội dung lưới (+ phụ phí từng ô quái vật, bỏ ô phụ phí 0 giống
+    FlatGrid.has_extra). Hai lưới cùng nội dung cho cùng digest.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{len(grid)}x{len(grid[0]) if grid else 0}".encode())
+    for row in grid:
+        try:
+            h.update(bytes(row))
+        except (TypeError, ValueError):
+            h.update(bytes(1 if v == 1 else 0 for v in row))
+    costs = sorted((tuple(rc), float(v)) for rc, v in monster_costs(monsters, monster_cost).items()
+                   if v)
+    if costs:
+        h.update(repr(costs).encode())
+    return h.digest()
+
+
+def search_key(grid, start, key_pos, goal, monsters,
+               heuristic_kind, eight_dir, weight, monster_cost, mode="astar",
+               waypoints=(), digest=None):
+    """
+    Khoá của một lượt tìm: (digest lưới, start, key, goal, heuristic,
+    eight_dir, weight, monster_cost, mode, waypoints).
+    digest: truyền vào nếu đã băm sẵn.
+    """
+    if digest is None:
+        digest = grid_digest(grid, monsters, monster_cost)
+    return (digest,
+            tuple(start), tuple(key_pos) if key_pos else None, tuple(goal),
+            str(heuristic_kind), bool(eight_dir), float(weight),
+            float(monster_cost), str(mode), tuple(tuple(w) for w in waypoints))
+
+
+def compute_metrics(states, fg=None, diag_cost_is_one=False):
+    """Tính (explored_count, total_cost) của Trace / list state cũ — total_cost gồm
+    bước đi + phụ phí khi bước vào ô Monster.
+    fg: FlatGrid của lượt tìm; phụ phí đọc từ lớp chi phí fg.extra (như lúc
+    tìm). None = không tính phụ phí.
+    diag_cost_is_one: bước chéo tốn 1 (8-dir + chebyshev) thay vì sqrt(2),
+    như search_flat."""
+    if not states:
+        return 0, 0.0
+    if isinstance(states, Trace):
+        # Trace giữ sẵn tổng kết bước cuối, không cần replay
+        explored = states.explored
+        path = states.final_path or []
+    else:
+        last = states[-1]
+        explored = len(last.get("closed", []))
+        path = last.get("path", [])
+    diag = 1.0 if diag_cost_is_one else math.sqrt(2.0)
+    extra = fg.extra if fg is not None and fg.has_extra else None
+    cost = 0.0
+    for i in range(1, len(path)):
+        r0, c0 = path[i-1]
+        r1, c1 = path[i]
+        cost += diag if r0 != r1 and c0 != c1 else 1.0
+        if extra is not None:
+            cost += extra[fg.node_id((r1, c1))]
+    return explored, cost
+
+
+def trace_nbytes(trace):
+    """Ước lượng bộ nhớ của một Trace (byte)."""
+    items = len(trace.steps) + sum(len(step[1]) for step in trace.steps)
+    path = len(trace.final_path) if trace.final_path is not None else 0
+    return items * TRACE_ITEM_BYTES + path * 8
+
+
+class TraceCache:
+    """
+    LRU các Trace đã tìm xong, khoá bằng search_key().
+    - budget_bytes: tổng bộ nhớ ước lượng (trace_nbytes); vượt thì bỏ
+      entry ít dùng nhất. Trace lớn hơn cả ngân sách thì không cache.
+    - flat_slots: số FlatGrid gần nhất giữ lại theo digest lưới, để đổi
+      heuristic/W/mode trên cùng map không phải dựng lại lưới phẳng
+      (và bảng nhảy JPS+).
+    Trace trong cache dùng chung giữa các lần get: coi như chỉ đọc.
+    An toàn khi gọi từ nhiều thread (UI + thread tìm kiếm).
+    """
+
+    def __init__(self, budget_bytes, flat_slots=2):
+        self.budget_bytes = int(budget_bytes)
+        self.flat_slots = int(flat_slots)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (trace, runtime_ms, nbytes)
+        self._flats = OrderedDict()     # digest -> FlatGrid
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """(trace, runtime_ms) nếu có, ngược lại None. Đánh dấu vừa dùng."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, trace, runtime_ms=0.0):
+        """Lưu trace đã tìm xong; trả về False nếu trace quá lớn so với ngân sách."""
+        size = trace_nbytes(trace)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            if size > self.budget_bytes:
+                return False
+            self._entries[key] = (trace, float(runtime_ms), size)
+            self.nbytes += size
+            while self.nbytes > self.budget_bytes:
+                _, (_, _, n) = self._entries.popitem(last=False)
+                self.nbytes -= n
+            return True
+
+    def flat_grid(self, digest, grid, monsters=None, monster_cost=0.0):
+        """FlatGrid cho lưới có digest này (dựng mới nếu chưa có)."""
+        with self._lock:
+            fg = self._flats.get(digest)
+            if fg is not None:
+                self._flats.move_to_end(digest)
+                return fg
+        fg = FlatGrid(grid, monsters, monster_cost)   # dựng ngoài lock
+        with self._lock:
+            self._flats[digest] = fg
+            while len(self._flats) > max(0, self.flat_slots):
+                self._flats.popitem(last=False)
+        return fg
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._flats.clear()
+            self.nbytes = 0
+
+
+def build_cached(cache, key, grid, start, key_pos, goal, monsters,
+                 heuristic_kind, eight_dir, weight, monster_cost,
+                 mode="astar", waypoints=(), trace=None, cancel=None):
+    """
+    Như build_route_states (Key + waypoints, tự sắp thứ tự) nhưng lấy
+    FlatGrid từ cache theo digest trong key (key = search_key(...)).
+    Không tự put: người gọi lưu trace khi lượt tìm đã xong trọn vẹn.
+    """
+    fg = cache.flat_grid(key[0], grid, monsters, monster_cost)
+    return build_route_states(fg, start, [key_pos, *waypoints], goal, monsters,
+                              heuristic_kind, eight_dir, weight, monster_cost,
+                              mode=mode, trace=trace, cancel=cancel)
+
+
+# cache dùng chung trong tiến trình (UI và plan() mặc định)
+TRACE_CACHE = TraceCache(int(float(getattr(S, "TRACE_CACHE_MB", 256)) * 1024 * 1024))
+
+
+def plan(grid, start, key_pos, goal, monsters=None,
+         heuristic_kind="manhattan", eight_dir=False, weight=1.0,
+         monster_cost=0.0, mode="astar", waypoints=(), cache=TRACE_CACHE):
+    """
+    Tìm đường headless có cache: trả về Trace (đã ghép chặng qua Key và các
+    waypoints nếu có, thứ tự thăm tối ưu - xem build_route_states).
+    Cùng lưới + tham số với một lượt trước -> trả lại đúng Trace đó.
+    cache=None để luôn tìm lại.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown search mode: {mode!r}")
+    # dict {(r,c): phụ phí} giữ nguyên mức riêng từng ô, còn lại coi như set
+    monsters = dict(monsters) if isinstance(monsters, dict) else set(monsters or ())
+    if cache is None:
+        return build_route_states(grid, start, [key_pos, *waypoints], goal, monsters,
+                                  heuristic_kind, eight_dir, weight, monster_cost,
+                                  mode=mode)
+    key = search_key(grid, start, key_pos, goal, monsters,
+                     heuristic_kind, eight_dir, weight, monster_cost, mode, waypoints)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit[0]
+    t0 = time.perf_counter()
+    trace = build_cached(cache, key, grid, start, key_pos, goal, monsters,
+                         heuristic_kind, eight_dir, weight, monster_cost,
+                         mode=mode, waypoints=waypoints)
+    cache.put(key, trace, (time.perf_counter() - t0) * 1000.0)
+    return trace
+
+
+class Replanner:
+    """
+    Tìm lại tăng dần cho Start -> (Key) -> Goal trên một lưới riêng (bản sao).
+    - plan(): lượt đầu = A* thường (trace giống build_two_leg_states), rồi
+      giữ state của từng chặng thành LPAStar.
+    - apply(edits): ghi các ô vừa sửa vào lưới riêng + báo cho mọi chặng.
+    - replan(): chỉ sửa các node bị ảnh hưởng; trace chỉ gồm các bước sửa.
+    params: dict start/key_pos/goal/monsters/heuristic_kind/eight_dir/
+    weight/monster_cost/mode như build_two_leg_states; đổi bất kỳ tham số
+    nào (trừ tường/quái vật) thì phải dựng Replanner mới (xem matches).
+    Không an toàn cho 2 thread cùng lúc: người gọi phải chờ lượt trước dừng.
+    """
+
+    def __init__(self, grid, **params):
+        self.params = params
+        self.fg = FlatGrid(grid, params.get("monsters"), params.get("monster_cost", 0.0))
+        self.legs = []      # [(start, goal, LPAStar | None)]
+        self.ready = False  # plan() đã chạy xong
+
+    @staticmethod
+    def supported(heuristic_kind, eight_dir, weight, mode="astar", waypoints=(), **_):
+        # có checkpoint: sửa map có thể đổi thứ tự thăm tối ưu -> tìm lại toàn bộ
+        return not waypoints and lpa_supported(heuristic_kind, eight_dir, weight, mode)
+
+    def matches(self, **params):
+        """Cùng cấu hình (bỏ qua monsters: vị trí quái vật sửa qua apply)."""
+        mine = {k: v for k, v in self.params.items() if k != "monsters"}
+        other = {k: v for k, v in params.items() if k != "monsters"}
+        return self.ready and mine == other
+
+    def _full_leg(self, start, goal, trace, cancel):
+        p = self.params
+        state = {}
+        res = search_flat(self.fg, start, goal,
+                          heuristic_kind=p["heuristic_kind"],
+                          eight_dir=p["eight_dir"],
+                          weight=p["weight"],
+                          trace=trace, cancel=cancel, state=state)
+        lpa = LPAStar(self.fg, start, goal, state,
+                      heuristic_kind=p["heuristic_kind"],
+                      eight_dir=p["eight_dir"],
+                      weight=p["weight"])
+        return lpa, res
+
+    def plan(self, trace=None, cancel=None, parallel=None):
+        """Lượt tìm đầu (A* thường) + dựng state LPA* cho từng chặng.
+        Có Key: chặng 2 chạy song song như build_two_leg_states."""
+        p = self.params
+        if trace is None:
+            trace = Trace()
+        ends = [tuple(p["start"])]
+        if p.get("key_pos"):
+            ends.append(tuple(p["key_pos"]))
+        ends.append(tuple(p["goal"]))
+        self.legs = [(a, b, None) for a, b in zip(ends, ends[1:])]
+        self.ready = False
+        trace.route = ends
+        if len(self.legs) < 2 or not _use_parallel(self.fg, True, p["mode"], parallel):
+            return self._run(trace, cancel)
+
+        (a1, b1, _), (a2, b2, _) = self.legs
+        search = {k: p[k] for k in ("heuristic_kind", "eight_dir", "weight")}
+        job = _LegJob(self.fg, a2, b2, search, want_state=True)
+        try:
+            lpa, res = self._full_leg(a1, b1, trace, cancel)
+        except BaseException:
+            job.cancel()
+            raise
+        self.legs[0] = (a1, b1, lpa)
+        trace.final_path = res["path"]
+        if not res["found"]:
+            job.cancel()
+        else:
+            path1 = res["path"]
+            roots, steps, res, state = job.result(cancel)
+            trace.extend_segment(roots, steps)
+            self.legs[1] = (a2, b2, LPAStar(self.fg, a2, b2, state, **search))
+            trace.final_path = path1 + res["path"][1:] if res["found"] else res["path"]
+        self.ready = True
+        return trace
+
+    def apply(self, edits):
+        """
+        edits: [((r,c), wall, extra)] trạng thái MỚI của các ô vừa sửa;
+        extra = phụ phí quái vật của ô (0 = không có; True = monster_cost chung).
+        """
+        cost = float(self.params.get("monster_cost", 0.0))
+        nids = [self.fg.set_cell(rc, wall, cost if extra is True else float(extra or 0.0))
+                for rc, wall, extra in edits]
+        if nids:
+            for _, _, lpa in self.legs:
+                if lpa is not None:
+                    lpa.cells_changed(nids)
+
+    def replan(self, trace=None, cancel=None):
+        """Sửa lại path sau apply(); huỷ giữa chừng vẫn giữ state hợp lệ."""
+        if trace is None:
+            trace = Trace()
+        return self._run(trace, cancel)
+
+    def _run(self, trace, cancel):
+        trace.route = [a for a, _, _ in self.legs] + [self.legs[-1][1]]
+        path = []
+        for i, (a, b, lpa) in enumerate(self.legs):
+            if lpa is None:
+                # chặng chưa từng chạy (vd. trước đó không tới được Key)
+                lpa, res = self._full_leg(a, b, trace, cancel)
+                self.legs[i] = (a, b, lpa)
+            else:
+                res = lpa.compute(trace, cancel)
+            trace.final_path = res["path"]
+            if not res["found"]:
+                break
+            path = path + res["path"][1:] if path else list(res["path"])
+        else:
+            trace.final_path = path
+        self.ready = True
+        return trace
@@ -0,0 +1,424 @@
+# render.py
+import pygame
+from . import settings as S
+
+WALL_FALLBACK = (65, 70, 80)
+
+# Dưới ngưỡng này (px/ô) chuyển sang chế độ LOD: mỗi ô = 1 pixel rồi scale
+LOD_CELL = 6
+# Số ô dư quanh vùng nhìn thấy khi dựng layer (đỡ phải dựng lại mỗi lần pan)
+VIEW_MARGIN = 16
+MAX_CELL = 64
+
+_WALL_TABLE = bytes(1 if i == 1 else 0 for i in range(256))
+
+
+class Camera:
+    """
+    Pan/zoom cho vùng game, dựa trên camx/camy (offset pixel của góc nhìn).
+    - scale = fit_cell * zoom (px/ô); zoom = 1 là vừa khít như trước.
+    - scale >= LOD_CELL: chế độ chi tiết, CELL nguyên (tile + sprite).
+    - scale <  LOD_CELL: chế độ LOD, CELL thực (có thể < 1), vẽ kiểu minimap.
+    """
+
+    def __init__(self, area):
+        self.area = pygame.Rect(area)
+        self.rows = self.cols = 1
+        self.zoom = 1.0
+        self.camx = self.camy = 0
+
+    def set_map(self, rows, cols):
+        self.rows, self.cols = max(1, rows), max(1, cols)
+        self.fit()
+
+    def fit(self):
+        self.zoom = 1.0
+        self.camx = self.camy = 0
+
+    @property
+    def fit_cell(self):
+        return min(self.area.w / self.cols, self.area.h / self.rows)
+
+    @property
+    def lod(self):
+        return self.fit_cell * self.zoom < LOD_CELL
+
+    @property
+    def cell(self):
+        s = self.fit_cell * self.zoom
+        return s if s < LOD_CELL else int(s)
+
+    def layout(self):
+        """(CELL, MX, MY): MX/MY là gốc map trên màn hình khi camx = camy = 0."""
+        cell = self.cell
+        mw, mh = self.cols * cell, self.rows * cell
+        mx = self.area.x + max(0, int(self.area.w - mw) // 2)
+        my = self.area.y + max(0, int(self.area.h - mh) // 2)
+        return cell, mx, my
+
+    def clamp(self):
+        cell = self.cell
+        self.camx = int(max(0, min(self.camx, self.cols * cell - self.area.w)))
+        self.camy = int(max(0, min(self.camy, self.rows * cell - self.area.h)))
+
+    def pan(self, dx, dy):
+        self.camx += dx
+        self.camy += dy
+        self.clamp()
+
+    def zoom_at(self, pos, factor):
+        """Zoom giữ nguyên điểm map nằm dưới pos (toạ độ màn hình)."""
+        cell, mx, my = self.layout()
+        fx = (pos[0] - mx + self.camx) / cell
+        fy = (pos[1] - my + self.camy) / cell
+        max_zoom = max(1.0, MAX_CELL / self.fit_cell)
+        self.zoom = max(0.5, min(max_zoom, self.zoom * factor))
+        cell, mx, my = self.layout()
+        self.camx = fx * cell - (pos[0] - mx)
+        self.camy = fy * cell - (pos[1] - my)
+        self.clamp()
+
+    def visible(self):
+        """Các ô nhìn thấy (r0, c0, r1, c1), nửa mở."""
+        cell, mx, my = self.layout()
+        c0 = max(0, int((self.area.x - mx + self.camx) // cell))
+        r0 = max(0, int((self.area.y - my + self.camy) // cell))
+        c1 = min(self.cols, int((self.area.right - mx + self.camx) // cell) + 1)
+        r1 = min(self.rows, int((self.area.bottom - my + self.camy) // cell) + 1)
+        return r0, c0, r1, c1
+
+    def layer_window(self, current):
+        """Cửa sổ ô cho layer: cả map ở LOD, vùng nhìn thấy + lề ở chế độ chi tiết.
+        Giữ nguyên cửa sổ cũ nếu nó vẫn chứa vùng nhìn thấy."""
+        if self.lod:
+            return (0, 0, self.rows, self.cols)
+        r0, c0, r1, c1 = self.visible()
+        if current and current[0] <= r0 and current[1] <= c0 and current[2] >= r1 and current[3] >= c1:
+            return current
+        return (max(0, r0 - VIEW_MARGIN), max(0, c0 - VIEW_MARGIN),
+                min(self.rows, r1 + VIEW_MARGIN), min(self.cols, c1 + VIEW_MARGIN))
+
+
+def _in_window(rc, window):
+    return window[0] <= rc[0] < window[2] and window[1] <= rc[1] < window[3]
+
+
+def blit_layer(screen, surf, window, layer_cell, camera):
+    """Blit một layer (phủ các ô trong window, layer_cell px/ô) theo camera."""
+    cell, mx, my = camera.layout()
+    r0, c0 = window[0], window[1]
+    if layer_cell == cell:
+        screen.blit(surf, (mx + c0 * cell - camera.camx, my + r0 * cell - camera.camy))
+        return
+    # LOD: layer 1 px/ô -> cắt đúng vùng nhìn thấy rồi scale
+    vr0, vc0, vr1, vc1 = camera.visible()
+    if vr1 <= vr0 or vc1 <= vc0:
+        return
+    sub = surf.subsurface(pygame.Rect(vc0 - c0, vr0 - r0, vc1 - vc0, vr1 - vr0))
+    x0 = mx + vc0 * cell - camera.camx
+    y0 = my + vr0 * cell - camera.camy
+    x1 = mx + vc1 * cell - camera.camx
+    y1 = my + vr1 * cell - camera.camy
+    w, h = max(1, int(round(x1)) - int(round(x0))), max(1, int(round(y1)) - int(round(y0)))
+    screen.blit(pygame.transform.scale(sub, (w, h)), (int(round(x0)), int(round(y0))))
+
+
+class TileCache:
+    """Ảnh tile đã scale sẵn theo kích thước ô: mỗi (tên, CELL) chỉ scale 1 lần."""
+
+    def __init__(self, assets):
+        self.assets = assets
+        self._scaled = {}
+        self._colors = {}
+
+    def set_assets(self, assets):
+        """Đổi bộ ảnh (vd. asset nạp nền vừa xong): bỏ ảnh đã scale và màu đã tính."""
+        self.assets = assets
+        self._scaled.clear()
+        self._colors.clear()
+
+    def get(self, name, cell):
+        key = (name, cell)
+        if key not in self._scaled:
+            img = self.assets.get(name)
+            # scale nearest để giữ nét (như blit_scaled)
+            self._scaled[key] = pygame.transform.scale(img, (cell, cell)) if img else None
+        return self._scaled[key]
+
+    def color(self, name, fallback):
+        """Màu trung bình của tile (dùng cho LOD 1 px/ô)."""
+        if name not in self._colors:
+            img = self.assets.get(name)
+            self._colors[name] = tuple(pygame.transform.average_color(img))[:3] if img else fallback
+        return self._colors[name]
+
+
+class BackgroundLayer:
+    """
+    Nền tĩnh của map: floor + wall + đường lưới ghép sẵn vào 1 Surface.
+    Mỗi frame chỉ cần 1 lần blit; khi sửa ô (đặt/xoá tường) gọi update_cell
+    để vẽ lại đúng ô đó thay vì cả map.
+    Surface chỉ phủ cửa sổ ô quanh vùng nhìn thấy (Camera.layer_window);
+    ở LOD thì phủ cả map với 1 pixel/ô, không có đường lưới.
+    """
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.surface = None
+        self.rows = self.cols = self.cell = 0
+        self.window = None
+
+    def invalidate(self):
+        self.surface = None
+        self.window = None
+
+    def ensure(self, grid, camera):
+        """Dựng lại nếu cửa sổ/kích thước ô đổi (pan ra khỏi lề, zoom, đổi map)."""
+        layer_cell = 1 if camera.lod else camera.cell
+        window = camera.layer_window(self.window if layer_cell == self.cell else None)
+        if self.surface is None or window != self.window or layer_cell != self.cell:
+            self.rebuild(grid, layer_cell, window)
+
+    def rebuild(self, grid, cell, window=None):
+        """Dựng lại toàn bộ nền của cửa sổ (mặc định: cả map)."""
+        self.rows = len(grid)
+        self.cols = len(grid[0]) if self.rows else 0
+        self.cell = cell
+        if window is None:
+            window = (0, 0, self.rows, self.cols)
+        self.window = window
+        r0, c0, r1, c1 = window
+        if cell == 1:
+            self._rebuild_pixels(grid)
+            return
+        w, h = (c1 - c0) * cell + 1, (r1 - r0) * cell + 1
+        self.surface = pygame.Surface((w, h)).convert()
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                self._draw_tile(grid, r, c)
+        for r in range(r0, r1 + 1):
+            y = (r - r0) * cell
+            pygame.draw.line(self.surface, S.GRIDC, (0, y), (w - 1, y), 1)
+        for c in range(c0, c1 + 1):
+            x = (c - c0) * cell
+            pygame.draw.line(self.surface, S.GRIDC, (x, 0), (x, h - 1), 1)
+
+    def _rebuild_pixels(self, grid):
+        # 1 byte/ô (0 = sàn, 1 = tường) -> surface 8-bit có palette, không lặp từng ô
+        r0, c0, r1, c1 = self.window
+        buf = b"".join(bytes(grid[r][c0:c1]).translate(_WALL_TABLE) for r in range(r0, r1))
+        surf = pygame.image.frombuffer(buf, (c1 - c0, r1 - r0), "P")
+        surf.set_palette([self.tiles.color("floor", S.WHITE),
+                          self.tiles.color("wall", WALL_FALLBACK)] + [(0, 0, 0)] * 254)
+        self.surface = surf.convert()
+
+    def _draw_tile(self, grid, r, c):
+        cell = self.cell
+        r0, c0 = self.window[0], self.window[1]
+        rect = pygame.Rect((c - c0) * cell, (r - r0) * cell, cell, cell)
+        if cell == 1:
+            name, fallback = ("wall", WALL_FALLBACK) if grid[r][c] == 1 else ("floor", S.WHITE)
+            self.surface.set_at(rect.topleft, self.tiles.color(name, fallback))
+            return
+        if grid[r][c] == 1:
+            img = self.tiles.get("wall", cell)
+            if img: self.surface.blit(img, rect.topleft)
+            else:   pygame.draw.rect(self.surface, WALL_FALLBACK, rect)
+        else:
+            img = self.tiles.get("floor", cell)
+            if img: self.surface.blit(img, rect.topleft)
+            else:   pygame.draw.rect(self.surface, S.WHITE, rect)
+
+    def update_cell(self, grid, r, c):
+        """Vẽ lại 1 ô (tile + 2 cạnh lưới trên/trái mà tile vừa đè lên)."""
+        if self.surface is None or not _in_window((r, c), self.window):
+            return
+        cell = self.cell
+        self._draw_tile(grid, r, c)
+        if cell > 1:
+            x, y = (c - self.window[1]) * cell, (r - self.window[0]) * cell
+            pygame.draw.line(self.surface, S.GRIDC, (x, y), (x + cell, y), 1)
+            pygame.draw.line(self.surface, S.GRIDC, (x, y), (x, y + cell), 1)
+
+    def draw(self, screen, camera):
+        if self.surface is not None:
+            blit_layer(screen, self.surface, self.window, self.cell, camera)
+
+
+class OverlayLayers:
+    """
+    Overlay open/closed/path vẽ sẵn trên 3 layer alpha cố định (1 layer / loại).
+    Khi con trỏ replay di chuyển, chỉ tô lại những ô đổi trạng thái giữa 2 bước
+    (lấy từ TraceCursor.seek(changed=...)); mỗi frame chỉ blit 3 layer + ô current.
+    Layer phủ cùng cửa sổ ô như BackgroundLayer (1 pixel/ô ở LOD).
+    """
+    KINDS = ("closed", "open", "path")
+
+    def __init__(self):
+        self.layers = {}
+        self.cell = 0
+        self.window = None
+        self.trace = None
+        self.cursor = None
+        self.path_cells = set()
+        self.current = None
+        self._current_surf = None
+        self.changed = set()      # ô đổi ở lần sync gần nhất (cho DirtyRegions)
+        self.repainted = False    # lần sync gần nhất tô lại cả layer
+        self.colors = {
+            "closed": (*S.CLOSED, S.CLOSED_ALPHA),
+            "open":   (*S.OPEN,   S.OPEN_ALPHA),
+            "path":   (*S.PATHC,  S.PATH_ALPHA),
+        }
+
+    def _resize(self, cell, window):
+        self.cell, self.window = cell, window
+        r0, c0, r1, c1 = window
+        size = (max(1, (c1 - c0) * cell), max(1, (r1 - r0) * cell))
+        self.layers = {k: pygame.Surface(size, pygame.SRCALPHA) for k in self.KINDS}
+        self._current_surf = pygame.Surface((max(1, cell), max(1, cell)), pygame.SRCALPHA)
+        self._current_surf.fill((255, 120, 120, S.CURR_ALPHA))
+        self.trace = None
+        self.repainted = True
+
+    def clear(self):
+        for surf in self.layers.values():
+            surf.fill((0, 0, 0, 0))
+        self.trace = None
+        self.cursor = None
+        self.path_cells = set()
+        self.current = None
+        self.repainted = True
+
+    def _paint(self, kind, rc, on):
+        if not _in_window(rc, self.window):
+            return
+        cell = self.cell
+        rect = ((rc[1] - self.window[1]) * cell, (rc[0] - self.window[0]) * cell, cell, cell)
+        self.layers[kind].fill(self.colors[kind] if on else (0, 0, 0, 0), rect)
+
+    def sync(self, trace, idx, camera):
+        """Đưa các layer về trạng thái bước idx của trace.
+        Sau đó changed = các ô vừa tô lại (kể cả ô current cũ/mới), hoặc
+        repainted = True nếu cả layer vẽ lại (đổi trace / cửa sổ / nhảy xa)."""
+        self.changed = set()
+        self.repainted = False
+        cell = 1 if camera.lod else camera.cell
+        window = camera.layer_window(self.window if cell == self.cell else None)
+        if (cell, window) != (self.cell, self.window) or not self.layers:
+            self._resize(cell, window)
+        if not trace or not (0 <= idx < len(trace)):
+            if self.trace is not None or self.path_cells:
+                self.clear()
+            return
+
+        full = trace is not self.trace
+        if full:
+            self.clear()
+            self.trace = trace
+            self.cursor = trace.cursor()
+        changed = set()
+        cur = self.cursor.seek(idx, changed)
+        if full or cur.was_reset:
+            self.repainted = True
+            for kind in ("closed", "open"):
+                self.layers[kind].fill((0, 0, 0, 0))
+                for rc in (cur.closed if kind == "closed" else cur.open):
+                    self._paint(kind, rc, True)
+        else:
+            for rc in changed:
+                self._paint("closed", rc, rc in cur.closed)
+                self._paint("open", rc, rc in cur.open)
+
+        new_path = set(cur.path)
+        for rc in self.path_cells - new_path:
+            self._paint("path", rc, False)
+        for rc in new_path - self.path_cells:
+            self._paint("path", rc, True)
+        if not self.repainted:
+            changed |= new_path ^ self.path_cells
+            if cur.current != self.current:
+                changed.update(rc for rc in (self.current, cur.current) if rc is not None)
+            self.changed = changed
+        self.path_cells = new_path
+        self.current = cur.current
+
+    def draw(self, screen, camera):
+        if self.trace is None:
+            return
+        for kind in self.KINDS:
+            blit_layer(screen, self.layers[kind], self.window, self.cell, camera)
+        if self.current is not None and not camera.lod:
+            cell, mx, my = camera.layout()
+            r, c = self.current
+            screen.blit(self._current_surf, (mx + c * cell - camera.camx, my + r * cell - camera.camy))
+
+
+class DirtyRegions:
+    """
+    Vùng màn hình cần vẽ lại trong frame (dirty rectangle).
+    - mark(rect) / mark_cells(cells, camera): gom hình chữ nhật đổi trong frame.
+    - mark_all(): frame này vẽ lại + flip cả cửa sổ (đổi camera, click, modal...).
+    - take(): trả (full, rects) rồi bắt đầu frame mới; rects đã gộp các hình
+      chồng nhau, dùng cho display.update(rects). full = False và rects rỗng
+      nghĩa là không có gì đổi: bỏ qua cả vẽ lẫn update.
+    Quá MAX_RECTS hình thì gộp thành 1 hình bao; tổng diện tích vượt
+    FULL_RATIO cửa sổ thì coi như full.
+    """
+    MAX_RECTS = 48
+    FULL_RATIO = 0.5
+
+    def __init__(self, bounds):
+        self.bounds = pygame.Rect(bounds)
+        self.full = True
+        self.rects = []
+
+    def mark_all(self):
+        self.full = True
+
+    def mark(self, rect):
+        if self.full:
+            return
+        r = pygame.Rect(rect).clip(self.bounds)
+        if r.w <= 0 or r.h <= 0:
+            return
+        self.rects.append(r)
+        if len(self.rects) > self.MAX_RECTS:
+            self.rects = [r.unionall(self.rects)]
+
+    def mark_cells(self, cells, camera):
+        """Đánh dấu các ô map (thêm 1 px lề cho đường lưới / làm tròn ở LOD)."""
+        if self.full:
+            return
+        cell, mx, my = camera.layout()
+        size = int(cell) + 3
+        for r, c in cells:
+            x = int(mx + c * cell - camera.camx) - 1
+            y = int(my + r * cell - camera.camy) - 1
+            rect = pygame.Rect(x, y, size, size).clip(camera.area)
+            if rect.w > 0 and rect.h > 0:
+                self.mark(rect)
+
+    def take(self):
+        full, rects = self.full, self.rects
+        self.full, self.rects = False, []
+        if full:
+            return True, []
+        # gộp các hình chồng nhau (lặp tới khi không còn cặp nào giao nhau)
+        merged = True
+        while merged and len(rects) > 1:
+            merged = False
+            out = []
+            for r in rects:
+                for i, o in enumerate(out):
+                    if o.colliderect(r):
+                        out[i] = o.union(r)
+                        merged = True
+                        break
+                else:
+                    out.append(r)
+            rects = out
+        area = sum(r.w * r.h for r in rects)
+        if area > self.FULL_RATIO * self.bounds.w * self.bounds.h:
+            return True, []
+        return False, rects
@@ -0,0 +1,333 @@
+# runstore.py
+"""
+Lịch sử lượt tìm lưu bền trong SQLite (sqlite3 của thư viện chuẩn): mỗi lượt
+tìm của UI và mỗi dòng benchmark là 1 row của bảng runs, có index theo
+(map_hash, cấu hình, thời điểm) để truy vấn / gộp theo tuần, theo map.
+
+- map_hash: băm lưới + phụ phí quái vật + start/key/goal/waypoint (problem_hash),
+  cùng bài toán -> cùng hash dù map tên gì.
+- summary(): gộp các lượt lặp lại của cùng cấu hình (số lượt, runtime
+  min/mean/max, explored, cost).
+- regressions(): cấu hình có runtime các lượt gần nhất chậm hơn ratio lần
+  so với các lượt trước đó.
+- compare(ids): bảng so sánh dựng sẵn 1 lần (giá trị đã format + dòng tốt
+  nhất + thống kê các lượt cùng cấu hình) cho màn Compare của UI.
+
+Dòng lệnh:
+  python -m src.runstore summary --since 7
+  python -m src.runstore regressions --ratio 1.25 --source bench
+  python -m src.runstore runs --map arena --limit 20
+"""
+import argparse, csv, hashlib, os, sqlite3, statistics, sys, time
+
+SCHEMA_VERSION = 1
+
+RUN_FIELDS = (
+    "ts", "source", "map", "map_hash", "rows", "cols",
+    "mode", "open_list", "heuristic", "eight_dir", "weight", "monster_cost", "replan",
+    "found", "explored", "cost", "runtime_ms", "repeats",
+    "steps", "path_len", "open_peak", "trace_kb",
+)
+# các cột xác định "cùng cấu hình" khi gộp các lượt lặp lại
+# (replan: lượt sửa tăng dần LPA* không so được với lượt tìm từ đầu)
+CONFIG_FIELDS = ("map_hash", "mode", "open_list", "heuristic", "eight_dir", "weight",
+                 "monster_cost", "replan")
+
+SUMMARY_FIELDS = CONFIG_FIELDS + (
+    "map", "runs", "found", "explored_mean", "cost_min",
+    "runtime_ms_min", "runtime_ms_mean", "runtime_ms_max", "first_ts", "last_ts",
+)
+REGRESSION_FIELDS = CONFIG_FIELDS + (
+    "map", "baseline_runs", "baseline_ms", "recent_runs", "recent_ms", "ratio",
+    "baseline_explored", "recent_explored",
+)
+# cột bảng Compare của UI (RunStore.compare)
+COMPARE_HEADERS = ["#", "HEURISTIC", "WEIGHT", "DIR", "EXPLORED", "COST", "RUNS × AVG", "RUNTIME"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id           INTEGER PRIMARY KEY,
+    ts           REAL NOT NULL,
+    source       TEXT NOT NULL,
+    map          TEXT,
+    map_hash     TEXT NOT NULL,
+    rows         INTEGER,
+    cols         INTEGER,
+    mode         TEXT NOT NULL,
+    open_list    TEXT NOT NULL DEFAULT 'heap',
+    heuristic    TEXT NOT NULL,
+    eight_dir    INTEGER NOT NULL,
+    weight       REAL NOT NULL,
+    monster_cost REAL NOT NULL DEFAULT 0,
+    replan       INTEGER NOT NULL DEFAULT 0,
+    found        INTEGER,
+    explored     INTEGER,
+    cost         REAL,
+    runtime_ms   REAL,
+    repeats      INTEGER NOT NULL DEFAULT 1,
+    steps        INTEGER,
+    path_len     INTEGER,
+    open_peak    INTEGER,
+    trace_kb     REAL
+);
+CREATE INDEX IF NOT EXISTS runs_config ON runs
+    (map_hash, mode, open_list, heuristic, eight_dir, weight, monster_cost, replan, ts);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE INDEX IF NOT EXISTS runs_map ON runs (map, ts);
+"""
+
+
+def problem_hash(grid, monsters=None, monster_cost=0.0, start=None, goal=None,
+                 key_pos=None, waypoints=()):
+    """Hash hex 16 ký tự của bài toán: grid_digest (lưới + phụ phí) + các điểm mốc."""
+    from .planner import grid_digest   # planner chỉ cần khi thật sự ghi lượt tìm
+    h = hashlib.blake2b(grid_digest(grid, monsters, monster_cost), digest_size=8)
+    pts = [start, key_pos, goal] + list(waypoints or ())
+    h.update(repr([tuple(p) if p else None for p in pts]).encode())
+    return h.hexdigest()
+
+
+def _where(**filters):
+    """(sql, params) cho WHERE từ các bộ lọc khác None; since = số ngày gần đây."""
+    conds, params = [], []
+    for col, val in filters.items():
+        if val is None:
+            continue
+        if col == "since":
+            conds.append("ts >= ?")
+            params.append(time.time() - float(val) * 86400.0)
+        else:
+            conds.append(f"{col} = ?")
+            params.append(val)
+    return (" WHERE " + " AND ".join(conds) if conds else ""), params
+
+
+class RunStore:
+    """
+    Bảng runs trong 1 file SQLite (":memory:" = chỉ trong process).
+    Mở file hỏng / không ghi được thì lùi về ":memory:" (in cảnh báo) để
+    UI vẫn chạy. Chỉ dùng từ 1 thread (thread tạo ra nó).
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path or ":memory:"
+        try:
+            self.db = self._open(self.path)
+        except (sqlite3.Error, OSError) as e:
+            print(f"run store {self.path} unavailable ({e}), keeping history in memory",
+                  file=sys.stderr)
+            self.path = ":memory:"
+            self.db = self._open(self.path)
+
+    @staticmethod
+    def _open(path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path)
+        try:
+            db.row_factory = sqlite3.Row
+            if path != ":memory:":
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"schema v{version} is newer than v{SCHEMA_VERSION}")
+            db.executescript(_SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.commit()
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    # --- ghi ---
+    def _row(self, run):
+        row = {k: run.get(k) for k in RUN_FIELDS}
+        if row["ts"] is None:
+            row["ts"] = time.time()
+        for k, default in (("open_list", "heap"), ("monster_cost", 0.0), ("replan", 0), ("repeats", 1)):
+            if row[k] is None:
+                row[k] = default
+        for k in ("eight_dir", "replan", "found"):
+            if row[k] is not None:
+                row[k] = int(bool(row[k]))
+        for k, nd in (("runtime_ms", 3), ("cost", 6), ("trace_kb", 1)):
+            if row[k] is not None:
+                row[k] = round(float(row[k]), nd)
+        return row
+
+    def record(self, **run):
+        """Ghi 1 lượt (các khoá của RUN_FIELDS, thiếu = NULL/mặc định). Trả về id."""
+        row = self._row(run)
+        cur = self.db.execute(
+            f"INSERT INTO runs ({', '.join(RUN_FIELDS)}) VALUES ({', '.join('?' * len(RUN_FIELDS))})",
+            [row[k] for k in RUN_FIELDS])
+        self.db.commit()
+        return cur.lastrowid
+
+    def record_many(self, runs):
+        """Ghi nhiều lượt trong 1 transaction (vd. cả lượt benchmark)."""
+        rows = [self._row(r) for r in runs]
+        with self.db:
+            self.db.executemany(
+                f"INSERT INTO runs ({', '.join(RUN_FIELDS)}) VALUES ({', '.join('?' * len(RUN_FIELDS))})",
+                [[r[k] for k in RUN_FIELDS] for r in rows])
+        return len(rows)
+
+    # --- đọc ---
+    def runs(self, map=None, map_hash=None, source=None, since=None, limit=None):
+        """Các lượt theo thứ tự ghi (cũ -> mới); limit = chỉ lấy limit lượt mới nhất."""
+        where, params = _where(map=map, map_hash=map_hash, source=source, since=since)
+        sql = f"SELECT id, {', '.join(RUN_FIELDS)} FROM runs{where} ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(r) for r in reversed(self.db.execute(sql, params).fetchall())]
+
+    def summary(self, map=None, map_hash=None, source=None, since=None):
+        """Gộp các lượt cùng cấu hình (CONFIG_FIELDS): list dict SUMMARY_FIELDS."""
+        where, params = _where(map=map, map_hash=map_hash, source=source, since=since)
+        cfg = ", ".join(CONFIG_FIELDS)
+        sql = (f"SELECT {cfg}, MAX(map) AS map, COUNT(*) AS runs, SUM(found) AS found, "
+               "AVG(explored) AS explored_mean, MIN(cost) AS cost_min, "
+               "MIN(runtime_ms) AS runtime_ms_min, AVG(runtime_ms) AS runtime_ms_mean, "
+               "MAX(runtime_ms) AS runtime_ms_max, MIN(ts) AS first_ts, MAX(ts) AS last_ts "
+               f"FROM runs{where} GROUP BY {cfg} ORDER BY map, {cfg}")
+        return [dict(r) for r in self.db.execute(sql, params).fetchall()]
+
+    def regressions(self, ratio=1.25, recent=3, min_runs=3, map=None, source=None, since=None):
+        """
+        Cấu hình có median runtime của recent lượt mới nhất > ratio x median
+        các lượt trước đó (cần >= min_runs lượt trước). Trả về list dict
+        REGRESSION_FIELDS, chậm nhất trước.
+        """
+        where, params = _where(map=map, source=source, since=since)
+        cfg = ", ".join(CONFIG_FIELDS)
+        sql = (f"SELECT {cfg}, map, runtime_ms, explored FROM runs{where} "
+               f"ORDER BY {cfg}, ts, id")
+        groups = {}
+        for r in self.db.execute(sql, params):
+            if r["runtime_ms"] is None:
+                continue
+            g = groups.setdefault(tuple(r[k] for k in CONFIG_FIELDS), {"map": r["map"], "runs": []})
+            g["runs"].append((r["runtime_ms"], r["explored"]))
+        out = []
+        for config, g in groups.items():
+            runs = g["runs"]
+            base, last = runs[:-recent], runs[-recent:]
+            if len(base) < min_runs or not last:
+                continue
+            base_ms = statistics.median(ms for ms, _ in base)
+            last_ms = statistics.median(ms for ms, _ in last)
+            if base_ms <= 0 or last_ms <= ratio * base_ms:
+                continue
+            row = dict(zip(CONFIG_FIELDS, config))
+            row.update({
+                "map": g["map"],
+                "baseline_runs": len(base), "baseline_ms": round(base_ms, 3),
+                "recent_runs": len(last), "recent_ms": round(last_ms, 3),
+                "ratio": round(last_ms / base_ms, 3),
+                "baseline_explored": statistics.median(e or 0 for _, e in base),
+                "recent_explored": statistics.median(e or 0 for _, e in last),
+            })
+            out.append(row)
+        out.sort(key=lambda r: -r["ratio"])
+        return out
+
+    def config_stats(self, run_id):
+        """(số lượt, runtime trung bình) của mọi lượt cùng cấu hình với run_id."""
+        cond = " AND ".join(f"r.{k} IS o.{k}" for k in CONFIG_FIELDS)
+        row = self.db.execute(
+            f"SELECT COUNT(*), AVG(r.runtime_ms) FROM runs o JOIN runs r ON {cond} WHERE o.id = ?",
+            (run_id,)).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def compare(self, ids):
+        """
+        Bảng Compare dựng sẵn cho các lượt ids (giữ thứ tự truyền vào):
+        {"headers": [...], "rows": [[ô đã format, ...]], "best": chỉ số dòng tốt
+        nhất (cost, rồi explored, rồi runtime) hoặc None}. UI chỉ cần vẽ lại.
+        """
+        if not ids:
+            return {"headers": COMPARE_HEADERS, "rows": [], "best": None}
+        marks = ", ".join("?" * len(ids))
+        by_id = {r["id"]: dict(r) for r in self.db.execute(
+            f"SELECT id, {', '.join(RUN_FIELDS)} FROM runs WHERE id IN ({marks})", list(ids))}
+        entries = [by_id[i] for i in ids if i in by_id]
+
+        def score(ent):
+            return (round(float(ent["cost"] if ent["cost"] is not None else float("inf")), 4),
+                    int(ent["explored"] if ent["explored"] is not None else 10**9),
+                    float(ent["runtime_ms"] if ent["runtime_ms"] is not None else float("inf")))
+
+        rows = []
+        for i, ent in enumerate(entries):
+            n, mean_ms = self.config_stats(ent["id"])
+            rows.append([
+                str(i + 1),
+                str(ent["heuristic"]),
+                f"{ent['weight']:.2f}",
+                ("8-dir" if ent["eight_dir"] else "4-dir")
+                + {"bidirectional": " bi", "jps": " jps", "jps+": " jps+"}.get(ent["mode"], ""),
+                str(ent["explored"] or 0),
+                f"{ent['cost'] or 0.0:.2f}",
+                f"{n} × {mean_ms or 0.0:.1f} ms",
+                f"{ent['runtime_ms'] or 0.0:.1f} ms",
+            ])
+        best = min(range(len(entries)), key=lambda i: score(entries[i])) if entries else None
+        return {"headers": COMPARE_HEADERS, "rows": rows, "best": best}
+
+
+def _fmt_ts(ts):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else ""
+
+
+def main(argv=None):
+    from . import settings as S
+    ap = argparse.ArgumentParser(prog="python -m src.runstore",
+                                 description="Query the persistent run history.")
+    ap.add_argument("--db", default=getattr(S, "RUN_STORE_PATH", None),
+                    help="SQLite file (default: settings.RUN_STORE_PATH)")
+    ap.add_argument("what", choices=("runs", "summary", "regressions"))
+    ap.add_argument("--map", help="only this map name")
+    ap.add_argument("--source", choices=("ui", "bench"))
+    ap.add_argument("--since", type=float, metavar="DAYS", help="only the last DAYS days")
+    ap.add_argument("--limit", type=int, default=50, help="runs: newest N (default 50)")
+    ap.add_argument("--ratio", type=float, default=1.25, help="regressions: slowdown threshold")
+    ap.add_argument("--recent", type=int, default=3, help="regressions: newest runs compared")
+    ap.add_argument("--min-runs", type=int, default=3, help="regressions: older runs needed")
+    args = ap.parse_args(argv)
+    if not args.db or (args.db != ":memory:" and not os.path.exists(args.db)):
+        ap.error(f"no run store at {args.db}")
+    store = RunStore(args.db)
+
+    if args.what == "runs":
+        rows, fields = store.runs(map=args.map, source=args.source, since=args.since,
+                                  limit=args.limit), ("id",) + RUN_FIELDS
+    elif args.what == "summary":
+        rows, fields = store.summary(map=args.map, source=args.source, since=args.since), SUMMARY_FIELDS
+    else:
+        rows, fields = store.regressions(args.ratio, args.recent, args.min_runs, map=args.map,
+                                         source=args.source, since=args.since), REGRESSION_FIELDS
+    for r in rows:
+        for k in ("ts", "first_ts", "last_ts"):
+            if k in r:
+                r[k] = _fmt_ts(r[k])
+    w = csv.DictWriter(sys.stdout, fieldnames=fields, extrasaction="ignore")
+    w.writeheader()
+    w.writerows(rows)
+    if args.what == "regressions" and rows:
+        print(f"{len(rows)} configuration(s) slower than {args.ratio:g}x their baseline",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,21 @@
 # =========================
 # settings.py (3-tier layout)
 # =========================
+import os
 
 # --- Window & FPS ---
 WIDTH, HEIGHT = 1120, 820   
 TOP_PANEL_H = 72
 BOTTOM_PANEL_H = 128
 FPS = 60
+IDLE_WAIT_MS = 1000        # không play/tìm/animation: chờ sự kiện tối đa ngần này (ms) rồi mới lặp lại
+
+# --- Asset cache ---
+ASYNC_ASSETS = True        # nạp ảnh/sprite trên thread nền: cửa sổ hiện ngay, vẽ màu thay thế tới khi xong
+ASSET_CACHE_MB = 64        # ngân sách ảnh đã scale giữ trong RAM (assets.ASSETS), LRU theo CELL
+# atlas frame đã scale lưu trên đĩa cho lần chạy sau (None/"" = tắt)
+ASSET_ATLAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               ".cache", "atlas")
 
 # --- UI fonts ---
 UI_FONT_NAME    = "Segoe UI"
@@ -23,9 +32,22 @@ ROWS, COLS = 16, 16
 EIGHT_DIR  = False
 # "manhattan" | "euclidean" | "octile" | "chebyshev"
 HEURISTIC  = "manhattan"
-MODE       = "astar"
+MODE       = "astar"       # "astar" | "bidirectional" | "jps" | "jps+"
 WEIGHT     = 1.0           # W=1.0 => A* chuẩn; >1.0 => Weighted A*
-AUTO_STEP_EVERY_MS = 110   # thời gian auto step (ms)
+AUTO_STEP_EVERY_MS = 110   # thời gian auto step (ms) ở tốc độ x1
+# tốc độ replay ([ / ] để đổi): "auto" = nhanh dần để cả trace chạy trong PLAYBACK_FIT_S giây
+# (không chậm hơn x1); số = bội của 1 bước / AUTO_STEP_EVERY_MS, nhiều bước/frame khi cần
+PLAYBACK_SPEEDS = ("auto", 1, 2, 4, 8, 16, 64, 256, 1024)
+PLAYBACK_FIT_S = 10
+TRACE_CACHE_MB = 256       # ngân sách bộ nhớ cache trace (planner.TRACE_CACHE)
+HFIELD_CACHE_MB = 32       # h cả lưới (NumPy) giữ trên mỗi FlatGrid cho các lượt cùng goal
+# lịch sử lượt tìm lưu bền (SQLite, src.runstore); None/"" = chỉ giữ trong RAM
+RUN_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              ".cache", "runs.sqlite")
+HISTORY_VIEW = 200         # số lượt gần nhất hiện trong bảng History
+PARALLEL_LEGS = True       # có Key: chạy chặng Key -> Goal song song trong process con
+PARALLEL_LEGS_MIN_CELLS = 40000   # map nhỏ hơn thì chạy tuần tự (chi phí IPC > lợi ích)
+MAX_CHECKPOINTS = 8        # số waypoint tối đa (thứ tự đi được tối ưu: <= 10 điểm là tối ưu chính xác)
 
 # --- Colors ---
 WHITE = (249, 250, 252)
@@ -11,7 +11,10 @@ def load_sheet(path, frame_w, frame_h, row=0, cols=None):
         sheet = pygame.image.load(path).convert_alpha()
     except Exception:
         return []
+    return cut_sheet(sheet, frame_w, frame_h, row, cols)
 
+def cut_sheet(sheet, frame_w, frame_h, row=0, cols=None):
+    """Như load_sheet nhưng cắt từ Surface đã decode sẵn (vd. AssetManager.image)."""
     sw, sh = sheet.get_size()
     if cols is None or cols <= 0:
         cols = sw // frame_w
@@ -53,3 +56,8 @@ class Animator:
     def get(self):
         if not self.frames: return None
         return self.frames[self.idx]
+
+    def next_ms(self):
+        """Số ms tới lần đổi frame kế tiếp (None nếu không có gì để chạy)."""
+        if len(self.frames) < 2: return None
+        return 1000.0 / max(1.0, self.fps) - self.t
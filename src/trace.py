@@ -0,0 +1,312 @@
+# trace.py
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+
+# cờ thay cho parent_cũ trong pushed (bước sửa của LPA*), không đổi cây cha:
+OPENED = "opened"       # node chưa ở open/closed -> vào open
+REOPENED = "reopened"   # node đang ở closed -> mở lại (về open)
+
+
+class PathView(Sequence):
+    """
+    Path lười: chỉ lưu (parent, end), dựng list khi thật sự được đọc.
+    parent là map node -> cha dùng chung giữa mọi bước; an toàn vì tổ tiên
+    của một node đã đóng (closed) không bao giờ đổi cha nữa.
+    Path bắt đầu ở gốc cây chứa end: start, hoặc goal với nhánh tìm ngược
+    của chặng hai chiều.
+    """
+    __slots__ = ("_parent", "_end", "_nodes")
+
+    def __init__(self, parent, end):
+        self._parent = parent
+        self._end = end
+        self._nodes = None
+
+    def _materialize(self):
+        if self._nodes is None:
+            path = []
+            n = self._end
+            # cây cha của chặng LPA* (cha đổi khi mở lại) có thể tạm có vòng: dừng ở đó
+            limit = len(self._parent)
+            while n in self._parent and len(path) <= limit:
+                path.append(n)
+                n = self._parent[n]
+            path.append(n)   # gốc cây (start, hoặc goal ở nhánh ngược)
+            path.reverse()
+            self._nodes = path
+        return self._nodes
+
+    def __getitem__(self, i):
+        return self._materialize()[i]
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, PathView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"PathView({self._materialize()!r})"
+
+
+class Trace:
+    """
+    Trace tìm kiếm dạng delta (nén).
+    Mỗi bước chỉ lưu tuple (current, pushed, found):
+      - pushed:  tuple[(node, parent_cũ)] các node được push/cải thiện bởi lần
+                 mở rộng ngay TRƯỚC bước này (parent mới = current của bước trước);
+                 parent_cũ None nghĩa là node vừa được đưa vào open lần đầu;
+                 OPENED / REOPENED: node vào open (từ ngoài / từ closed) mà
+                 không đổi cha (LPA*). Cùng node có thể có (node, REOPENED)
+                 rồi (node, parent_cũ) khi node ở closed được cải thiện.
+      - current: node vừa pop khỏi open (None ở bước cuối khi không tìm thấy).
+      - found:   current là đích của chặng.
+    Một trace có thể gồm nhiều chặng (segment), mỗi chặng bắt đầu lại
+    với open = {start}, closed = {} (vd. Start -> Key rồi Key -> Goal).
+    Chặng hai chiều có 2 gốc: open ban đầu = {start, goal}, cây cha chứa
+    cả 2 nhánh (nhánh ngược có gốc là goal).
+
+    Tương thích kiểu cũ: trace[i] trả về StepView đọc như dict
+    {"open", "closed", "path", "current", "found"}; open/closed
+    được dựng lại theo yêu cầu bằng TraceCursor dùng chung.
+
+    Path: mỗi chặng giữ một cây cha (node -> cha) dùng chung cho mọi bước,
+    nên path tại bước i là PathView lười, chỉ dựng khi UI thật sự vẽ nó.
+    """
+
+    def __init__(self):
+        self.steps = []        # list[(current, pushed, found)]
+        self.segments = []     # list[(offset, start, tree, roots)]
+        self.final_path = None  # path của bước cuối (đã ghép các chặng)
+        self.route = None       # các điểm dừng theo thứ tự đã đi (nhiều waypoint)
+        self._cursor = None
+        self._path_cache = (None, None)  # (index, PathView) vừa dùng
+
+    # --- ghi ---
+    def begin(self, start, goal=None):
+        """Mở chặng mới bắt đầu tại start (goal: gốc thứ 2 nếu tìm hai chiều)."""
+        self.final_path = None
+        start = tuple(start)
+        roots = (start,) if goal is None else (start, tuple(goal))
+        self.segments.append((len(self.steps), start, {}, roots))
+
+    def append(self, step):
+        off, _, tree, _ = self.segments[-1]
+        pushed = step[1]
+        if pushed:
+            pcur = self.steps[-1][0] if len(self.steps) > off else None
+            for node, prev in pushed:
+                if prev != OPENED and prev != REOPENED:
+                    tree[node] = pcur
+        self.steps.append(step)
+
+    def extend_segment(self, roots, steps):
+        """Thêm nguyên một chặng đã tìm xong ở nơi khác (vd. process con).
+        roots: (start,) hoặc (start, goal) như begin()."""
+        self.begin(*roots)
+        for step in steps:
+            self.append(step)
+
+    # --- đọc ---
+    def __len__(self):
+        return len(self.steps)
+
+    def __bool__(self):
+        return bool(self.steps)
+
+    def __getitem__(self, i):
+        n = len(self.steps)
+        if i < 0:
+            i += n
+        if not (0 <= i < n):
+            raise IndexError("trace index out of range")
+        return StepView(self, i)
+
+    def __iter__(self):
+        for i in range(len(self.steps)):
+            yield StepView(self, i)
+
+    @property
+    def found(self):
+        return bool(self.steps) and bool(self.steps[-1][2])
+
+    @property
+    def explored(self):
+        """Số node trong closed ở bước cuối (chỉ tính chặng cuối, như bản cũ)."""
+        if not self.segments:
+            return 0
+        off = self.segments[-1][0]
+        n = len(self.steps) - off
+        if n and self.steps[-1][0] is None:
+            n -= 1
+        return n
+
+    def segment_of(self, i):
+        """Chỉ số chặng chứa bước i."""
+        offsets = [seg[0] for seg in self.segments]
+        return max(0, bisect_right(offsets, i) - 1)
+
+    def tree_path(self, i):
+        """Path tới current của bước i theo cây cha của chặng (PathView lười)."""
+        current = self.steps[i][0]
+        if current is None:
+            return []
+        tree = self.segments[self.segment_of(i)][2]
+        return PathView(tree, current)
+
+    def path_at(self, i):
+        """Path hiển thị tại bước i (bước cuối dùng final_path đã ghép chặng)."""
+        n = len(self.steps)
+        if i < 0:
+            i += n
+        if i == n - 1 and self.final_path is not None:
+            return self.final_path
+        idx, cached = self._path_cache
+        if idx != i:
+            cached = self.tree_path(i)
+            self._path_cache = (i, cached)
+        return cached
+
+    def cursor(self):
+        return TraceCursor(self)
+
+    def shared_cursor(self):
+        if self._cursor is None:
+            self._cursor = TraceCursor(self)
+        return self._cursor
+
+
+class TraceCursor:
+    """
+    Con trỏ replay: seek(i) dựng lại open/closed tại bước i
+    bằng cách áp (hoặc hoàn tác) delta từ vị trí hiện tại,
+    nên chạy tuần tự (Step +/-, Play) chỉ tốn O(delta) mỗi bước.
+    Hoàn tác đúng khi trace giữ hợp đồng: trước bước k, node pushed với
+    parent_cũ None/OPENED chưa ở open/closed, với parent_cũ khác thì đang ở
+    open, với REOPENED thì đang ở closed; current ở open sau khi áp pushed.
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.index = -1
+        self.seg = -1
+        self.open = set()
+        self.closed = set()
+        self.was_reset = False   # seek gần nhất có dựng lại từ đầu chặng không
+        self._changed = None
+
+    def _reset(self, seg):
+        off, _, _, roots = self.trace.segments[seg]
+        self.seg = seg
+        self.index = off - 1
+        self.open = set(roots)
+        self.closed = set()
+        self.was_reset = True
+
+    def _apply(self, k):
+        current, pushed, _ = self.trace.steps[k]
+        ch = self._changed
+        for node, prev in pushed:
+            if prev == REOPENED:
+                self.closed.discard(node)
+            self.open.add(node)
+            if ch is not None: ch.add(node)
+        if current is not None:
+            self.open.discard(current)
+            self.closed.add(current)
+            if ch is not None: ch.add(current)
+
+    def _undo(self, k):
+        current, pushed, _ = self.trace.steps[k]
+        ch = self._changed
+        if current is not None:
+            self.closed.discard(current)
+            self.open.add(current)
+            if ch is not None: ch.add(current)
+        for node, prev in reversed(pushed):
+            if prev is None or prev == OPENED:
+                self.open.discard(node)
+                if ch is not None: ch.add(node)
+            elif prev == REOPENED:
+                self.open.discard(node)
+                self.closed.add(node)
+                if ch is not None: ch.add(node)
+
+    def seek(self, i, changed=None):
+        """
+        Tới bước i. changed: set tuỳ chọn, được thêm các ô có thể đã đổi
+        trạng thái open/closed (vô nghĩa nếu was_reset = True: coi như đổi hết).
+        """
+        n = len(self.trace.steps)
+        if i < 0:
+            i += n
+        if not (0 <= i < n):
+            raise IndexError("trace index out of range")
+        self.was_reset = False
+        self._changed = changed
+        seg = self.trace.segment_of(i)
+        off = self.trace.segments[seg][0]
+        # đổi chặng, hoặc lùi xa hơn là dựng lại từ đầu chặng -> reset
+        if seg != self.seg or (i < self.index and self.index - i > i - off + 1):
+            self._reset(seg)
+        while self.index < i:
+            self.index += 1
+            self._apply(self.index)
+        while self.index > i:
+            self._undo(self.index)
+            self.index -= 1
+        self._changed = None
+        return self
+
+    # --- trạng thái tại bước hiện tại ---
+    @property
+    def current(self):
+        return self.trace.steps[self.index][0] if self.index >= 0 else None
+
+    @property
+    def found(self):
+        return bool(self.trace.steps[self.index][2]) if self.index >= 0 else False
+
+    @property
+    def path(self):
+        if self.index < 0:
+            return []
+        return self.trace.path_at(self.index)
+
+
+class StepView(Mapping):
+    """
+    Một bước của Trace, đọc như dict state cũ.
+    "current"/"found"/"path" lấy thẳng (path là PathView lười);
+    "open"/"closed" kéo cursor dùng chung của trace tới bước này
+    (set sống, chỉ đọc).
+    """
+    _KEYS = ("open", "closed", "path", "current", "found")
+
+    def __init__(self, trace, index):
+        self.trace = trace
+        self.index = index
+
+    def __getitem__(self, key):
+        step = self.trace.steps[self.index]
+        if key == "current":
+            return step[0]
+        if key == "found":
+            return bool(step[2])
+        if key == "path":
+            return self.trace.path_at(self.index)
+        if key in ("open", "closed"):
+            cur = self.trace.shared_cursor().seek(self.index)
+            return getattr(cur, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
@@ -0,0 +1,55 @@
+# worker.py
+import threading, time
+
+from .astar import SearchCancelled
+from .trace import Trace
+
+
+class SearchWorker:
+    """
+    Chạy một hàm dựng trace (vd. build_two_leg_states) trên thread nền.
+    Hàm nhận thêm trace=..., cancel=... và ghi dần từng bước vào self.trace,
+    nên UI có thể replay ngay trong lúc tìm kiếm còn đang chạy.
+
+    Dùng thread (không phải process) vì trace được chia sẻ trực tiếp
+    trong bộ nhớ; lõi tìm kiếm tự kiểm tra cờ huỷ định kỳ.
+    """
+
+    def __init__(self, build, *args, **kwargs):
+        self.trace = Trace()
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.runtime_ms = 0.0   # thời gian thực (wall) của lượt tìm, kể cả chặng ở process con
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(build, args, kwargs),
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, build, args, kwargs):
+        # perf_counter (như bench wall_ms): thread_time bỏ sót chặng Key -> Goal chạy
+        # trong process con, thread này chỉ ngồi chờ kết quả của nó
+        t0 = time.perf_counter()
+        try:
+            build(*args, trace=self.trace, cancel=self._cancel, **kwargs)
+        except SearchCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.runtime_ms = (time.perf_counter() - t0) * 1000.0
+            self.done = True
+
+    def cancel(self):
+        """Yêu cầu dừng; thread sẽ thoát ở lần kiểm tra cờ kế tiếp."""
+        self._cancel.set()
+
+    @property
+    def running(self):
+        return not self.done
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
@@ -0,0 +1,7 @@
+# conftest.py
+# chạy từ gốc repo: python -m pytest -q (tests/ import package src như main)
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
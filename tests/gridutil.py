@@ -0,0 +1,74 @@
+# gridutil.py
+"""Lưới ngẫu nhiên + lời giải tham chiếu (Dijkstra trên _neighbors gốc) cho test."""
+import heapq, math
+
+from src.astar import _neighbors, cost_layer
+
+
+def random_grid(rng, rows, cols, density=0.25, free=()):
+    """Lưới rows x cols (1 = tường) với tỉ lệ tường density; các ô free luôn trống."""
+    grid = [[1 if rng.random() < density else 0 for _ in range(cols)] for _ in range(rows)]
+    for r, c in free:
+        grid[r][c] = 0
+    return grid
+
+
+def dijkstra(grid, start, goal, eight_dir=False, diag_cost_is_one=False,
+             monsters=None, monster_cost=0.0):
+    """Chi phí ngắn nhất start -> goal (inf nếu không tới được), cùng luật bước như A*."""
+    rows, cols = len(grid), len(grid[0])
+    extra = cost_layer(rows, cols, monsters, monster_cost)
+    dist = {tuple(start): 0.0}
+    heap = [(0.0, tuple(start))]
+    while heap:
+        d, (r, c) = heapq.heappop(heap)
+        if (r, c) == tuple(goal):
+            return d
+        if d > dist[(r, c)]:
+            continue
+        for nr, nc, step in _neighbors(r, c, rows, cols, grid, eight_dir, diag_cost_is_one, extra):
+            nd = d + step
+            if nd < dist.get((nr, nc), math.inf):
+                dist[(nr, nc)] = nd
+                heapq.heappush(heap, (nd, (nr, nc)))
+    return math.inf
+
+
+def path_cost(grid, path, eight_dir=False, diag_cost_is_one=False, monsters=None, monster_cost=0.0):
+    """Chi phí một path theo luật bước (AssertionError nếu có bước không hợp lệ)."""
+    rows, cols = len(grid), len(grid[0])
+    extra = cost_layer(rows, cols, monsters, monster_cost)
+    total = 0.0
+    for (r, c), nxt in zip(path, path[1:]):
+        steps = {(nr, nc): s for nr, nc, s in
+                 _neighbors(r, c, rows, cols, grid, eight_dir, diag_cost_is_one, extra)}
+        assert nxt in steps, f"invalid step {(r, c)} -> {nxt}"
+        total += steps[nxt]
+    return total
+
+
+def replay_states(trace):
+    """
+    open/closed tại mọi bước, dựng bằng cursor mới đi tới từ đầu
+    (tham chiếu cho seek lùi / nhảy).
+    """
+    out = []
+    for k in range(len(trace)):
+        cur = trace.cursor().seek(k)
+        out.append((frozenset(cur.open), frozenset(cur.closed)))
+    return out
+
+
+def assert_replay_consistent(trace):
+    """seek(k) từ mọi hướng cho cùng open/closed như áp tuần tự tới k; open ∩ closed rỗng."""
+    ref = replay_states(trace)
+    for k, (op, cl) in enumerate(ref):
+        assert not (op & cl), f"step {k}: nodes both open and closed: {sorted(op & cl)}"
+    n = len(trace)
+    cur = trace.cursor().seek(n - 1)
+    for k in range(n - 1, -1, -1):       # lùi từng bước
+        cur.seek(k)
+        assert (frozenset(cur.open), frozenset(cur.closed)) == ref[k], f"backward seek to {k}"
+    for k in range(0, n, 3):             # nhảy lùi / tới
+        cur.seek(n - 1).seek(k)
+        assert (frozenset(cur.open), frozenset(cur.closed)) == ref[k], f"jump to {k}"
@@ -0,0 +1,80 @@
+# test_assets.py
+import os, subprocess, sys
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from src import assets
+from src.assets import AssetManager, AssetLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def display():
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.display.quit()
+
+
+def _build(cell):
+    """Bộ frame nhỏ giống load_sprite_set: cắt + scale từ PNG thật trong assets/."""
+    mgr = assets.ASSETS
+    floor = pygame.transform.scale(mgr.image("floor.png"), (cell, cell))
+    return {"floor": [floor], "walk": {0: mgr.strip_frames("key_0.png", 1)}, "n": cell}
+
+
+def _pixels(value):
+    frames = []
+    assets._flatten(value, frames)
+    return [pygame.image.tobytes(f, "RGBA") for f in frames]
+
+
+def test_asset_loader_writes_atlas_then_loads_it(tmp_path, monkeypatch):
+    first = AssetManager(1 << 26, str(tmp_path))
+    monkeypatch.setattr(assets, "ASSETS", first)
+    loader = AssetLoader(24, _build).start()
+    loader.join()
+    assert loader.error is None
+    assert (tmp_path / "frames_24.rgba").exists() and (tmp_path / "frames_24.json").exists()
+    built = first.frame_set(24, _build)
+
+    # instance mới (như lần chạy sau): lấy từ atlas, không build, không decode sheet
+    second = AssetManager(1 << 26, str(tmp_path))
+    monkeypatch.setattr(assets, "ASSETS", second)
+
+    def fail(cell):
+        raise AssertionError("startup should load the atlas instead of building")
+
+    loaded = second.frame_set(24, fail, startup=True)
+    assert loaded["n"] == 24
+    assert _pixels(loaded) == _pixels(built)
+    assert not second._images
+
+
+def test_frame_set_after_startup_does_not_touch_disk(tmp_path, monkeypatch):
+    mgr = AssetManager(1 << 26, str(tmp_path))
+    monkeypatch.setattr(assets, "ASSETS", mgr)
+    mgr.frame_set(32, _build)
+    assert not list(tmp_path.iterdir())
+
+
+def test_atlas_survives_a_new_process(tmp_path):
+    code = (
+        "import os, sys; os.environ['SDL_VIDEODRIVER'] = 'dummy'; os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'; sys.path.insert(0, %r)\n"
+        "import pygame; pygame.display.init(); pygame.display.set_mode((1, 1))\n"
+        "from src import assets\n"
+        "assets.ASSETS = m = assets.AssetManager(1 << 26, %r)\n"
+        "calls = []\n"
+        "def build(cell):\n"
+        "    calls.append(cell)\n"
+        "    return [pygame.transform.scale(m.image('wall.png'), (cell, cell))]\n"
+        "m.frame_set(20, build, startup=True)\n"
+        "print(len(calls))\n"
+    ) % (ROOT, str(tmp_path))
+    runs = [subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+            for _ in range(2)]
+    assert [r.stdout.strip() for r in runs] == ["1", "0"]
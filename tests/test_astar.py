@@ -0,0 +1,68 @@
+# test_astar.py
+import math, random, zlib
+
+import pytest
+
+from src.astar import FlatGrid, build_trace, search_flat
+from src.trace import Trace
+from gridutil import random_grid, dijkstra, path_cost
+
+CASES = [("manhattan", False), ("euclidean", False), ("octile", True),
+         ("chebyshev", True), ("euclidean", True)]
+
+
+def _random_case(rng):
+    rows, cols = rng.randint(4, 20), rng.randint(4, 20)
+    start = (rng.randrange(rows), rng.randrange(cols))
+    goal = (rng.randrange(rows), rng.randrange(cols))
+    grid = random_grid(rng, rows, cols, rng.choice([0.1, 0.3, 0.45]), free=(start, goal))
+    monsters = {}
+    for _ in range(rng.randint(0, 5)):
+        rc = (rng.randrange(rows), rng.randrange(cols))
+        if rc not in (start, goal):
+            monsters[rc] = rng.choice([2.5, 5.0, 40.0])
+    return grid, start, goal, monsters
+
+
+@pytest.mark.parametrize("heuristic,eight_dir", CASES)
+@pytest.mark.parametrize("weight", [1.0, 1.5, 3.0])
+def test_array_engine_matches_dict_engine(heuristic, eight_dir, weight):
+    rng = random.Random(zlib.crc32(repr((heuristic, eight_dir, weight)).encode()))
+    for _ in range(30):
+        grid, start, goal, monsters = _random_case(rng)
+        kw = dict(heuristic_kind=heuristic, eight_dir=eight_dir, weight=weight,
+                  monsters=monsters, monster_extra_cost=0.0)
+        ref = build_trace(grid, start, goal, engine="dict", **kw)
+        arr = build_trace(grid, start, goal, engine="array", **kw)
+        assert arr.steps == ref.steps
+        assert arr.final_path == ref.final_path
+        assert len(arr) == len(ref)
+
+
+@pytest.mark.parametrize("heuristic,eight_dir", CASES)
+def test_search_flat_is_optimal_with_admissible_heuristic(heuristic, eight_dir):
+    rng = random.Random(zlib.crc32(repr((heuristic, eight_dir)).encode()))
+    diag_one = eight_dir and heuristic == "chebyshev"
+    for _ in range(40):
+        grid, start, goal, monsters = _random_case(rng)
+        fg = FlatGrid(grid, monsters)
+        res = search_flat(fg, start, goal, heuristic_kind=heuristic, eight_dir=eight_dir)
+        best = dijkstra(grid, start, goal, eight_dir, diag_one, monsters)
+        assert res["found"] == (best < math.inf)
+        if res["found"]:
+            assert res["path"][0] == start and res["path"][-1] == goal
+            cost = path_cost(grid, res["path"], eight_dir, diag_one, monsters)
+            assert cost == pytest.approx(best)
+            assert res["cost"] == pytest.approx(best)
+
+
+def test_search_flat_without_trace_matches_traced_run():
+    rng = random.Random(7)
+    for _ in range(20):
+        grid, start, goal, monsters = _random_case(rng)
+        fg = FlatGrid(grid, monsters)
+        trace = Trace()
+        traced = search_flat(fg, start, goal, eight_dir=True, heuristic_kind="octile", trace=trace)
+        plain = search_flat(fg, start, goal, eight_dir=True, heuristic_kind="octile")
+        assert (plain["found"], plain["path"], plain["explored"]) == \
+            (traced["found"], traced["path"], traced["explored"])
@@ -0,0 +1,64 @@
+# test_bidir.py
+import math, random, zlib
+
+import pytest
+
+from src.astar import FlatGrid, build_trace, search_flat_bidir
+from gridutil import random_grid, dijkstra, path_cost, assert_replay_consistent
+
+CASES = [("manhattan", False), ("octile", True), ("chebyshev", True), ("euclidean", True)]
+
+
+def _random_case(rng):
+    rows, cols = rng.randint(3, 22), rng.randint(3, 22)
+    start = (rng.randrange(rows), rng.randrange(cols))
+    goal = (rng.randrange(rows), rng.randrange(cols))
+    grid = random_grid(rng, rows, cols, rng.choice([0.1, 0.3, 0.45]), free=(start, goal))
+    monsters = {(rng.randrange(rows), rng.randrange(cols)): rng.choice([3.0, 25.0])
+                for _ in range(rng.randint(0, 5))}
+    return grid, start, goal, monsters
+
+
+@pytest.mark.parametrize("heuristic,eight_dir", CASES)
+def test_bidirectional_cost_matches_dijkstra(heuristic, eight_dir):
+    rng = random.Random(zlib.crc32(repr((heuristic, eight_dir)).encode()))
+    diag_one = eight_dir and heuristic == "chebyshev"
+    for _ in range(80):
+        grid, start, goal, monsters = _random_case(rng)
+        res = search_flat_bidir(FlatGrid(grid, monsters), start, goal,
+                                heuristic_kind=heuristic, eight_dir=eight_dir)
+        best = dijkstra(grid, start, goal, eight_dir, diag_one, monsters)
+        assert res["found"] == (best < math.inf)
+        if res["found"]:
+            assert res["path"][0] == start and res["path"][-1] == goal
+            assert path_cost(grid, res["path"], eight_dir, diag_one, monsters) == pytest.approx(best)
+            assert res["cost"] == pytest.approx(best)
+
+
+@pytest.mark.parametrize("weight", [1.5, 4.0])
+def test_weighted_bidirectional_returns_valid_bounded_path(weight):
+    rng = random.Random(zlib.crc32(repr(weight).encode()))
+    for _ in range(60):
+        grid, start, goal, monsters = _random_case(rng)
+        res = search_flat_bidir(FlatGrid(grid, monsters), start, goal,
+                                heuristic_kind="octile", eight_dir=True, weight=weight)
+        best = dijkstra(grid, start, goal, True, False, monsters)
+        assert res["found"] == (best < math.inf)
+        if res["found"]:
+            cost = path_cost(grid, res["path"], True, False, monsters)
+            assert cost == pytest.approx(res["cost"])
+            assert best - 1e-9 <= cost <= weight * best + 1e-9
+
+
+def test_bidirectional_trace_replays_consistently():
+    rng = random.Random(91)
+    for _ in range(40):
+        grid, start, goal, monsters = _random_case(rng)
+        eight_dir = rng.random() < 0.5
+        trace = build_trace(grid, start, goal, mode="bidirectional",
+                            heuristic_kind="octile" if eight_dir else "manhattan",
+                            eight_dir=eight_dir, weight=rng.choice([1.0, 2.0]),
+                            monsters=monsters)
+        assert_replay_consistent(trace)
+        if trace.final_path:
+            assert trace.final_path[0] == start and trace.final_path[-1] == goal
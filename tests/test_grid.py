@@ -0,0 +1,48 @@
+# test_grid.py
+import random
+
+from src.grid import (load_map, load_map_csv_json, load_map_window, read_map_csv,
+                      save_map_csv_json, convert_csv_to_bin)
+from gridutil import random_grid
+
+
+def _write(path, text):
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+def test_blank_lines_are_skipped(tmp_path):
+    csv_path = _write(tmp_path / "map.csv", "0,1,0\n\n1,0,0\r\n  \n0,0,1\n\n")
+    rows = read_map_csv(csv_path)
+    assert rows == [bytearray(b"\0\1\0"), bytearray(b"\1\0\0"), bytearray(b"\0\0\1")]
+    # cửa sổ đếm hàng theo dòng có dữ liệu, không theo dòng trong file
+    assert read_map_csv(csv_path, window=(1, 1, 3, None)) == [bytearray(b"\0\0"), bytearray(b"\0\1")]
+
+
+def test_leading_blank_line_keeps_width(tmp_path):
+    _write(tmp_path / "map.csv", "\n0,1\n1,0\n")
+    grid, start, goal = load_map_csv_json(str(tmp_path))
+    assert [bytes(r) for r in grid] == [b"\0\1", b"\1\0"]
+    assert goal == (1, 1)
+
+
+def test_multi_digit_cells(tmp_path):
+    csv_path = _write(tmp_path / "map.csv", "0,12,0\n\n7,0,00\n")
+    assert read_map_csv(csv_path) == [bytearray(b"\0\1\0"), bytearray(b"\1\0\0")]
+
+
+def test_csv_and_bin_round_trip(tmp_path):
+    rng = random.Random(3)
+    grid = random_grid(rng, 23, 17, 0.3, free=((0, 0), (22, 16)))
+    save_map_csv_json(grid, (0, 0), (22, 16), str(tmp_path))
+    with open(tmp_path / "map.csv", "a") as f:
+        f.write("\n\n")     # dòng trống cuối file (thường gặp khi sửa tay)
+    loaded, start, goal = load_map_csv_json(str(tmp_path))
+    assert [list(r) for r in loaded] == [list(r) for r in grid]
+    assert (start, goal) == ((0, 0), (22, 16))
+    assert [list(r) for r in load_map_window(str(tmp_path), 5, 3, 9, 11)] == \
+        [list(r[3:11]) for r in grid[5:9]]
+    convert_csv_to_bin(str(tmp_path))
+    bgrid, bstart, bgoal, _ = load_map(str(tmp_path))
+    assert [list(r) for r in bgrid] == [list(r) for r in grid]
+    assert (bstart, bgoal) == (start, goal)
@@ -0,0 +1,78 @@
+# test_heuristics.py
+import math, random
+
+import pytest
+
+from src import settings as S
+from src.astar import HFIELD_SMALL_CELLS, FlatGrid, search_flat
+from src.heuristics import heuristic_field, make_heuristic_id
+from gridutil import random_grid
+
+pytest.importorskip("numpy")
+
+KINDS = ("manhattan", "euclidean", "octile", "chebyshev")
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_field_matches_per_node_heuristic(kind):
+    rows, cols, goal = 9, 13, (4, 7)
+    field = heuristic_field(kind, goal, rows, cols)
+    h = make_heuristic_id(kind, goal, cols + 2)
+    assert len(field) == (rows + 2) * (cols + 2)
+    for nid in range(len(field)):
+        assert field[nid] == h(nid)
+
+
+def _big_grid():
+    side = math.isqrt(HFIELD_SMALL_CELLS) + 8
+    return FlatGrid([[0] * side for _ in range(side)]), side
+
+
+def test_large_grid_searches_lazily_by_default():
+    fg, side = _big_grid()
+    res = search_flat(fg, (0, 0), (3, 5), heuristic_kind="octile", eight_dir=True)
+    assert res["found"] and not fg._hfields
+    res2 = search_flat(fg, (0, 0), (3, 5), heuristic_kind="octile", eight_dir=True, reuse_h=True)
+    assert list(fg._hfields) == [("octile", (3, 5))]
+    assert (res2["path"], res2["explored"]) == (res["path"], res["explored"])
+    # field đã có thì lượt sau tới cùng goal dùng luôn, không dựng thêm
+    search_flat(fg, (side - 1, 0), (3, 5), heuristic_kind="octile", eight_dir=True)
+    assert len(fg._hfields) == 1
+
+
+def test_small_grid_and_lpa_state_build_field():
+    fg = FlatGrid([[0] * 20 for _ in range(20)])
+    search_flat(fg, (0, 0), (19, 19))
+    assert ("manhattan", (19, 19)) in fg._hfields
+    big, _ = _big_grid()
+    state = {}
+    search_flat(big, (0, 0), (9, 9), state=state)
+    assert state["hcache"] is big._hfields[("manhattan", (9, 9))]
+
+
+def test_field_cache_is_bounded_by_bytes(monkeypatch):
+    fg = FlatGrid([[0] * 30 for _ in range(30)])
+    nbytes = 8 * fg.size
+    monkeypatch.setattr(S, "HFIELD_CACHE_MB", 2.5 * nbytes / (1024 * 1024))
+    for c in range(5):
+        assert fg.heuristic_field("manhattan", (0, c)) is not None
+    assert list(fg._hfields) == [("manhattan", (0, 3)), ("manhattan", (0, 4))]
+    monkeypatch.setattr(S, "HFIELD_CACHE_MB", 0.5 * nbytes / (1024 * 1024))
+    assert fg.heuristic_field("manhattan", (1, 1)) is None     # lớn hơn cả ngân sách
+    assert fg.heuristic_field("manhattan", (0, 4)) is not None  # đã có thì vẫn dùng
+
+
+def test_results_do_not_depend_on_field(monkeypatch):
+    rng = random.Random(13)
+    for _ in range(10):
+        grid = random_grid(rng, 40, 40, 0.3, free=((0, 0), (39, 39)))
+        kw = dict(heuristic_kind="euclidean", eight_dir=True, weight=1.5)
+        fg = FlatGrid(grid)
+        with_field = search_flat(fg, (0, 0), (39, 39), **kw)
+        assert fg._hfields
+        monkeypatch.setattr(S, "HFIELD_CACHE_MB", 0)          # ép tính lười
+        fg = FlatGrid(grid)
+        lazy = search_flat(fg, (0, 0), (39, 39), **kw)
+        monkeypatch.undo()
+        assert not fg._hfields
+        assert (lazy["path"], lazy["explored"]) == (with_field["path"], with_field["explored"])
@@ -0,0 +1,65 @@
+# test_jps.py
+import math, random
+
+import pytest
+
+from src.astar import FlatGrid, build_trace, search_flat, search_jps
+from gridutil import random_grid, dijkstra, path_cost, assert_replay_consistent
+
+
+def _random_case(rng):
+    rows, cols = rng.randint(3, 28), rng.randint(3, 28)
+    start = (rng.randrange(rows), rng.randrange(cols))
+    goal = (rng.randrange(rows), rng.randrange(cols))
+    grid = random_grid(rng, rows, cols, rng.choice([0.05, 0.2, 0.35]), free=(start, goal))
+    return grid, start, goal
+
+
+@pytest.mark.parametrize("plus", [False, True])
+@pytest.mark.parametrize("heuristic", ["octile", "chebyshev"])
+def test_jps_cost_matches_dijkstra(plus, heuristic):
+    rng = random.Random(10 + 2 * plus + (heuristic == "chebyshev"))
+    diag_one = heuristic == "chebyshev"
+    for _ in range(120):
+        grid, start, goal = _random_case(rng)
+        res = search_jps(FlatGrid(grid), start, goal, heuristic_kind=heuristic, plus=plus)
+        best = dijkstra(grid, start, goal, True, diag_one)
+        assert res["found"] == (best < math.inf)
+        if res["found"]:
+            # path đã nội suy đủ từng ô, mỗi bước là bước 8-dir hợp lệ
+            assert res["path"][0] == start and res["path"][-1] == goal
+            assert path_cost(grid, res["path"], True, diag_one) == pytest.approx(best)
+            assert res["cost"] == pytest.approx(best)
+
+
+def test_jps_plus_tracks_grid_edits():
+    rng = random.Random(1010)
+    grid, start, goal = _random_case(rng)
+    fg = FlatGrid(grid)
+    search_jps(fg, start, goal, plus=True)          # dựng bảng nhảy
+    for _ in range(20):
+        rc = (rng.randrange(len(grid)), rng.randrange(len(grid[0])))
+        if rc in (start, goal):
+            continue
+        grid[rc[0]][rc[1]] ^= 1
+        fg.set_cell(rc, grid[rc[0]][rc[1]] == 1)
+        res = search_jps(fg, start, goal, plus=True)
+        best = dijkstra(grid, start, goal, True)
+        assert res["found"] == (best < math.inf)
+        if res["found"]:
+            assert res["cost"] == pytest.approx(best)
+
+
+@pytest.mark.parametrize("mode", ["jps", "jps+"])
+def test_jps_trace_replays_and_falls_back(mode):
+    rng = random.Random(77)
+    for _ in range(30):
+        grid, start, goal = _random_case(rng)
+        trace = build_trace(grid, start, goal, mode=mode, heuristic_kind="octile",
+                            eight_dir=True, weight=rng.choice([1.0, 2.0]))
+        assert_replay_consistent(trace)
+    # 4-dir: lùi về A* (search_flat), cùng path
+    grid, start, goal = _random_case(rng)
+    trace = build_trace(grid, start, goal, mode=mode, eight_dir=False)
+    ref = search_flat(FlatGrid(grid), start, goal)
+    assert trace.final_path == ref["path"]
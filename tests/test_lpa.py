@@ -0,0 +1,89 @@
+# test_lpa.py
+import math, random
+
+import pytest
+
+from src.planner import Replanner, build_two_leg_states
+from gridutil import random_grid, dijkstra, path_cost, assert_replay_consistent
+
+
+def _replanner(grid, start, goal, eight_dir, key_pos=None):
+    return Replanner([row[:] for row in grid], start=start, key_pos=key_pos, goal=goal,
+                     monsters={}, heuristic_kind="octile" if eight_dir else "manhattan",
+                     eight_dir=eight_dir, weight=1.0, monster_cost=0.0, mode="astar",
+                     waypoints=())
+
+
+def _random_edits(rng, grid, keep, n):
+    edits = []
+    for _ in range(n):
+        rc = (rng.randrange(len(grid)), rng.randrange(len(grid[0])))
+        if rc in keep:
+            continue
+        grid[rc[0]][rc[1]] ^= 1
+        edits.append((rc, grid[rc[0]][rc[1]] == 1, 0.0))
+    return edits
+
+
+@pytest.mark.parametrize("eight_dir", [False, True])
+def test_replan_cost_matches_fresh_search(eight_dir):
+    rng = random.Random(12 + eight_dir)
+    for _ in range(60):
+        rows, cols = rng.randint(5, 12), rng.randint(5, 12)
+        start, goal = (0, 0), (rows - 1, cols - 1)
+        grid = random_grid(rng, rows, cols, 0.25, free=(start, goal))
+        rp = _replanner(grid, start, goal, eight_dir)
+        rp.plan(parallel=False)
+        for _ in range(4):
+            rp.apply(_random_edits(rng, grid, (start, goal), rng.randint(1, 5)))
+            trace = rp.replan()
+            best = dijkstra(grid, start, goal, eight_dir)
+            assert trace.found == (best < math.inf)
+            if trace.found:
+                assert trace.final_path[0] == start and trace.final_path[-1] == goal
+                assert path_cost(grid, trace.final_path, eight_dir) == pytest.approx(best)
+
+
+def test_replan_with_key_matches_two_leg_search():
+    rng = random.Random(7)
+    for _ in range(30):
+        rows, cols = rng.randint(6, 12), rng.randint(6, 12)
+        start, key, goal = (0, 0), (0, cols - 1), (rows - 1, cols - 1)
+        grid = random_grid(rng, rows, cols, 0.2, free=(start, key, goal))
+        rp = _replanner(grid, start, goal, True, key_pos=key)
+        rp.plan(parallel=False)
+        rp.apply(_random_edits(rng, grid, (start, key, goal), 4))
+        trace = rp.replan()
+        fresh = build_two_leg_states(grid, start, key, goal, set(), "octile", True, 1.0, 0.0,
+                                     parallel=False)
+        assert trace.found == fresh.found
+        if fresh.found:
+            assert path_cost(grid, trace.final_path, True) == pytest.approx(
+                path_cost(grid, fresh.final_path, True))
+
+
+@pytest.mark.parametrize("eight_dir", [False, True])
+def test_replan_trace_replays_both_ways(eight_dir):
+    rng = random.Random(120 + eight_dir)
+    for _ in range(80):
+        rows, cols = rng.randint(4, 9), rng.randint(4, 9)
+        start, goal = (0, 0), (rows - 1, cols - 1)
+        grid = random_grid(rng, rows, cols, 0.25, free=(start, goal))
+        rp = _replanner(grid, start, goal, eight_dir)
+        rp.plan(parallel=False)
+        for _ in range(3):
+            rp.apply(_random_edits(rng, grid, (start, goal), rng.randint(1, 4)))
+            assert_replay_consistent(rp.replan())
+
+
+def test_replan_does_not_close_unpopped_goal():
+    # sửa ô xa path: goal không bị lấy ra lại, bước cuối không được đóng goal
+    grid = [[0] * 8 for _ in range(8)]
+    rp = _replanner(grid, (0, 0), (7, 7), False)
+    rp.plan(parallel=False)
+    grid[0][7] = 1
+    rp.apply([((0, 7), True, 0.0)])
+    trace = rp.replan()
+    assert trace.found
+    cur = trace.cursor().seek(len(trace) - 1)
+    assert (7, 7) not in cur.closed
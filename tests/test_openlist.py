@@ -0,0 +1,69 @@
+# test_openlist.py
+import random, zlib
+
+import pytest
+
+from src.astar import FlatGrid, search_flat, bucket_supported
+from src.openlist import BucketQueue, IndexedHeap
+from src.trace import Trace
+from gridutil import random_grid
+
+
+def _run(fg, start, goal, open_list, **kw):
+    trace = Trace()
+    res = search_flat(fg, start, goal, trace=trace, open_list=open_list, **kw)
+    return res, trace.steps
+
+
+@pytest.mark.parametrize("heuristic,eight_dir", [("manhattan", False), ("chebyshev", True)])
+@pytest.mark.parametrize("weight", [1.0, 2.0, 50.0])
+def test_open_lists_expand_in_the_same_order(heuristic, eight_dir, weight):
+    rng = random.Random(zlib.crc32(repr((heuristic, weight)).encode()))
+    for _ in range(25):
+        rows, cols = rng.randint(5, 25), rng.randint(5, 25)
+        start, goal = (0, 0), (rows - 1, cols - 1)
+        grid = random_grid(rng, rows, cols, 0.25, free=(start, goal))
+        monsters = {(rng.randrange(rows), rng.randrange(cols)): float(rng.choice([5, 12, 1000]))
+                    for _ in range(rng.randint(0, 6))}
+        monsters.pop(start, None)
+        fg = FlatGrid(grid, monsters)
+        assert bucket_supported(fg, heuristic, eight_dir, weight)
+        kw = dict(heuristic_kind=heuristic, eight_dir=eight_dir, weight=weight)
+        ref, ref_steps = _run(fg, start, goal, "heap", **kw)
+        for kind in ("indexed", "bucket"):
+            res, steps = _run(fg, start, goal, kind, **kw)
+            assert res["open_list"] == kind
+            assert (res["found"], res["path"], res["explored"]) == \
+                (ref["found"], ref["path"], ref["explored"])
+            assert res["cost"] == ref["cost"]
+            assert steps == ref_steps
+
+
+def test_bucket_falls_back_to_heap_for_real_valued_f():
+    fg = FlatGrid([[0] * 6 for _ in range(6)])
+    res, _ = _run(fg, (0, 0), (5, 5), "bucket", heuristic_kind="octile", eight_dir=True)
+    assert res["found"] and res["open_list"] == "heap"
+
+
+def test_bucket_queue_only_keeps_used_buckets():
+    q = BucketQueue()
+    for f, nid in ((10**9, 1), (3, 2), (10**6, 3), (3, 4)):
+        q.push((f, 0, nid))
+    assert q.pop() == (3, None, 2)
+    assert q.pop() == (3, None, 4)
+    assert len(q.buckets) == 2
+    q.push((7, 1, 5))                 # f nhỏ hơn f lớn đang chờ (W > 1)
+    assert [q.pop()[0] for _ in range(3)] == [7, 10**6, 10**9]
+    assert not q.buckets and not q.keys and len(q) == 0
+    with pytest.raises(IndexError):
+        q.pop()
+
+
+def test_indexed_heap_decrease_key_keeps_one_entry():
+    h = IndexedHeap(4)
+    h.push((5.0, 0, 1))
+    h.push((7.0, 0, 2))
+    h.push((3.0, 1, 2))   # decrease-key
+    h.push((9.0, 2, 1))   # tăng: bỏ qua
+    assert len(h) == 2
+    assert [h.pop() for _ in range(2)] == [(3.0, 1, 2), (5.0, 0, 1)]
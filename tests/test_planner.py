@@ -0,0 +1,41 @@
+# test_planner.py
+import random
+
+import pytest
+
+from src import settings as S
+from src.astar import FlatGrid, build_trace, search_flat
+from src.planner import compute_metrics
+from gridutil import random_grid
+
+
+@pytest.mark.parametrize("heuristic,eight_dir", [("manhattan", False), ("octile", True),
+                                                 ("chebyshev", True)])
+def test_metrics_cost_matches_search_cost(heuristic, eight_dir, monkeypatch):
+    # kết quả không phụ thuộc settings toàn cục
+    monkeypatch.setattr(S, "HEURISTIC", "euclidean")
+    rng = random.Random(16)
+    diag_one = eight_dir and heuristic == "chebyshev"
+    for _ in range(30):
+        rows, cols = rng.randint(4, 15), rng.randint(4, 15)
+        start, goal = (0, 0), (rows - 1, cols - 1)
+        grid = random_grid(rng, rows, cols, 0.2, free=(start, goal))
+        monsters = {(rng.randrange(rows), rng.randrange(cols)): rng.choice([5.0, 8.0, 12.0])
+                    for _ in range(6)}
+        fg = FlatGrid(grid, monsters)
+        trace = build_trace(fg, start, goal, heuristic_kind=heuristic, eight_dir=eight_dir)
+        res = search_flat(fg, start, goal, heuristic_kind=heuristic, eight_dir=eight_dir)
+        explored, cost = compute_metrics(trace, fg, diag_cost_is_one=diag_one)
+        assert explored == res["explored"]
+        if res["found"]:
+            assert cost == pytest.approx(res["cost"])
+
+
+def test_metrics_without_cost_layer():
+    path = [(0, 0), (1, 1), (1, 2)]
+    states = [{"closed": {(0, 0), (1, 1)}, "path": path}]
+    assert compute_metrics(states) == (2, pytest.approx(2 ** 0.5 + 1))
+    assert compute_metrics(states, diag_cost_is_one=True) == (2, 2.0)
+    fg = FlatGrid([[0, 0, 0], [0, 0, 0]], {(1, 2): 8.0})
+    assert compute_metrics(states, fg)[1] == pytest.approx(2 ** 0.5 + 9)
+    assert compute_metrics([]) == (0, 0.0)
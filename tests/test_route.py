@@ -0,0 +1,89 @@
+# test_route.py
+import itertools, math, random
+
+import pytest
+
+from src.astar import FlatGrid
+from src.planner import EXACT_ORDER_MAX, build_route_states, distance_matrix, order_stops
+from gridutil import random_grid, dijkstra, path_cost
+
+INF = math.inf
+
+
+def _route_cost(D, order):
+    stops = [0, *order, len(D) - 1]
+    return sum(D[a][b] for a, b in zip(stops, stops[1:]))
+
+
+def _random_matrix(rng, n, p_inf=0.0):
+    D = [[0.0 if i == j else (INF if rng.random() < p_inf else float(rng.randint(1, 60)))
+          for j in range(n)] for i in range(n)]
+    return D
+
+
+def _brute_force(D):
+    m = len(D) - 2
+    return min(_route_cost(D, p) for p in itertools.permutations(range(1, m + 1)))
+
+
+@pytest.mark.parametrize("m", range(0, 8))
+def test_held_karp_is_optimal(m):
+    rng = random.Random(15 + m)
+    for _ in range(40 if m < 7 else 10):
+        D = _random_matrix(rng, m + 2, p_inf=rng.choice([0.0, 0.2, 0.5]))
+        order = order_stops(D)
+        assert sorted(order) == list(range(1, m + 1))
+        best = _brute_force(D) if m else D[0][1]
+        if best < INF:
+            assert _route_cost(D, order) == best
+        else:
+            assert order == list(range(1, m + 1))   # không đi hết được: giữ thứ tự gốc
+
+
+def test_heuristic_order_is_a_permutation_no_worse_than_input():
+    rng = random.Random(150)
+    m = EXACT_ORDER_MAX + 2
+    for _ in range(5):
+        D = _random_matrix(rng, m + 2)
+        order = order_stops(D)
+        assert sorted(order) == list(range(1, m + 1))
+        assert _route_cost(D, order) <= _route_cost(D, list(range(1, m + 1)))
+
+
+def test_distance_matrix_matches_dijkstra():
+    rng = random.Random(151)
+    for _ in range(10):
+        rows, cols = rng.randint(5, 14), rng.randint(5, 14)
+        cells = [(r, c) for r in range(rows) for c in range(cols)]
+        points = rng.sample(cells, rng.randint(2, 5))
+        grid = random_grid(rng, rows, cols, 0.25, free=points)
+        monsters = {rc: 7.0 for rc in rng.sample(cells, 3) if rc not in points}
+        D = distance_matrix(FlatGrid(grid, monsters), points, "octile", True)
+        for i in range(len(points) - 1):
+            for j in range(1, len(points)):
+                if i != j:
+                    best = dijkstra(grid, points[i], points[j], True, False, monsters)
+                    assert D[i][j] == pytest.approx(best)
+
+
+def test_route_visits_stops_in_optimal_order():
+    rng = random.Random(152)
+    for _ in range(10):
+        rows, cols = rng.randint(6, 14), rng.randint(6, 14)
+        cells = [(r, c) for r in range(rows) for c in range(cols)]
+        start, goal, *stops = rng.sample(cells, 2 + rng.randint(2, 4))
+        grid = random_grid(rng, rows, cols, 0.15, free=[start, goal, *stops])
+        trace = build_route_states(grid, start, stops, goal, {}, "manhattan", False, 1.0, 0.0,
+                                   parallel=False)
+        points = [start, *stops, goal]
+        D = distance_matrix(FlatGrid(grid), points, "manhattan", False)
+        best = _brute_force(D)
+        if best == INF:
+            continue
+        assert trace.found
+        assert trace.route[0] == start and trace.route[-1] == goal
+        assert sorted(trace.route[1:-1]) == sorted(stops)
+        path = list(trace.final_path)
+        assert path[0] == start and path[-1] == goal
+        assert set(stops) <= set(path)
+        assert path_cost(grid, path) == pytest.approx(best)
@@ -0,0 +1,108 @@
+# test_runstore.py
+import time
+
+import pytest
+
+from src.runstore import COMPARE_HEADERS, RunStore, main, problem_hash
+
+
+def _run(**kw):
+    run = dict(source="bench", map="arena", map_hash="h1", rows=10, cols=10, mode="astar",
+               heuristic="manhattan", eight_dir=False, weight=1.0, found=True,
+               explored=100, cost=18.0, runtime_ms=10.0)
+    run.update(kw)
+    return run
+
+
+@pytest.fixture
+def store():
+    s = RunStore(":memory:")
+    yield s
+    s.close()
+
+
+def test_record_and_runs(store):
+    a = store.record(**_run(ts=1.0))
+    b = store.record(**_run(ts=2.0, map="maze", source="ui"))
+    assert store.record_many([_run(ts=3.0), _run(ts=4.0)]) == 2
+    assert len(store) == 4
+    rows = store.runs()
+    assert [r["id"] for r in rows][:2] == [a, b]
+    assert rows[0]["open_list"] == "heap" and rows[0]["repeats"] == 1 and rows[0]["eight_dir"] == 0
+    assert [r["ts"] for r in store.runs(limit=2)] == [3.0, 4.0]   # 2 lượt mới nhất, cũ -> mới
+    assert [r["id"] for r in store.runs(map="maze")] == [b]
+    assert len(store.runs(source="bench")) == 3
+    assert store.runs(since=1) == []                                # ts giả rất cũ
+
+
+def test_summary_groups_repeated_configs(store):
+    store.record_many([_run(runtime_ms=ms, explored=e)
+                       for ms, e in ((10.0, 100), (20.0, 100), (30.0, 130))])
+    store.record(**_run(weight=2.0, runtime_ms=5.0, cost=20.0, found=False))
+    store.record(**_run(map_hash="h2", map="maze", runtime_ms=7.0))
+    rows = store.summary()
+    assert len(rows) == 3
+    base = next(r for r in rows if r["map_hash"] == "h1" and r["weight"] == 1.0)
+    assert base["runs"] == 3 and base["found"] == 3
+    assert (base["runtime_ms_min"], base["runtime_ms_mean"], base["runtime_ms_max"]) == (10.0, 20.0, 30.0)
+    assert base["explored_mean"] == pytest.approx(110.0)
+    weighted = next(r for r in rows if r["weight"] == 2.0)
+    assert weighted["runs"] == 1 and weighted["found"] == 0
+    assert [r["map"] for r in store.summary(map="maze")] == ["maze"]
+
+
+def test_regressions_flag_only_slowed_configs(store):
+    runs = []
+    for i, ms in enumerate([10, 11, 9, 10, 25, 26, 24]):        # chậm ~2.5x
+        runs.append(_run(ts=float(i), runtime_ms=ms))
+    for i, ms in enumerate([10, 11, 9, 10, 11, 10, 12]):        # ổn định
+        runs.append(_run(ts=float(i), runtime_ms=ms, mode="jps"))
+    for i, ms in enumerate([10, 30, 30]):                        # quá ít lượt nền
+        runs.append(_run(ts=float(i), runtime_ms=ms, mode="bidirectional"))
+    for i, ms in enumerate([10, 10, 10, 10, 40]):                # replan tách riêng
+        runs.append(_run(ts=float(i), runtime_ms=ms, map_hash="h3", replan=i == 4))
+    store.record_many(runs)
+    out = store.regressions(ratio=1.25, recent=3, min_runs=3)
+    assert len(out) == 1
+    r = out[0]
+    assert (r["mode"], r["replan"]) == ("astar", 0)
+    assert (r["baseline_runs"], r["baseline_ms"], r["recent_runs"], r["recent_ms"]) == (4, 10.0, 3, 25.0)
+    assert r["ratio"] == 2.5
+    assert store.regressions(ratio=3.0) == []
+
+
+def test_compare_table(store):
+    ids = [store.record(**_run(runtime_ms=12.0, cost=20.0)),
+           store.record(**_run(heuristic="octile", eight_dir=True, mode="jps",
+                               cost=14.0, explored=40, runtime_ms=3.0)),
+           store.record(**_run(runtime_ms=8.0, cost=20.0))]
+    table = store.compare([ids[2], ids[1], ids[0], 999])
+    assert table["headers"] == COMPARE_HEADERS
+    assert len(table["rows"]) == 3                        # id không có bị bỏ qua
+    assert table["best"] == 1
+    assert table["rows"][1][:6] == ["2", "octile", "1.00", "8-dir jps", "40", "14.00"]
+    assert table["rows"][0][6] == "2 × 10.0 ms"           # 2 lượt cùng cấu hình
+    assert table["rows"][0][7] == "8.0 ms"
+    assert store.compare([]) == {"headers": COMPARE_HEADERS, "rows": [], "best": None}
+
+
+def test_problem_hash_depends_on_problem_only():
+    grid = [[0, 1], [0, 0]]
+    h = problem_hash(grid, None, 0.0, (0, 0), (1, 1))
+    assert h == problem_hash([bytearray(r) for r in grid], None, 0.0, (0, 0), (1, 1))
+    assert h != problem_hash(grid, None, 0.0, (0, 0), (1, 0))
+    assert h != problem_hash(grid, {(1, 0): 5.0}, 0.0, (0, 0), (1, 1))
+    assert len(h) == 16
+
+
+def test_file_store_persists_and_cli(tmp_path, capsys):
+    path = str(tmp_path / "runs.sqlite")
+    s = RunStore(path)
+    s.record_many([_run(ts=time.time(), runtime_ms=ms) for ms in (10, 10, 10, 30, 30, 30)])
+    s.close()
+    s = RunStore(path)
+    assert len(s) == 6
+    s.close()
+    assert main(["summary", "--db", path]) == 0
+    assert "arena" in capsys.readouterr().out
+    assert main(["regressions", "--db", path]) == 1
@@ -0,0 +1,97 @@
+# test_trace.py
+import random, zlib
+
+import pytest
+
+from src.astar import MODES, build_trace
+from src.planner import build_route_states
+from src.trace import Trace, REOPENED
+from gridutil import random_grid, assert_replay_consistent
+
+
+def _forward_states(trace):
+    """open/closed mỗi bước, chỉ đi tới theo định nghĩa delta (không qua TraceCursor)."""
+    out = []
+    offsets = {seg[0]: seg[3] for seg in trace.segments}
+    for k, (current, pushed, _) in enumerate(trace.steps):
+        if k in offsets:
+            op, cl = set(offsets[k]), set()
+        for node, prev in pushed:
+            if prev == REOPENED:
+                cl.discard(node)
+            op.add(node)
+        if current is not None:
+            op.discard(current)
+            cl.add(current)
+        out.append((frozenset(op), frozenset(cl)))
+    return out
+
+
+def _random_trace(rng, mode, eight_dir, stops=0):
+    rows, cols = rng.randint(4, 16), rng.randint(4, 16)
+    cells = [(r, c) for r in range(rows) for c in range(cols)]
+    start, goal, *extra = rng.sample(cells, 2 + stops)
+    grid = random_grid(rng, rows, cols, 0.25, free=[start, goal, *extra])
+    kw = dict(heuristic_kind="octile" if eight_dir else "manhattan",
+              eight_dir=eight_dir, weight=rng.choice([1.0, 1.5, 3.0]))
+    if stops:
+        return build_route_states(grid, start, extra, goal, {}, kw["heuristic_kind"],
+                                  eight_dir, kw["weight"], 0.0, mode=mode, parallel=False)
+    return build_trace(grid, start, goal, mode=mode, **kw)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("eight_dir", [False, True])
+def test_seek_matches_forward_replay(mode, eight_dir):
+    rng = random.Random(zlib.crc32(repr((mode, eight_dir)).encode()))
+    for _ in range(25):
+        trace = _random_trace(rng, mode, eight_dir)
+        ref = _forward_states(trace)
+        cur = trace.cursor()
+        for k in rng.sample(range(len(trace)), len(trace)) + [len(trace) - 1, 0]:
+            cur.seek(k)
+            assert (frozenset(cur.open), frozenset(cur.closed)) == ref[k], f"seek {k}"
+        assert_replay_consistent(trace)
+
+
+def test_seek_across_segments():
+    rng = random.Random(5)
+    for _ in range(15):
+        trace = _random_trace(rng, "astar", rng.random() < 0.5, stops=rng.randint(1, 3))
+        assert len(trace.segments) >= 2 or not trace.found
+        ref = _forward_states(trace)
+        cur = trace.cursor()
+        for k in list(range(len(trace) - 1, -1, -1)) + list(range(0, len(trace), 2)):
+            cur.seek(k)
+            assert (frozenset(cur.open), frozenset(cur.closed)) == ref[k]
+
+
+def test_changed_covers_every_cell_that_changed():
+    rng = random.Random(17)
+    for _ in range(20):
+        trace = _random_trace(rng, rng.choice(["astar", "bidirectional"]), True)
+        ref = _forward_states(trace)
+        cur = trace.cursor().seek(0)
+        for _ in range(40):
+            a, b = cur.index, rng.randrange(len(trace))
+            changed = set()
+            cur.seek(b, changed)
+            if cur.was_reset:
+                continue
+            (oa, ca), (ob, cb) = ref[a], ref[b]
+            assert (oa ^ ob) | (ca ^ cb) <= changed
+
+
+def test_step_view_reads_like_snapshot():
+    rng = random.Random(2)
+    trace = _random_trace(rng, "astar", False)
+    ref = _forward_states(trace)
+    for k in (len(trace) - 1, 0, len(trace) // 2):
+        st = trace[k]
+        assert (frozenset(st["open"]), frozenset(st["closed"])) == ref[k]
+        assert st["current"] == trace.steps[k][0]
+        if st["current"] is not None:
+            assert list(st["path"])[-1] == st["current"]
+    assert trace[-1]["path"] == trace.final_path
+    with pytest.raises(IndexError):
+        Trace().cursor().seek(0)
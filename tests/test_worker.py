@@ -0,0 +1,27 @@
+# test_worker.py
+import threading, time
+
+from src.worker import SearchWorker
+from src.planner import build_two_leg_states
+
+
+def test_runtime_counts_time_spent_waiting():
+    # chặng chạy ở process con: thread worker chỉ chờ, thời gian vẫn phải được tính
+    def build(trace, cancel):
+        threading.Event().wait(0.05)
+
+    w = SearchWorker(build).start()
+    w.join()
+    assert w.done and w.error is None
+    assert w.runtime_ms >= 45.0
+
+
+def test_runtime_of_real_search_is_positive_and_bounded():
+    grid = [[0] * 40 for _ in range(40)]
+    t0 = time.perf_counter()
+    w = SearchWorker(build_two_leg_states, grid, (0, 0), (0, 39), (39, 39), set(),
+                     "manhattan", False, 1.0, 0.0, parallel=False).start()
+    w.join()
+    elapsed = (time.perf_counter() - t0) * 1000.0
+    assert w.trace.found
+    assert 0.0 < w.runtime_ms <= elapsed